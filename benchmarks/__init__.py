@@ -0,0 +1,4 @@
+# Benchmarks of the closure pipeline on synthetic electrodes. Run with "python -m benchmarks" from the repository root.
+
+from .generate_synthetic_electrode import generate_synthetic_electrode
+from .run_benchmark import run_benchmark, append_to_history
@@ -0,0 +1,45 @@
+# Runs the benchmark matrix and appends the timings to the JSON history, e.g. "python -m benchmarks --sizes 50 100 --particles 10 100"
+
+import os
+import sys
+import argparse
+import tempfile
+
+from benchmarks.run_benchmark import run_benchmark, append_to_history, DEFAULT_HISTORY_PATH
+
+FULL_SIZES = [50, 100, 200, 500]
+FULL_PARTICLES = [10, 100, 1000, 10000]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Times each stage of the closure pipeline on synthetic electrodes, with stub OpenFOAM executables.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 100], help="The side lengths of the cubic images, in voxels.")
+    parser.add_argument("--particles", type=int, nargs="+", default=[10, 100], help="The numbers of particles.")
+    parser.add_argument("--full", action="store_true", help=f"Run the full matrix of sizes {FULL_SIZES} and particles {FULL_PARTICLES}.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-label-map", action="store_true", help="Do not time generate_label_map.")
+    parser.add_argument("--skip-end-to-end", action="store_true", help="Do not time solve_closure_multiparticle and process_closure_results.")
+    parser.add_argument("--history", default=DEFAULT_HISTORY_PATH, help="The JSON history the timings are appended to.")
+    parser.add_argument("--work-dir", default=None, help="The scratch directory. Default is a temporary directory.")
+    args = parser.parse_args()
+
+    sizes, particles = (FULL_SIZES, FULL_PARTICLES) if args.full else (args.sizes, args.particles)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="solveclosure_benchmark_")
+    n_regressions = 0
+    for size in sizes:
+        for n_particles in particles:
+            # particles must span a few voxels, and the image must have room for them
+            if (size**3 / n_particles) ** (1 / 3) < 4:
+                print(f"Skipping {size}^3 with {n_particles} particles, since the particles would be too small.")
+                continue
+            record = run_benchmark(os.path.join(work_dir, f"{size}_{n_particles}"), (size, size, size), n_particles, seed=args.seed,
+                                   label_map_stage=not args.skip_label_map, end_to_end=not args.skip_end_to_end)
+            n_regressions += len(append_to_history(record, args.history))
+
+    print(f"\nThe timings were appended to {args.history}.")
+    return 1 if n_regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+# This file generates reproducible synthetic electrodes (overlapping sphere or ellipsoid packings with CBD) and their label maps, for benchmarking
+
+import numpy as np
+from scipy import ndimage
+
+
+def generate_synthetic_electrode(shape, n_particles, am_fraction=0.5, cbd_fraction=0.05, aspect_ratio=1.0, radius_spread=0.2, seed=0):
+    """
+    Generates a synthetic electrode image and the matching label map. Particles are placed at random and may overlap;
+    each voxel belongs to the particle it lies deepest inside, and any fragment cut off from its particle is set to electrolyte,
+    so every particle is a single connected domain (as subdivide_image_using_label_map requires). CBD is placed as blobs in
+    the electrolyte next to the particles.
+
+    Args:
+        shape (tuple): The shape of the image in voxels, e.g. (100, 100, 100).
+        n_particles (int): The number of particles placed. Slightly fewer may remain if some are entirely covered by others.
+        am_fraction (float): The target AM volume fraction, used to choose the mean particle radius. Overlaps reduce the actual fraction.
+        cbd_fraction (float): The target CBD volume fraction. CBD is limited to the electrolyte voxels touching the AM.
+        aspect_ratio (float): The ratio of the longest to shortest semi-axes. 1 gives spheres, otherwise randomly oriented spheroids.
+        radius_spread (float): The standard deviation of the log-normal distribution of particle radii.
+        seed (int): The seed of the random number generator, so that the same electrode is generated every time.
+
+    Returns:
+        img (nd array): The electrode image (uint8), with electrolyte labelled 0, AM as 1, and CBD as 2.
+        label_map (nd array): The particle IDs (beginning at 1, consecutive), 0 outside the AM.
+    """
+
+    rng = np.random.default_rng(seed)
+    shape = tuple(int(n) for n in shape)
+
+    # the radius which gives the target AM fraction if the particles did not overlap
+    mean_radius = (am_fraction * np.prod(shape) / (n_particles * 4 / 3 * np.pi * aspect_ratio)) ** (1 / 3)
+    if mean_radius < 1.5:
+        raise ValueError(f"\n{n_particles} particles in an image of shape {shape} would be smaller than 1.5 voxels in radius.")
+
+    centres = rng.uniform(0, 1, (n_particles, 3)) * np.array(shape)
+    radii = mean_radius * rng.lognormal(0, radius_spread, n_particles)
+
+    label_dtype = np.uint16 if n_particles < 2**16 else np.uint32
+    label_map = np.zeros(shape, dtype=label_dtype)
+    # the normalised distance to the centre of the particle each voxel belongs to (1 on its surface)
+    depth = np.full(shape, np.inf, dtype=np.float32)
+
+    for idx in range(n_particles):
+        centre, radius = centres[idx], radii[idx]
+        semi_axes = np.array([radius * aspect_ratio, radius, radius])
+
+        # a random orientation, from the QR decomposition of a gaussian matrix
+        rotation, _ = np.linalg.qr(rng.normal(size=(3, 3)))
+        inverse_shape = rotation @ np.diag(1 / semi_axes**2) @ rotation.T
+
+        reach = semi_axes.max()
+        lower = np.maximum(np.floor(centre - reach).astype(int), 0)
+        upper = np.minimum(np.ceil(centre + reach).astype(int) + 1, shape)
+        if np.any(upper <= lower):
+            continue
+        box = tuple(slice(l, u) for l, u in zip(lower, upper))
+
+        # voxel centres relative to the particle centre
+        offsets = np.stack(np.meshgrid(*[np.arange(l, u) + 0.5 - c for l, u, c in zip(lower, upper, centre)], indexing="ij"), axis=-1)
+        q = np.einsum("...i,ij,...j->...", offsets, inverse_shape, offsets).astype(np.float32)
+
+        claim = (q <= 1) & (q < depth[box])
+        label_map[box][claim] = idx + 1
+        depth[box][claim] = q[claim]
+
+    del depth
+
+    # keep only the largest connected piece of each particle
+    for idx, box in enumerate(ndimage.find_objects(label_map)):
+        if box is None:
+            continue
+        particle = label_map[box] == idx + 1
+        pieces, n_pieces = ndimage.label(particle)
+        if n_pieces > 1:
+            sizes = np.bincount(pieces.ravel())
+            sizes[0] = 0
+            label_map[box][particle & (pieces != np.argmax(sizes))] = 0
+
+    # number the remaining particles consecutively
+    present = np.unique(label_map)
+    present = present[present > 0]
+    lookup = np.zeros(n_particles + 1, dtype=label_dtype)
+    lookup[present] = np.arange(1, len(present) + 1)
+    label_map = lookup[label_map]
+
+    img = (label_map > 0).astype(np.uint8)
+
+    # CBD blobs in the electrolyte touching the AM, from smoothed noise
+    shell = ndimage.binary_dilation(img == 1) & (img == 0)
+    if cbd_fraction > 0 and shell.any():
+        noise = ndimage.gaussian_filter(rng.normal(size=shape).astype(np.float32), sigma=1.5)
+        n_cbd = min(int(cbd_fraction * img.size), int(shell.sum()))
+        if n_cbd > 0:
+            threshold = np.partition(noise[shell], -n_cbd)[-n_cbd]
+            img[shell & (noise >= threshold)] = 2
+
+    return img, label_map
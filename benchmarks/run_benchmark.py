@@ -0,0 +1,182 @@
+# This file times each stage of the closure pipeline on a synthetic electrode, with stub OpenFOAM executables, and keeps a JSON history of the timings
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import subprocess
+import contextlib
+import numpy as np
+import tifffile as tif
+
+from benchmarks.generate_synthetic_electrode import generate_synthetic_electrode
+
+STUB_OPENFOAM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_openfoam")
+DEFAULT_HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "history.json")
+
+
+def run_benchmark(work_dir, shape, n_particles, seed=0, cbd_surf_por=0.5, label_map_stage=True, end_to_end=True, quiet=True):
+    """
+    Times each stage of the closure pipeline on a synthetic electrode. The Python stages are timed on their own, and the whole of
+    solve_closure_multiparticle is timed with the stub OpenFOAM executables in stub_openfoam/ (which write placeholder postProcessing files).
+
+    Args:
+        work_dir (str): A scratch directory for the images and the case. It is emptied first.
+        shape (tuple): The shape of the synthetic electrode.
+        n_particles (int): The number of particles of the synthetic electrode.
+        seed (int): The seed of the synthetic electrode.
+        cbd_surf_por (float): The CBD surface porosity used for the source terms.
+        label_map_stage (bool): Set to False to skip timing generate_label_map, which dominates for large images.
+        end_to_end (bool): Set to False to skip solve_closure_multiparticle and process_closure_results.
+        quiet (bool): Set to False to show the progress messages of the package.
+
+    Returns:
+        record (dict): The benchmark parameters, the environment, the wall and CPU time of each stage in seconds, and the trace events of
+        solve_closure_multiparticle.
+    """
+
+    import solveclosure
+    from solveclosure.image_analysis import subdivide_image_using_label_map, calculate_source_terms_dimensionless, check_and_write_area_and_volume_total, return_x_positions
+    from solveclosure.openfoam_case_setup.make_topoSetDict import make_topoSetDict
+    from solveclosure.openfoam_case_setup.make_blockMeshDict import make_blockMeshDict
+    from solveclosure.openfoam_case_setup.multiparticle import write_bc_file_multiparticle, write_fvOptions_file_multiparticle, write_surface_integral_func, write_volume_integral_func, write_thermophysicalProperties_file, write_myFunctionsDict_multiparticle
+
+    if os.path.isdir(work_dir):
+        shutil.rmtree(work_dir)
+    os.makedirs(work_dir)
+    work_dir = os.path.abspath(work_dir)
+
+    stages = {}
+
+    @contextlib.contextmanager
+    def stage(name):
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull if quiet else sys.stdout):
+            yield
+        stages[name] = {"wall": time.perf_counter() - wall_start, "cpu": time.process_time() - cpu_start}
+        print(f"    {name}: {stages[name]['wall']:.3f} s")
+
+    print(f"Benchmarking shape {tuple(shape)} with {n_particles} particles.")
+
+    with stage("generate_synthetic_electrode"):
+        img, label_map = generate_synthetic_electrode(shape, n_particles, seed=seed)
+    img_path = os.path.join(work_dir, "img.tif")
+    label_map_path = os.path.join(work_dir, "label_map.tif")
+    tif.imwrite(img_path, img)
+    tif.imwrite(label_map_path, label_map)
+
+    voxel = 1e-7
+    L = img.shape[0] * voxel
+
+    if label_map_stage:
+        with stage("generate_label_map"):
+            solveclosure.generate_label_map(img_path, os.path.join(work_dir, "generated_label_map.tif"))
+
+    with stage("subdivide_image_using_label_map"):
+        subsections, centres, neighbour_ids = subdivide_image_using_label_map(label_map_path, img)
+
+    with stage("source terms"):
+        sources = {key: calculate_source_terms_dimensionless(subsection, voxel, cbd_surf_por, L) for key, subsection in subsections.items()}
+
+    with stage("check_and_write_area_and_volume_total"):
+        x_positions_m = return_x_positions(centres, voxel)
+        closure_data = {"particle data": {key: {"particle surface area": source[3], "particle volume": source[4], "centre x position": x_positions_m[key - 1]} for key, source in sources.items()}}
+        check_and_write_area_and_volume_total(closure_data, img, voxel, cbd_surf_por)
+
+    files_dir = os.path.join(work_dir, "files") + "/"
+    os.makedirs(files_dir)
+
+    with stage("make_blockMeshDict"):
+        make_blockMeshDict(files_dir + "blockMeshDict", img, voxel, True, L)
+
+    with stage("make_topoSetDict"):
+        make_topoSetDict(files_dir + "topoSetDict", img, multi_particle=True, label_map=label_map)
+
+    with stage("file writing"):
+        for key, (S_vol, bc_source_elec, bc_source_cbd, _, _) in sources.items():
+            particle_name = f"particle_{key}"
+            write_bc_file_multiparticle(files_dir + f"{particle_name}_T", particle_name, bc_source_elec, bc_source_cbd, neighbour_ids[key], 10)
+            write_fvOptions_file_multiparticle(files_dir + f"{particle_name}_fvOptions", particle_name, S_vol)
+            write_thermophysicalProperties_file(files_dir + f"{particle_name}_thermophysicalProperties", particle_name, 1)
+            write_volume_integral_func(files_dir + f"{particle_name}_volumeIntegral", particle_name)
+            for type in ["elec", "cbd"]:
+                if type in neighbour_ids[key]:
+                    write_surface_integral_func(files_dir + f"{particle_name}_surfaceIntegral_{type}", particle_name, type=type)
+        write_myFunctionsDict_multiparticle(files_dir + "myFunctionsDict", neighbour_ids)
+
+    if end_to_end:
+        case_dir = os.path.join(work_dir, "case") + "/"
+        os.makedirs(case_dir)
+        load_of_cmd = f"export PATH={STUB_OPENFOAM_DIR}:$PATH"
+
+        with stage("solve_closure_multiparticle (stub OpenFOAM)"):
+            trace = solveclosure.solve_closure_multiparticle(case_dir, img_path, label_map_path, voxel, cbd_surf_por, load_of_cmd=load_of_cmd)
+
+        with stage("process_closure_results"):
+            solveclosure.process_closure_results(case_dir, cbd_surf_por, 1.0, True, L=L, write=False)
+
+    record = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "commit": read_git_commit(),
+              "python": platform.python_version(),
+              "numpy": np.__version__,
+              "machine": platform.machine(),
+              "processor count": os.cpu_count(),
+              "shape": [int(n) for n in shape],
+              "n particles": int(n_particles),
+              "n particles generated": int(label_map.max()),
+              "seed": seed,
+              "stages": stages}
+
+    if end_to_end:
+        # the stages within solve_closure_multiparticle, as recorded by its trace
+        record["solve_closure_multiparticle trace"] = trace.events
+
+    return record
+
+
+def read_git_commit():
+    # the commit of the working tree, if it is a git repository
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def append_to_history(record, history_path=DEFAULT_HISTORY_PATH, threshold=0.25, min_seconds=0.05):
+    """
+    Appends a benchmark record to the JSON history, and compares it with the previous record of the same benchmark.
+
+    Args:
+        record (dict): A record returned by run_benchmark.
+        history_path (str): The path to the JSON history (a list of records).
+        threshold (float): The relative slow down of a stage which is reported as a regression.
+        min_seconds (float): Stages that slow down by less than this many seconds are not reported, to ignore timer noise.
+
+    Returns:
+        regressions (dict): The stages which slowed down, with their previous and current wall times.
+    """
+
+    history = []
+    if os.path.isfile(history_path):
+        with open(history_path) as f:
+            history = json.load(f)
+
+    regressions = {}
+    previous = [r for r in history if r["shape"] == record["shape"] and r["n particles"] == record["n particles"] and r["seed"] == record["seed"]]
+    if previous:
+        for name, timing in record["stages"].items():
+            if name not in previous[-1]["stages"]:
+                continue
+            before, after = previous[-1]["stages"][name]["wall"], timing["wall"]
+            if after > before * (1 + threshold) and after - before > min_seconds:
+                regressions[name] = {"previous wall": before, "wall": after}
+                print(f"Regression in {name}: {before:.3f} s -> {after:.3f} s (previous commit {previous[-1]['commit']}).", file=sys.stderr)
+
+    history.append(record)
+    with open(history_path, "w") as f:
+        json.dump(history, f, indent=2)
+
+    return regressions
@@ -0,0 +1,73 @@
+# Shared code of the stub solvers. Instead of solving, the stubs write the postProcessing files of every function object in
+# system/myFunctionsDict, with the same layout as OpenFOAM, so that process_closure_results can be timed. The values are placeholders
+# (the initial T of the region), so the closure values of a benchmark are meaningless. The stubs also print a minimal solver log.
+
+import os
+import re
+import sys
+import time
+
+# the number of time steps (or iterations) written by the stubs
+N_STEPS = int(os.environ.get("SOLVECLOSURE_STUB_STEPS", 100))
+# the ExecutionTime printed per step by the stubs for each linear solver, so that the fastest solver profile is deterministic (GAMG)
+STEP_SECONDS = {"GAMG": 0.005, "FDIC": 0.008}
+# the wall time in seconds each stub solve sleeps for, to test the scheduling of concurrent solves
+SOLVE_SECONDS = float(os.environ.get("SOLVECLOSURE_STUB_SECONDS", 0))
+# if set, a transient stub with a larger maxDi in its controlDict prints NaN residuals and then hangs, like a diverged run
+DIVERGE_MAX_DI = os.environ.get("SOLVECLOSURE_STUB_DIVERGE_MAX_DI")
+
+
+def read_entry(file_path, keyword):
+    with open(file_path, errors="ignore") as f:
+        match = re.search(rf"^\s*{keyword}\s+([^;]+);", f.read(), re.MULTILINE)
+    return match.group(1).strip() if match else None
+
+
+def write_function_object_outputs(steady=False):
+    case_dir = sys.argv[sys.argv.index("-case") + 1]
+
+    end_time = float(read_entry(os.path.join(case_dir, "system", "controlDict"), "endTime"))
+    max_Di = read_entry(os.path.join(case_dir, "system", "controlDict"), "maxDi")
+    if not steady and DIVERGE_MAX_DI is not None and max_Di is not None and float(max_Di) > float(DIVERGE_MAX_DI):
+        print(f"deltaT = {end_time / N_STEPS:g}\nTime = {end_time / N_STEPS:g}\n\nSolving for solid region stub", flush=True)
+        print("DICPCG:  Solving for h, Initial residual = nan, Final residual = nan, No Iterations 1000", flush=True)
+        time.sleep(600)
+    if steady:
+        times = list(range(1, int(min(end_time, N_STEPS)) + 1))
+    else:
+        times = [end_time * (i + 1) / N_STEPS for i in range(N_STEPS)]
+
+    with open(os.path.join(case_dir, "system", "myFunctionsDict")) as f:
+        function_names = re.findall(r"#includeFunc\s+(\S+)", f.read())
+
+    initial_values = {}
+    for function_name in function_names:
+        function_path = os.path.join(case_dir, "system", function_name)
+        region_name = read_entry(function_path, "region")
+        file_name = "surfaceFieldValue.dat" if read_entry(function_path, "type") == "surfaceFieldValue" else "volFieldValue.dat"
+
+        if region_name not in initial_values:
+            internal_field = read_entry(os.path.join(case_dir, "0", region_name, "T"), "internalField") or ""
+            initial_values[region_name] = float(internal_field.split()[1]) if internal_field.startswith("uniform") else 0.0
+
+        output_dir = os.path.join(case_dir, "postProcessing", region_name, function_name, "0")
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, file_name), "w") as f:
+            f.write(f"# Stub output of {function_name}\n# Time    areaIntegrate(T)\n")
+            for t in times:
+                f.write(f"{t:g}\t{initial_values[region_name]:g}\n")
+
+    time.sleep(SOLVE_SECONDS)
+
+    # the cost of a step depends on the linear solver of the first region
+    step_seconds = 0.01
+    region_names = sorted(os.listdir(os.path.join(case_dir, "0")))
+    if region_names and os.path.isfile(os.path.join(case_dir, "system", region_names[0], "fvSolution")):
+        with open(os.path.join(case_dir, "system", region_names[0], "fvSolution"), errors="ignore") as f:
+            content = f.read()
+        step_seconds = next((seconds for keyword, seconds in STEP_SECONDS.items() if keyword in content), step_seconds)
+
+    for idx, t in enumerate(times):
+        print(f"Time = {t:g}\n\nSolving for solid region stub\nDICPCG:  Solving for h, Initial residual = 1e-06, Final residual = 1e-09, No Iterations 2")
+        print(f"ExecutionTime = {(idx + 1) * step_seconds:g} s  ClockTime = {idx + 1} s\n")
+    print("End")
@@ -1,3 +1,46 @@
-from .solve_closure_multiparticle import solve_closure_multiparticle
-from .process_closure_results import process_closure_results
-from .generate_label_map import generate_label_map
\ No newline at end of file
+# The package functions are imported on first use, so that "import solveclosure" does not pull in numpy, scipy, 
+# scikit-image or matplotlib. Each function is defined in the submodule of the same name.
+
+import importlib
+import sys
+import types
+
+lazy_functions = [
+    "solve_closure_multiparticle",
+    "process_closure_results",
+    "generate_label_map",
+    "generate_label_map_tiled",
+    "solve_closure_porosity_sweep",
+    "evaluate_porosity_sweep",
+    "rescale_dimensionless_closure_data",
+    "update_closure_case",
+    "solve_closure_rve_sampling",
+    "solve_closure_resolution_ladder",
+    "solve_closure_native",
+    "solve_closure_multiparticle_async",
+    "solve_closure_cases",
+]
+
+__all__ = list(lazy_functions)
+
+
+class LazyPackage(types.ModuleType):
+    # importing a submodule binds it to the package under the same name as its function, so bind the function instead
+    def __setattr__(self, name, value):
+        if name in lazy_functions and isinstance(value, types.ModuleType):
+            value = getattr(value, name)
+        super().__setattr__(name, value)
+
+
+def __getattr__(name):
+    if name in lazy_functions:
+        importlib.import_module(f".{name}", __name__)
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(lazy_functions))
+
+
+sys.modules[__name__].__class__ = LazyPackage
@@ -0,0 +1,64 @@
+import pickle
+
+
+def evaluate_porosity_sweep(basis, cbd_surf_pors, sep_surf_pors=None):
+    """
+    Evaluates the steady state closure value for any number of CBD (and separator) surface porosities from the two basis solutions 
+    stored by solve_closure_porosity_sweep, without running OpenFOAM. 
+    
+    The closure problem is linear and the CBD surface porosity only enters through the boundary flux and the volume source, 
+    both of which are affine in the porosity. The solution at porosity e is therefore (1 - e) * T_0 + e * T_1, where T_0 and T_1 
+    are the solutions for porosities of 0 and 1 (equivalent to elec-only and elec plus cbd forcing, with the T offset preserved). 
+
+    Args:
+        basis (dict or str): The basis dictionary, or the path to the porosity_basis.pickle file written by solve_closure_porosity_sweep.
+        cbd_surf_pors (list): The CBD surface porosities to evaluate.
+        sep_surf_pors (list, optional): The separator surface porosities, one per CBD surface porosity. Default is 1.0 for all.
+
+    Returns:
+        closure_values (list): The global s surface average at steady state (after correction) for each porosity.
+    """
+
+    if isinstance(basis, str):
+        with open(basis, 'rb') as f:
+            basis = pickle.load(f)
+
+    if sep_surf_pors is None:
+        sep_surf_pors = [1.0] * len(cbd_surf_pors)
+
+    if len(sep_surf_pors) != len(cbd_surf_pors):
+        raise ValueError("sep_surf_pors must have the same length as cbd_surf_pors.")
+
+    offset = basis["T offset"]
+    L = basis["L"]
+
+    if basis["dimensionless"]:
+        area_scale = L**2
+        volume_scale = L**3
+    else:
+        area_scale = 1
+        volume_scale = 1
+
+    total_particle_V = basis["total particle volume"] / volume_scale
+
+    closure_values = []
+    for cbd_surf_por, sep_surf_por in zip(cbd_surf_pors, sep_surf_pors):
+        surf_por = {"elec" : 1, "cbd" : cbd_surf_por, "sep" : sep_surf_por}
+
+        global_sum_s_surf_int = 0
+        global_sum_s_vol_int = 0
+        for key in basis["surface integrals"][0].keys():
+            for type, s_surf_int_0 in basis["surface integrals"][0][key].items():
+                s_surf_int_1 = basis["surface integrals"][1][key][type]
+                global_sum_s_surf_int += surf_por[type] * ((1 - cbd_surf_por) * s_surf_int_0 + cbd_surf_por * s_surf_int_1)
+
+            global_sum_s_vol_int += (1 - cbd_surf_por) * basis["volume integrals"][0][key] + cbd_surf_por * basis["volume integrals"][1][key]
+
+        total_A = (basis["am-elec area"] + cbd_surf_por * basis["am-cbd area (surface porosity omitted)"]) / area_scale
+
+        global_s_surf_ave_ss = global_sum_s_surf_int / total_A - offset
+        s_vol_ave_final = global_sum_s_vol_int / total_particle_V - offset
+
+        closure_values.append(global_s_surf_ave_ss - s_vol_ave_final)
+
+    return closure_values
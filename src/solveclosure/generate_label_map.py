@@ -4,9 +4,129 @@ import numpy as np
 import tifffile as tif
 from scipy import ndimage as ndi
 from skimage import measure, morphology, segmentation, filters
-from matplotlib import pyplot as plt
 
-def generate_label_map(input_path, write_path, show_image=False, sigma=2.0, compactness=0.01):
+def gap_filling(am_mask, label_map, max_iter=1000):
+    """
+    Sometimes not all AM regions are labelled by the watershed. This merges unlabelled regions with their nearest neighbour,
+    and gives unlabelled regions which do not touch any particle (islands) a new label.
+    Labels are propagated through the unlabelled AM by a breadth-first search, one layer of face neighbours at a time,
+    and a voxel reached by several particles in the same layer takes the largest label.
+
+    Args:
+        am_mask (nd array): A boolean mask of the active material.
+        label_map (nd array): The label map from the watershed.
+        max_iter (int): The maximum number of layers used to propagate labels.
+
+    Returns:
+        filled_label_map (nd array): The label map with all AM labelled.
+    """
+
+    def remove_islands(filled_label_map, unlabelled_mask):
+        # unlabelled regions surrounded by electrolyte or CBD will not be reached by particle propogation. 
+
+        unlabelled_components, n_components = measure.label(unlabelled_mask, connectivity=1, return_num=True)
+
+        # mark the components which share a face with a labelled voxel
+        touches_particle = np.zeros(n_components + 1, dtype=bool)
+        labelled = filled_label_map > 0
+        for axis in range(unlabelled_components.ndim):
+            lower = [slice(None)] * unlabelled_components.ndim
+            upper = [slice(None)] * unlabelled_components.ndim
+            lower[axis] = slice(None, -1)
+            upper[axis] = slice(1, None)
+            lower, upper = tuple(lower), tuple(upper)
+            touches_particle[unlabelled_components[lower][labelled[upper]]] = True
+            touches_particle[unlabelled_components[upper][labelled[lower]]] = True
+
+        islands = np.flatnonzero(~touches_particle[1:]) + 1
+        if len(islands) > 0:
+            island_labels = np.zeros(n_components + 1, dtype=filled_label_map.dtype)
+            island_labels[islands] = np.max(filled_label_map) + np.arange(1, len(islands) + 1)
+            island_mask = island_labels[unlabelled_components] > 0
+            filled_label_map[island_mask] = island_labels[unlabelled_components[island_mask]]
+
+        return filled_label_map
+
+
+    unlabelled_mask = (label_map == 0) & am_mask
+
+    filled_label_map = label_map.copy()
+
+    filled_label_map = remove_islands(filled_label_map, unlabelled_mask)
+
+    # pad by one voxel so that the face neighbours of every voxel are at fixed offsets in the flattened arrays
+    padded_labels = np.pad(filled_label_map, 1)
+    padded_unlabelled = np.pad((filled_label_map == 0) & am_mask, 1)
+    flat_labels = padded_labels.ravel()
+    flat_unlabelled = padded_unlabelled.ravel()
+    strides = np.cumprod((1,) + padded_labels.shape[:0:-1])[::-1]
+    offsets = np.concatenate([strides, -strides])
+
+    # the first layer is the unlabelled AM which shares a face with a particle
+    unlabelled_ids = np.flatnonzero(flat_unlabelled)
+    frontier = unlabelled_ids[np.any(flat_labels[unlabelled_ids[:, None] + offsets] > 0, axis=1)]
+
+    for _ in range(max_iter):
+        if len(frontier) == 0:
+            break
+
+        flat_labels[frontier] = flat_labels[frontier[:, None] + offsets].max(axis=1)
+        flat_unlabelled[frontier] = False
+
+        neighbours = (frontier[:, None] + offsets).ravel()
+        frontier = np.unique(neighbours[flat_unlabelled[neighbours]])
+
+    filled_label_map = padded_labels[tuple(slice(1, -1) for _ in range(padded_labels.ndim))].copy()
+
+    if np.any((filled_label_map == 0) & am_mask):
+        raise ValueError(f"Gap filling did not complete successfully even after {max_iter} iterations. Try increasing max_iter.")
+
+    return filled_label_map
+
+
+def distance_transform_edt_slabs(am_mask, slab_thickness=32, halo=16):
+    """
+    Computes the Euclidean distance transform of the active material as float32, one slab along axis 0 at a time. 
+    The EDT of SciPy needs several times the memory of the image in temporary arrays, so this bounds them by the slab size. 
+    Each slab is extended by a halo, and is recomputed with a doubled halo until every distance in the slab is no greater than
+    the halo, which guarantees that no nearer background lies outside the extended slab. 
+
+    Args:
+        am_mask (nd array): A boolean mask of the active material.
+        slab_thickness (int): The number of planes along axis 0 in each slab.
+        halo (int): The initial number of planes added to each side of a slab.
+
+    Returns:
+        distance (nd array): The float32 distance of each AM voxel to the nearest non-AM voxel.
+    """
+
+    distance = np.empty(am_mask.shape, dtype=np.float32)
+    n = am_mask.shape[0]
+
+    for start in range(0, n, slab_thickness):
+        stop = min(start + slab_thickness, n)
+        slab_halo = halo
+
+        while True:
+            lower, upper = max(0, start - slab_halo), min(n, stop + slab_halo)
+            block = am_mask[lower:upper]
+            whole_image = lower == 0 and upper == n
+
+            if block.all() and not whole_image:
+                slab_halo *= 2
+                continue
+
+            slab_distance = ndi.distance_transform_edt(block)[start - lower:stop - lower]
+            if whole_image or slab_distance.max() <= slab_halo:
+                break
+            slab_halo *= 2
+
+        distance[start:stop] = slab_distance
+
+    return distance
+
+
+def generate_label_map(input_path, write_path, show_image=False, sigma=2.0, compactness=0.01, tile_shape=None, max_particle_radius=None, n_workers=None, low_memory=False):
     """
     Generates and writes a label map for an electrode image using a watershed algorithm. 
 
@@ -16,102 +136,93 @@ def generate_label_map(input_path, write_path, show_image=False, sigma=2.0, comp
         show_image (bool): Shows slice of the label map (useful for debugging).
         sigma (float): The standard deviation for Gaussian smoothing applied to the distance map. Prevents over-segmentation (higher sigma = fewer particles).
         compactness (float): A parameter for the watershed algorithm which adjusts region shapes. 
+        tile_shape (tuple, optional): Set to segment the image in overlapping tiles of this shape in a process pool, 
+        for images too large to segment in memory (see generate_label_map_tiled). The label map is then written as uint32.
+        max_particle_radius (float): The radius of the largest particle in voxels. Required if tile_shape is set. 
+        n_workers (int, optional): The number of worker processes for tiled segmentation. Default is the number of CPUs.
+        low_memory (bool): Reduces the peak memory by computing the distance map in slabs (see distance_transform_edt_slabs) 
+        as float32, smoothing and negating it in place, using int32 markers, and freeing intermediate arrays as soon as they are used. 
         
     Returns: 
     """
 
+    if tile_shape is not None:
+        if max_particle_radius is None:
+            raise ValueError("max_particle_radius must be provided for tiled segmentation.")
+        from solveclosure.generate_label_map_tiled import generate_label_map_tiled
+        generate_label_map_tiled(input_path, write_path, tile_shape, max_particle_radius, sigma=sigma, compactness=compactness, n_workers=n_workers)
+        return
+
     def check_all_particles(img, label_map):
-        n_particles = max(np.unique(label_map))
+        # one pass over the volume: voxel counts of each label, and of its AM, and connected components of equal labels
+        n_particles = int(label_map.max())
 
         if ((label_map == 0.0) & (img == 1.0)).any():
             raise ValueError("Some AM regions are were not labelled.")
 
-        for i in range(1, n_particles + 1):
-            particle = np.copy(img[label_map == i])
-            # check no electrolyte
-            if not np.all(particle == 1):
-                raise ValueError(f"Particle {i} contains electrolyte")
-            # check am present
-            if not np.any(particle == 1):
-                raise ValueError(f"Particle {i} contains no AM")
-            
-            # check particle not fragmented
-            labelled_components, num_components = measure.label(label_map == i, connectivity=1, return_num=True)
-            if num_components > 1:
-                raise ValueError(f"Particle {i} is fragmented into {num_components} components.")
-            
-            
-    
-    def gap_filling(am_mask, label_map, max_iter=1000):
-        # Sometimes not all AM regions are labeled. This merges unlabelled regions with their nearest neighbour. 
-
-        def remove_islands(am_mask, filled_label_map, unlabelled_mask, struct):
-            # unlabelled regions surrounded by electrolyte or CBD will not be reached by particle propogation. 
-
-            unlabelled_components = measure.label(unlabelled_mask, connectivity=1)
-
-            dilated_unlabelled_comps = ndi.grey_dilation(unlabelled_components, footprint=struct)
-
-            for i in range(1, np.max(unlabelled_components) + 1):
-                region = unlabelled_components == i 
-                dilated_region = ndi.binary_dilation(region, structure=struct)
-                region_surroundings_mask = dilated_region & (~region)
-                region_surroundings  = am_mask[region_surroundings_mask]
-                # check if all surroundings are electrolyte or CBD. In this case it's an island. 
-                if np.all(~region_surroundings): 
-                    max_label = np.max(filled_label_map)
-                    filled_label_map[region] = max_label + 1
-
-            return filled_label_map
- 
-        
-        unlabelled_mask = (label_map == 0) & am_mask
+        labels = label_map.ravel()
+        n_voxels = np.bincount(labels, minlength=n_particles + 1)
+        n_am = np.bincount(labels, weights=(img.ravel() == 1), minlength=n_particles + 1)
 
-        filled_label_map = label_map.copy()
+        components, n_components = measure.label(label_map, connectivity=1, background=0, return_num=True)
+        component_labels = np.zeros(n_components + 1, dtype=labels.dtype)
+        component_labels[components.ravel()] = labels
+        n_fragments = np.bincount(component_labels[1:], minlength=n_particles + 1)
 
-        struct = ndi.generate_binary_structure(filled_label_map.ndim, 1)
+        contains_elec = n_am != n_voxels
+        no_am = n_am == 0
+        fragmented = n_fragments > 1
 
-        filled_label_map = remove_islands(am_mask, filled_label_map, unlabelled_mask, struct)
-
-        for _ in range(max_iter):
-            dilated_map = ndi.grey_dilation(filled_label_map, footprint=struct)
+        bad = np.flatnonzero(contains_elec | no_am | fragmented)
+        bad = bad[bad > 0]
+        if len(bad) > 0:
+            i = bad[0]
+            if contains_elec[i]:
+                raise ValueError(f"Particle {i} contains electrolyte")
+            if no_am[i]:
+                raise ValueError(f"Particle {i} contains no AM")
+            raise ValueError(f"Particle {i} is fragmented into {n_fragments[i]} components.")
 
-            new_labels = (filled_label_map == 0) & am_mask # both AM and unlabelled
-            
-            if not np.any(new_labels):
-                break 
+    img = tif.imread(input_path)
 
-            filled_label_map[new_labels] = dilated_map[new_labels]
+    am_mask = (img == 1)
 
-        if np.any((filled_label_map == 0) & am_mask):
-            raise ValueError(f"Gap filling did not complete successfully even after {max_iter} iterations. Try increasing max_iter.")
+    if low_memory:
+        distance = distance_transform_edt_slabs(am_mask)
 
-        return filled_label_map
+        ndi.gaussian_filter(distance, sigma=sigma, output=distance)
 
+        local_maxi = morphology.local_maxima(distance)
 
-    img = tif.imread(input_path)
+        markers, _ = ndi.label(local_maxi, structure=np.ones((3,) * local_maxi.ndim), output=np.int32)
+        del local_maxi
 
-    am_mask = (img == 1)
+        np.negative(distance, out=distance)
+        label_map = segmentation.watershed(distance, markers, mask=am_mask, compactness=compactness)
+        del distance, markers
 
-    # Compute distance transform
-    distance = ndi.distance_transform_edt(am_mask)
+    else:
+        # Compute distance transform
+        distance = ndi.distance_transform_edt(am_mask)
 
-    # Smooth distance map to prevent over-segmentation 
-    distance = ndi.gaussian_filter(distance, sigma=sigma)  
+        # Smooth distance map to prevent over-segmentation 
+        distance = ndi.gaussian_filter(distance, sigma=sigma)  
 
-    # Identify local maxima
-    local_maxi = morphology.local_maxima(distance)
+        # Identify local maxima
+        local_maxi = morphology.local_maxima(distance)
 
-    # Label markers
-    markers = measure.label(local_maxi)
+        # Label markers
+        markers = measure.label(local_maxi)
 
-    # Apply watershed
-    label_map = segmentation.watershed(-distance, markers, mask=am_mask, compactness=compactness)
+        # Apply watershed
+        label_map = segmentation.watershed(-distance, markers, mask=am_mask, compactness=compactness)
 
     if ((label_map == 0.0) & (img == 1.0)).any():
         label_map = gap_filling(am_mask, label_map)
 
     if show_image:
+        from matplotlib import pyplot as plt
+
         if img.shape[2] > 1e5:
             x = np.linspace(0, img.shape[0], 5)
 
@@ -127,5 +238,7 @@ def generate_label_map(input_path, write_path, show_image=False, sigma=2.0, comp
 
     check_all_particles(img, label_map)
 
-    # Save result
-    tif.imwrite(write_path, label_map.astype(np.uint16))
\ No newline at end of file
+    # Save result, uint16 only holds 65535 particles
+    dtype = np.uint16 if label_map.max() <= np.iinfo(np.uint16).max else np.uint32
+    label_map = label_map.astype(dtype, copy=False)
+    tif.imwrite(write_path, label_map, bigtiff=label_map.nbytes > 2**32 - 2**25)
\ No newline at end of file
@@ -0,0 +1,331 @@
+# This file runs the watershed of generate_label_map on overlapping tiles in a process pool, for scans too large to segment in memory
+
+import os
+import itertools
+import numpy as np
+import tifffile as tif
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from scipy import ndimage as ndi
+from skimage import measure, morphology, segmentation
+
+from solveclosure.generate_label_map import gap_filling
+
+
+def open_image_out_of_core(input_path, scratch_path):
+    """
+    Opens an image without loading it into memory. Uncompressed tifs are memory-mapped directly,
+    otherwise the image is read once and written to a scratch .npy file which is memory-mapped instead.
+
+    Args:
+        input_path (str): The path to the electrode image.
+        scratch_path (str): The path to a scratch .npy file, used if the tif cannot be memory-mapped.
+
+    Returns:
+        image_path (str): The path that tiles should be read from.
+    """
+
+    try:
+        tif.memmap(input_path, mode='r')
+        return input_path
+    except ValueError:
+        np.save(scratch_path, tif.imread(input_path))
+        return scratch_path
+
+
+def read_block(image_path, slices):
+    # reads a block of the image from a memory-mapped tif or npy file
+    if image_path.endswith(".npy"):
+        img = np.load(image_path, mmap_mode='r')
+    else:
+        img = tif.memmap(image_path, mode='r')
+    return np.array(img[slices])
+
+
+def read_block_shape(image_path):
+    # the shape of a memory-mapped tif or npy image
+    if image_path.endswith(".npy"):
+        return np.load(image_path, mmap_mode='r').shape
+    return tif.memmap(image_path, mode='r').shape
+
+
+def segment_tile(image_path, shape, core_slices, halo, seam_width, sigma, compactness):
+    """
+    Runs the watershed on one tile plus its halo.
+
+    Args:
+        image_path (str): The path to the memory-mapped image.
+        shape (tuple): The shape of the entire image.
+        core_slices (tuple): The slices of the tile core in the entire image.
+        halo (int): The number of voxels added to each side of the core.
+        seam_width (int): The width of the slab beyond the upper faces of the core used to reconcile labels with neighbouring tiles.
+        sigma (float): The standard deviation for Gaussian smoothing applied to the distance map.
+        compactness (float): A parameter for the watershed algorithm which adjusts region shapes.
+
+    Returns:
+        core_labels (nd array): The labels of the tile core, numbered consecutively from 1.
+        seam_labels (dict): For each axis, the labels (using the core numbering) in the slab beyond the upper face of the core.
+    """
+
+    ext_slices = tuple(slice(max(0, s.start - halo), min(n, s.stop + halo)) for s, n in zip(core_slices, shape))
+    block = read_block(image_path, ext_slices)
+
+    am_mask = (block == 1)
+
+    distance = ndi.distance_transform_edt(am_mask)
+    distance = ndi.gaussian_filter(distance, sigma=sigma)
+    local_maxi = morphology.local_maxima(distance)
+    markers = measure.label(local_maxi)
+    labels = segmentation.watershed(-distance, markers, mask=am_mask, compactness=compactness)
+
+    if ((labels == 0) & am_mask).any():
+        labels = gap_filling(am_mask, labels)
+
+    # position of the core within the block
+    local_core = tuple(slice(s.start - e.start, s.stop - e.start) for s, e in zip(core_slices, ext_slices))
+
+    core_labels = labels[local_core]
+    core_ids, core_labels = np.unique(core_labels, return_inverse=True)
+    core_labels = core_labels.reshape(labels[local_core].shape).astype(np.uint32)
+    if core_ids[0] != 0:
+        # no background in the core, so shift the numbering to begin at 1
+        core_labels += 1
+        core_ids = np.concatenate(([0], core_ids))
+
+    seam_labels = {}
+    for axis in range(3):
+        if core_slices[axis].stop >= shape[axis]:
+            continue
+        seam = list(local_core)
+        seam[axis] = slice(local_core[axis].stop, local_core[axis].stop + seam_width)
+        seam_block = labels[tuple(seam)]
+        # labels of particles that are not in the core are ignored
+        positions = np.searchsorted(core_ids, seam_block)
+        positions[positions >= len(core_ids)] = 0
+        seam_labels[axis] = np.where(core_ids[positions] == seam_block, positions, 0).astype(np.uint32)
+
+    return core_labels, seam_labels
+
+
+def generate_label_map_tiled(input_path, write_path, tile_shape, max_particle_radius, sigma=2.0, compactness=0.01, n_workers=None):
+    """
+    Generates and writes a label map using the watershed of generate_label_map on overlapping tiles in a process pool.
+    The halo around each tile covers the largest particle and the Gaussian support, labels are reconciled across tile seams
+    using a union-find of the overlapping labels, and the uint32 label map is written to a BigTIFF tile by tile.
+
+    Args:
+        input_path (str): The path to the electrode image (electrolyte labelled 0, active material 1, and CBD 2).
+        write_path (str): The path to where the label map will be written to.
+        tile_shape (tuple): The shape of the tile cores, e.g. (256, 256, 256).
+        max_particle_radius (float): The radius of the largest particle in voxels.
+        sigma (float): The standard deviation for Gaussian smoothing applied to the distance map. Prevents over-segmentation (higher sigma = fewer particles).
+        compactness (float): A parameter for the watershed algorithm which adjusts region shapes.
+        n_workers (int, optional): The number of worker processes. Default is the number of CPUs. At most twice as many tiles are
+        segmented (or waiting to be written) at once, which bounds the memory used.
+
+    Returns:
+        n_particles (int): The number of particles in the label map.
+    """
+
+    scratch_path = write_path + ".scratch.npy"
+    image_path = open_image_out_of_core(input_path, scratch_path)
+    shape = read_block_shape(image_path)
+
+    # a marker can be up to a particle diameter away from the core, and the smoothing reaches a further 4 sigma
+    halo = int(np.ceil(2 * max_particle_radius + 4 * sigma)) + 1
+    seam_width = min(2, halo)
+
+    tiles = []
+    for starts in itertools.product(*[range(0, n, t) for n, t in zip(shape, tile_shape)]):
+        tiles.append(tuple(slice(start, min(start + t, n)) for start, t, n in zip(starts, tile_shape, shape)))
+
+    print(f"Segmenting {len(tiles)} tiles with a halo of {halo} voxels.")
+
+    label_map = tif.memmap(write_path, shape=shape, dtype=np.uint32, bigtiff=True)
+
+    offsets = {}
+    seams = {}
+    n_labels = 0
+
+    if n_workers is None:
+        n_workers = os.cpu_count()
+    queued_tiles = iter(enumerate(tiles))
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        # only a bounded number of tiles are submitted at once, and each result is released once written, so the label map is never held in memory
+        futures = {executor.submit(segment_tile, image_path, shape, core_slices, halo, seam_width, sigma, compactness): idx
+                   for idx, core_slices in itertools.islice(queued_tiles, 2 * n_workers)}
+
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                idx = futures.pop(future)
+                core_labels, seam_labels = future.result()
+
+                # give the tile a unique range of global IDs
+                offsets[idx] = n_labels
+                n_tile_labels = int(core_labels.max())
+                label_map[tiles[idx]] = np.where(core_labels > 0, core_labels + n_labels, 0)
+                seams[idx] = seam_labels
+                n_labels += n_tile_labels
+                del core_labels, seam_labels
+
+                for next_idx, core_slices in itertools.islice(queued_tiles, 1):
+                    futures[executor.submit(segment_tile, image_path, shape, core_slices, halo, seam_width, sigma, compactness)] = next_idx
+
+    label_map.flush()
+
+    # union-find over the global IDs of labels that overlap across tile seams
+    parent = np.arange(n_labels + 1)
+
+    tile_index = {tuple(s.start for s in core_slices): idx for idx, core_slices in enumerate(tiles)}
+
+    for idx, core_slices in enumerate(tiles):
+        for axis, seam in seams[idx].items():
+            # the seam slab lies in the core of the next tile along this axis
+            neighbour_starts = [s.start for s in core_slices]
+            neighbour_starts[axis] = core_slices[axis].stop
+            neighbour_idx = tile_index[tuple(neighbour_starts)]
+
+            neighbour_seam = list(core_slices)
+            neighbour_seam[axis] = slice(core_slices[axis].stop, core_slices[axis].stop + seam.shape[axis])
+            neighbour_labels = np.array(label_map[tuple(neighbour_seam)])
+
+            own_labels = np.where(seam > 0, seam.astype(np.int64) + offsets[idx], 0)
+
+            both = (own_labels > 0) & (neighbour_labels > 0)
+            if not both.any():
+                continue
+            pairs, pair_counts = np.unique(np.stack([own_labels[both], neighbour_labels[both]]), axis=1, return_counts=True)
+            own_ids, own_counts = np.unique(own_labels[own_labels > 0], return_counts=True)
+            neighbour_ids, neighbour_counts = np.unique(neighbour_labels[neighbour_labels > 0], return_counts=True)
+            own_counts = dict(zip(own_ids, own_counts))
+            neighbour_counts = dict(zip(neighbour_ids, neighbour_counts))
+
+            # the same particle seen from both tiles overlaps for most of its seam cross-section
+            for (a, b), count in zip(pairs.T, pair_counts):
+                if count >= 0.5 * min(own_counts[a], neighbour_counts[b]):
+                    root_a, root_b = find_root(parent, a), find_root(parent, b)
+                    if root_a != root_b:
+                        parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    roots = np.array([find_root(parent, i) for i in range(n_labels + 1)])
+    unique_roots, lookup = np.unique(roots, return_inverse=True)
+    lookup = lookup.astype(np.uint32)
+    n_particles = len(unique_roots) - 1
+
+    # relabel tile by tile so that the particle IDs are consecutive
+    for core_slices in tiles:
+        label_map[core_slices] = lookup[label_map[core_slices]]
+    label_map.flush()
+
+    # the seams are merged on overlap alone, so check the particles of the stitched map
+    try:
+        check_tiled_label_map(image_path, label_map, tiles, n_particles, 2 * max_particle_radius + 1)
+    finally:
+        del label_map
+        if os.path.exists(scratch_path):
+            os.remove(scratch_path)
+
+    print(f"The tiled label map contains {n_particles} particles.")
+
+    return n_particles
+
+
+def check_tiled_label_map(image_path, label_map, tiles, n_particles, max_extent):
+    """
+    Checks a stitched label map tile by tile, as generate_label_map checks a label map in memory: all AM is labelled, and each particle
+    contains AM, no electrolyte, and is a single connected component. The components of each tile are joined across the tile faces with a
+    union-find, so a particle is fragmented if seam labels which do not touch were merged. Particles merged across a seam where they touch
+    are connected, so particles longer than max_extent along an axis are also reported as likely merges.
+
+    Args:
+        image_path (str): The path to the memory-mapped image.
+        label_map (nd array): The memory-mapped label map.
+        tiles (list): The slices of the tile cores, which cover the image.
+        n_particles (int): The number of particles in the label map.
+        max_extent (float): The largest expected extent of a particle in voxels (the diameter of the largest particle).
+    """
+
+    n_voxels = np.zeros(n_particles + 1, dtype=np.int64)
+    n_am = np.zeros(n_particles + 1, dtype=np.int64)
+    lower = np.full((n_particles + 1, 3), np.iinfo(np.int64).max)
+    upper = np.full((n_particles + 1, 3), -1)
+
+    # the connected components of each tile, numbered globally, with the components on the lower and upper faces of the tile
+    component_labels = [np.zeros(1, dtype=np.int64)]
+    faces = {}
+    n_components = 0
+
+    for idx, core_slices in enumerate(tiles):
+        labels = np.array(label_map[core_slices]).astype(np.int64)
+        img = read_block(image_path, core_slices)
+
+        if ((labels == 0) & (img == 1)).any():
+            raise ValueError("Some AM regions were not labelled.")
+
+        n_voxels += np.bincount(labels.ravel(), minlength=n_particles + 1)
+        n_am += np.bincount(labels.ravel(), weights=(img.ravel() == 1), minlength=n_particles + 1).astype(np.int64)
+
+        starts = [s.start for s in core_slices]
+        for i, obj in enumerate(ndi.find_objects(labels)):
+            if obj is not None:
+                lower[i + 1] = np.minimum(lower[i + 1], [s.start + start for s, start in zip(obj, starts)])
+                upper[i + 1] = np.maximum(upper[i + 1], [s.stop - 1 + start for s, start in zip(obj, starts)])
+
+        components, n_tile_components = measure.label(labels, connectivity=1, background=0, return_num=True)
+        tile_component_labels = np.zeros(n_tile_components + 1, dtype=np.int64)
+        tile_component_labels[components.ravel()] = labels.ravel()
+        component_labels.append(tile_component_labels[1:])
+
+        components = np.where(components > 0, components + n_components, 0)
+        faces[idx] = [(components.take(0, axis=axis), components.take(-1, axis=axis)) for axis in range(3)]
+        n_components += n_tile_components
+
+    component_labels = np.concatenate(component_labels)
+
+    # components of the same particle which touch across a tile face are one component
+    parent = np.arange(n_components + 1)
+    tile_index = {tuple(s.start for s in core_slices): idx for idx, core_slices in enumerate(tiles)}
+    for idx, core_slices in enumerate(tiles):
+        for axis in range(3):
+            neighbour_starts = [s.start for s in core_slices]
+            neighbour_starts[axis] = core_slices[axis].stop
+            if tuple(neighbour_starts) not in tile_index:
+                continue
+            own = faces[idx][axis][1]
+            neighbour = faces[tile_index[tuple(neighbour_starts)]][axis][0]
+            joined = (own > 0) & (component_labels[own] == component_labels[neighbour])
+            for a, b in np.unique(np.stack([own[joined], neighbour[joined]]), axis=1).T:
+                root_a, root_b = find_root(parent, a), find_root(parent, b)
+                if root_a != root_b:
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    roots = np.unique([find_root(parent, i) for i in range(1, n_components + 1)]).astype(np.int64)
+    n_fragments = np.bincount(component_labels[roots], minlength=n_particles + 1)
+
+    contains_elec = n_am != n_voxels
+    no_am = n_am == 0
+    fragmented = n_fragments > 1
+
+    bad = np.flatnonzero(contains_elec | no_am | fragmented)
+    bad = bad[bad > 0]
+    if len(bad) > 0:
+        i = bad[0]
+        if contains_elec[i]:
+            raise ValueError(f"Particle {i} contains electrolyte")
+        if no_am[i]:
+            raise ValueError(f"Particle {i} contains no AM")
+        raise ValueError(f"Particle {i} is fragmented into {n_fragments[i]} components, which suggests that particles were merged across a tile seam.")
+
+    oversized = np.flatnonzero((upper - lower + 1).max(axis=1) > max_extent)
+    if len(oversized) > 0:
+        print(f"\nWarning: {len(oversized)} particles are longer than the largest particle diameter ({max_extent:g} voxels), and may be particles "
+              f"merged across a tile seam: {oversized[:10].tolist()}{' ...' if len(oversized) > 10 else ''}")
+
+
+def find_root(parent, i):
+    # the root of i in a union-find, halving the path on the way
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
@@ -0,0 +1,5 @@
+from .write_sbatch_array_script import write_sbatch_array_script
+from .launch_closure_array import launch_closure_array
+from .run_array_task import run_array_task
+from .check_closure_array import check_closure_array
+from .gather_closure_array_results import gather_closure_array_results
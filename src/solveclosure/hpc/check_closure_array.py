@@ -0,0 +1,58 @@
+import re
+import json
+import subprocess
+
+
+def check_closure_array(launch_path):
+    """
+    Reads the state of each case of a launch (see launch_closure_array) from the SLURM accounting with sacct.
+
+    Args:
+        launch_path (str): The path to the launch file (launch.json) written by launch_closure_array.
+
+    Returns:
+        states (list): The state of each case, e.g. "PENDING", "RUNNING", "COMPLETED" or "FAILED". "UNKNOWN" if the case is not in the
+        accounting yet, e.g. just after it was submitted.
+    """
+
+    with open(launch_path, 'r') as f:
+        launch = json.load(f)
+
+    job_ids = {job_array["job id"]: group for group, job_array in enumerate(launch["groups"]) if job_array["job id"] is not None}
+    states = ["UNKNOWN"] * len(launch["cases"])
+    if not job_ids:
+        return states
+
+    result = subprocess.run(["sacct", "-j", ",".join(job_ids), "--format=JobID,State,ExitCode", "--parsable2", "--noheader"],
+                            capture_output=True, text=True, check=True)
+
+    for job_id, task_ids, state in parse_sacct_output(result.stdout):
+        if job_id not in job_ids:
+            continue
+        cases = launch["groups"][job_ids[job_id]]["cases"]
+        for task_id in task_ids:
+            if task_id < len(cases):
+                states[cases[task_id]] = state
+
+    return states
+
+
+def parse_sacct_output(output):
+    # yields the job ID, array task IDs and state of each line of sacct --parsable2. The steps of a task (e.g. 123_4.batch) are skipped.
+    # Pending tasks are listed together as 123_[5-9,11%4], and the state of a cancelled job may read "CANCELLED by <uid>".
+    for line in output.splitlines():
+        fields = line.strip().split("|")
+        if len(fields) < 2 or "." in fields[0] or "_" not in fields[0]:
+            continue
+        job_id, tasks = fields[0].split("_", 1)
+        state = fields[1].split()[0] if fields[1].strip() else "UNKNOWN"
+
+        task_ids = []
+        for part in tasks.strip("[]").split("%")[0].split(","):
+            match = re.fullmatch(r"(\d+)(?:-(\d+))?", part)
+            if match is not None:
+                first = int(match.group(1))
+                last = int(match.group(2)) if match.group(2) is not None else first
+                task_ids.extend(range(first, last + 1))
+
+        yield job_id, task_ids, state
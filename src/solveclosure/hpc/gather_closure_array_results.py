@@ -0,0 +1,55 @@
+import os
+import json
+import time
+import pickle
+
+from solveclosure.hpc.check_closure_array import check_closure_array
+
+TERMINAL_STATES = ["COMPLETED", "FAILED", "CANCELLED", "TIMEOUT", "OUT_OF_MEMORY", "NODE_FAIL", "PREEMPTED", "BOOT_FAIL", "DEADLINE"]
+
+
+def gather_closure_array_results(launch_dir, wait=False, poll_interval=60, timeout=None):
+    """
+    Gathers the closure data of the cases of a launch (see launch_closure_array), optionally waiting for every case to finish.
+
+    Args:
+        launch_dir (str): The launch directory passed to launch_closure_array.
+        wait (bool): If True, polls sacct until every case has finished (completed or failed).
+        poll_interval (float): The time in seconds between polls.
+        timeout (float, optional): The most time in seconds to wait. If None, waits until every case has finished.
+
+    Returns:
+        results (list): The closure data of each case, or None if the case has not completed with processed closure results.
+        states (list): The SLURM state of each case.
+    """
+
+    launch_path = os.path.join(launch_dir, "launch.json")
+    start_time = time.perf_counter()
+
+    while True:
+        states = check_closure_array(launch_path)
+        finished = all(state in TERMINAL_STATES for state in states)
+        if finished or not wait or (timeout is not None and time.perf_counter() - start_time > timeout):
+            break
+        print(f"{states.count('COMPLETED')} of {len(states)} cases completed.")
+        time.sleep(poll_interval)
+
+    with open(launch_path, 'r') as f:
+        launch = json.load(f)
+
+    results = []
+    for idx, (case, state) in enumerate(zip(launch["cases"], states)):
+        closure_data_path = os.path.join(case["arguments"]["case_dir"], "closure_data.pickle")
+        closure_data = None
+        if state == "COMPLETED" and os.path.exists(closure_data_path):
+            with open(closure_data_path, 'rb') as f:
+                closure_data = pickle.load(f)
+            # the closure data is written before the solve, so it is only a result once the solver outputs have been processed
+            if closure_data.get("global s surface average steady") is None:
+                closure_data = None
+
+        if closure_data is None and state in TERMINAL_STATES:
+            print(f"\nCase {idx} ({case['arguments']['case_dir']}) ended with state {state} and no closure results.")
+        results.append(closure_data)
+
+    return results, states
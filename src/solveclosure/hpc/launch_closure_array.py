@@ -0,0 +1,103 @@
+import os
+import json
+import math
+import itertools
+import subprocess
+import numpy as np
+import tifffile as tif
+
+from solveclosure.utility import add_slash
+from solveclosure.hpc.write_sbatch_array_script import write_sbatch_array_script
+
+
+def launch_closure_array(launch_dir, cases=None, grid=None, base_case=None, partition=None, time_limit=None, setup_cmd=None, python_cmd="python3",
+                         cores_per_node=64, cells_per_core=50000, max_procs=64, max_concurrent=None, submit=True):
+    """
+    Solves many closure cases on a SLURM cluster as job arrays, one array task per case. Cases are given as a list, or as a parameter grid.
+    The resources of a case follow its n_procs if parallelise is set, and otherwise its size: one core per cells_per_core AM voxels
+    (up to max_procs), with the case then solved in parallel on that many cores. Cases with the same core and node counts are grouped into
+    one job array, whose sbatch script (written by write_sbatch_array_script) is submitted with sbatch --array. The cases, groups
+    and job IDs are kept in launch_dir/launch.json, which check_closure_array and gather_closure_array_results read.
+
+    Args:
+        launch_dir (str): The directory for the launch file, the sbatch scripts, the logs, and the case directories (cases/case_<i>).
+        cases (list, optional): The arguments of solve_closure_multiparticle for each case, as dictionaries (without case_dir, unless
+        the case should be solved elsewhere). The values must be JSON serialisable.
+        grid (dict, optional): Lists of values of arguments of solve_closure_multiparticle, e.g. {"cbd_surf_por": [0.2, 0.5, 0.8]}.
+        A case is made for every combination, on top of base_case.
+        base_case (dict, optional): The arguments shared by the cases of the grid, e.g. the img_path, label_map_path and voxel.
+        partition (str, optional): The partition to submit to.
+        time_limit (str, optional): The time limit of each case, e.g. "12:00:00".
+        setup_cmd (str, optional): Commands run before each case, e.g. "module load openfoam && source /path/to/venv/bin/activate".
+        python_cmd (str): The Python interpreter with solveclosure installed, on the compute nodes.
+        cores_per_node (int): The number of cores of a node, to choose the number of nodes of a case.
+        cells_per_core (int): The number of AM voxels (mesh cells) per core of cases without n_procs.
+        max_procs (int): The most cores given to a case without n_procs.
+        max_concurrent (int, optional): The most array tasks of a job array which run at once (the %N of --array).
+        submit (bool): Set to False to write the scripts without submitting them.
+
+    Returns:
+        launch (dict): The cases (with their case_dir and resources), and the job array of each group, with its job ID if submitted.
+    """
+
+    if (cases is None) == (grid is None):
+        raise ValueError("\nEither cases or grid must be provided.")
+
+    launch_dir = add_slash(os.path.abspath(launch_dir))
+    log_dir = launch_dir + "logs/"
+    os.makedirs(log_dir, exist_ok=True)
+
+    if grid is not None:
+        keys = list(grid.keys())
+        cases = [{**(base_case or {}), **dict(zip(keys, values))} for values in itertools.product(*[grid[key] for key in keys])]
+
+    launch_cases = []
+    for idx, case in enumerate(cases):
+        case = dict(case)
+        for key in ["img_path", "label_map_path"]:
+            if key not in case:
+                raise ValueError(f"\nCase {idx} has no {key}.")
+            case[key] = os.path.abspath(case[key])
+        case["case_dir"] = add_slash(os.path.abspath(case.get("case_dir", launch_dir + f"cases/case_{idx}")))
+        os.makedirs(case["case_dir"], exist_ok=True)
+
+        # the cores of the case, from n_procs if set and otherwise from the number of AM voxels
+        if "parallelise" in case or "n_procs" in case:
+            n_tasks = case.get("n_procs", 8) if case.get("parallelise", False) else 1
+        else:
+            n_cells = int(np.sum(tif.imread(case["img_path"]) == 1))
+            n_tasks = int(min(max_procs, max(1, math.ceil(n_cells / cells_per_core))))
+            if n_tasks > 1:
+                case["parallelise"], case["n_procs"] = True, n_tasks
+
+        launch_cases.append({"arguments": case, "n tasks": n_tasks, "n nodes": math.ceil(n_tasks / cores_per_node)})
+
+    # one job array for each set of resources
+    groups = []
+    for (n_tasks, n_nodes), members in itertools.groupby(sorted(range(len(launch_cases)), key=lambda idx: (launch_cases[idx]["n tasks"], launch_cases[idx]["n nodes"])),
+                                                        key=lambda idx: (launch_cases[idx]["n tasks"], launch_cases[idx]["n nodes"])):
+        groups.append({"cases": list(members), "n tasks": n_tasks, "n nodes": n_nodes, "script": launch_dir + f"solveclosure_array_{len(groups)}.sh", "job id": None})
+
+    launch_path = launch_dir + "launch.json"
+    launch = {"cases": launch_cases, "groups": groups}
+
+    for group, job_array in enumerate(groups):
+        write_sbatch_array_script(job_array["script"], launch_path, group, job_array["n tasks"], job_array["n nodes"], log_dir,
+                                  partition=partition, time_limit=time_limit, setup_cmd=setup_cmd, python_cmd=python_cmd)
+
+    # the launch file is written before submitting, so that the array tasks can read it
+    with open(launch_path, 'w') as f:
+        json.dump(launch, f, indent=1)
+
+    if submit:
+        for group, job_array in enumerate(groups):
+            array = f"0-{len(job_array['cases']) - 1}" + (f"%{max_concurrent}" if max_concurrent is not None else "")
+            result = subprocess.run(["sbatch", "--parsable", f"--array={array}", job_array["script"]], capture_output=True, text=True, check=True)
+            # --parsable prints the job ID, followed by ;cluster on multi-cluster systems
+            job_array["job id"] = result.stdout.strip().split(";")[0]
+            print(f"Submitted job array {job_array['job id']} of {len(job_array['cases'])} cases with {job_array['n tasks']} cores on {job_array['n nodes']} nodes each.")
+
+        with open(launch_path, 'w') as f:
+            json.dump(launch, f, indent=1)
+
+    return launch
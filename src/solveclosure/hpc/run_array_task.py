@@ -0,0 +1,38 @@
+import os
+import json
+import pickle
+
+
+def run_array_task(launch_path, group, task_id):
+    """
+    Solves the case of an array task of a job array submitted by launch_closure_array. The sbatch script of the array runs it as
+    run_array_task(launch_path, group, $SLURM_ARRAY_TASK_ID). If the watchdog killed the solver (see solve_closure_multiparticle), a
+    RuntimeError is raised, so that the array task fails instead of completing without results.
+
+    Args:
+        launch_path (str): The path to the launch file (launch.json) written by launch_closure_array.
+        group (int): The group of cases solved by the job array.
+        task_id (int): The index of the array task, i.e. of the case in the group.
+
+    Returns:
+        trace (Trace): The trace of the case (see solve_closure_multiparticle).
+    """
+
+    from solveclosure import solve_closure_multiparticle
+
+    with open(launch_path, 'r') as f:
+        launch = json.load(f)
+
+    idx = launch["groups"][int(group)]["cases"][int(task_id)]
+    print(f"Solving case {idx} of the launch {launch_path}.")
+
+    arguments = launch["cases"][idx]["arguments"]
+    trace = solve_closure_multiparticle(**arguments)
+
+    with open(os.path.join(arguments["case_dir"], "closure_data.pickle"), 'rb') as f:
+        closure_data = pickle.load(f)
+    reason = closure_data.get("solver watchdog", {}).get("reason")
+    if reason is not None:
+        raise RuntimeError(f"\nThe solver of case {idx} was killed by the watchdog ({reason}).")
+
+    return trace
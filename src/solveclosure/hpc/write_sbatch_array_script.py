@@ -0,0 +1,44 @@
+def write_sbatch_array_script(script_path, launch_path, group, n_tasks, n_nodes, log_dir, job_name="solveclosure", partition=None, time_limit=None, setup_cmd=None, python_cmd="python3"):
+    """
+    Writes an sbatch script for a SLURM job array, in which each array task solves one case of a group of cases with the same resources
+    (see launch_closure_array). It replaces editing templates/sbatch_launch_script.sh by hand.
+
+    Args:
+        script_path (str): The path to the sbatch script.
+        launch_path (str): The path to the launch file (launch.json) which lists the cases and the cases of each group.
+        group (int): The group of cases solved by the array.
+        n_tasks (int): The number of MPI tasks (cores) of each array task, i.e. n_procs of the cases, or 1 for serial cases.
+        n_nodes (int): The number of nodes of each array task.
+        log_dir (str): The directory of the output and error files of the array tasks (%A_%a.out and %A_%a.err).
+        job_name (str): The name of the job.
+        partition (str, optional): The partition to submit to. If None, the default partition of the cluster.
+        time_limit (str, optional): The time limit of each array task, e.g. "12:00:00". If None, the default of the partition.
+        setup_cmd (str, optional): Commands run before the case, e.g. "module load openfoam && source /path/to/venv/bin/activate".
+        python_cmd (str): The Python interpreter with solveclosure installed.
+
+    Returns:
+    """
+
+    content = f"""#!/bin/bash
+#SBATCH --job-name={job_name}_{group}
+#SBATCH --ntasks={n_tasks}
+#SBATCH --cpus-per-task=1
+#SBATCH --nodes={n_nodes}
+#SBATCH --comment="OpenFOAM"
+#SBATCH --output={log_dir}%A_%a.out
+#SBATCH --error={log_dir}%A_%a.err
+"""
+    if partition is not None:
+        content += f"#SBATCH --partition={partition}\n"
+    if time_limit is not None:
+        content += f"#SBATCH --time={time_limit}\n"
+
+    content += "\nexport OMP_NUM_THREADS=1\n\n"
+    if setup_cmd is not None:
+        content += f"{setup_cmd}\n\n"
+
+    # the array task solves the case of its index in the group
+    content += f"{python_cmd} -c \"from solveclosure.hpc import run_array_task; run_array_task('{launch_path}', {group}, $SLURM_ARRAY_TASK_ID)\"\n"
+
+    with open(script_path, 'w') as f:
+        f.write(content)
@@ -4,3 +4,9 @@ from .calculate_source_terms_dimensionless import calculate_source_terms_dimensi
 from .check_and_write_area_and_volume_total import check_and_write_area_and_volume_total
 from .return_x_positions import return_x_positions
 from .subdivide_image_using_label_map import subdivide_image_using_label_map
+from .partition_particles_across_processors import partition_particles_across_processors
+from .colour_neighbour_graph import colour_neighbour_graph
+from .return_region_cell_labels import return_region_cell_labels
+from .crop_and_relabel_subvolume import crop_and_relabel_subvolume
+from .coarsen_image_and_label_map import coarsen_image_and_label_map
+from .estimate_time_params import estimate_time_params
\ No newline at end of file
@@ -0,0 +1,80 @@
+import numpy as np
+from skimage import measure
+
+def coarsen_image_and_label_map(img, label_map, factor):
+    """
+    Coarsens the electrode image and label map by an integer factor using a majority vote in each block of factor^3 voxels. 
+    Each coarse voxel takes the most common particle ID of its block (ties go to the larger ID), and coarse voxels without a particle 
+    take the most common of electrolyte and CBD. Coarsening can split a particle, so only its largest piece keeps its ID, the other pieces 
+    are merged into the particle they touch using gap filling, and particles are renumbered consecutively from 1.
+    If the image dimensions are not multiples of the factor, the remainder is cropped. 
+
+    Args:
+        img (nd array): The electrode image (electrolyte labelled 0, active material 1, and CBD 2).
+        label_map (nd array): The label map which identifies particle IDs.
+        factor (int): The coarsening factor.
+
+    Returns:
+        img_coarse (nd array): The coarsened electrode image.
+        label_map_coarse (nd array): The coarsened label map in which every particle is connected.
+    """
+
+    from solveclosure.generate_label_map import gap_filling
+
+    coarse_shape = tuple(n // factor for n in img.shape)
+    if any(n == 0 for n in coarse_shape):
+        raise ValueError(f"The image of shape {img.shape} is too small to coarsen by a factor of {factor}.")
+    if any(n % factor != 0 for n in img.shape):
+        print(f"\nWarning: the image shape {img.shape} is not a multiple of {factor}, the remainder is cropped before coarsening.")
+
+    crop = tuple(slice(0, n * factor) for n in coarse_shape)
+
+    def blocks(array):
+        # (coarse voxels, factor^3) view of the blocks
+        shape = [s for n in coarse_shape for s in (n, factor)]
+        return array[crop].reshape(shape).transpose(0, 2, 4, 1, 3, 5).reshape(-1, factor**3)
+
+    # the most common ID of each block, from the run lengths of the sorted IDs
+    ids = np.sort(blocks(label_map), axis=1)
+    positions = np.arange(ids.shape[1])
+    is_start = np.ones(ids.shape, dtype=bool)
+    is_start[:, 1:] = ids[:, 1:] != ids[:, :-1]
+    is_end = np.ones(ids.shape, dtype=bool)
+    is_end[:, :-1] = is_start[:, 1:]
+    run_start = np.maximum.accumulate(np.where(is_start, positions, 0), axis=1)
+    run_end = np.minimum.accumulate(np.where(is_end, positions, ids.shape[1])[:, ::-1], axis=1)[:, ::-1]
+    run_length = run_end - run_start + 1
+    most_common = ids.shape[1] - 1 - np.argmax(run_length[:, ::-1], axis=1)
+    label_map_coarse = ids[np.arange(len(ids)), most_common].reshape(coarse_shape)
+    del ids, is_start, is_end, run_start, run_end, run_length
+
+    img_blocks = blocks(img)
+    more_cbd = np.sum(img_blocks == 2, axis=1) > np.sum(img_blocks == 0, axis=1)
+    img_coarse = np.where(more_cbd, 2, 0).reshape(coarse_shape).astype(img.dtype)
+    am_mask = label_map_coarse > 0
+    img_coarse[am_mask] = 1
+
+    # keep the largest piece of each particle, and merge the other pieces into the particles they touch
+    components, n_components = measure.label(label_map_coarse, connectivity=1, background=0, return_num=True)
+    if n_components > 0:
+        sizes = np.bincount(components.ravel(), minlength=n_components + 1)
+        component_labels = np.zeros(n_components + 1, dtype=np.int64)
+        component_labels[components.ravel()] = label_map_coarse.ravel()
+        largest = np.zeros(label_map_coarse.max() + 1, dtype=np.int64)
+        order = np.lexsort((sizes[1:], component_labels[1:])) + 1
+        largest[component_labels[order]] = order # the last (largest) component of each label is written last
+        keep = np.zeros(n_components + 1, dtype=bool)
+        keep[largest[largest > 0]] = True
+        label_map_coarse = np.where(keep[components], label_map_coarse, 0)
+        if not keep[1:].all():
+            label_map_coarse = gap_filling(am_mask, label_map_coarse.astype(np.int64))
+
+    # renumber consecutively, since coarsening can remove small particles
+    present, label_map_coarse = np.unique(label_map_coarse, return_inverse=True)
+    label_map_coarse = label_map_coarse.reshape(coarse_shape)
+    if present[0] != 0:
+        label_map_coarse += 1
+
+    dtype = np.uint16 if label_map_coarse.max() <= np.iinfo(np.uint16).max else np.uint32
+
+    return img_coarse, label_map_coarse.astype(dtype)
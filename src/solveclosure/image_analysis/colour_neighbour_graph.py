@@ -0,0 +1,29 @@
+def colour_neighbour_graph(neighbour_ids):
+    """
+    Colours the particle neighbour graph so that no two contacting particles share a colour (greedy Welsh-Powell ordering). 
+    Particles with the same colour can be merged into one solver region.
+    
+    Args:
+        neighbour_ids (dict): The IDs of the components which particle i shares a boundary with.
+
+    Returns:
+        particle_colours (dict): The colour (beginning at 1) of each particle.
+    """
+
+    # only particle-particle contacts constrain the colouring
+    graph = {key: {id for id in neighbours if not isinstance(id, str) and id in neighbour_ids} for key, neighbours in neighbour_ids.items()}
+
+    # make the graph symmetric in case a contact was only detected from one side
+    for key, neighbours in list(graph.items()):
+        for id in neighbours:
+            graph[id].add(key)
+
+    particle_colours = {}
+    for key in sorted(graph, key=lambda key: (-len(graph[key]), key)):
+        used_colours = {particle_colours[id] for id in graph[key] if id in particle_colours}
+        colour = 1
+        while colour in used_colours:
+            colour += 1
+        particle_colours[key] = colour
+
+    return particle_colours
@@ -0,0 +1,31 @@
+import numpy as np
+from skimage import measure
+
+def crop_and_relabel_subvolume(img, label_map, start, shape):
+    """
+    Crops a subvolume from the electrode image and label map. Particles cut by the crop can be split into several pieces, 
+    so the cropped label map is relabelled with each connected piece as its own particle, numbered consecutively from 1.
+
+    Args:
+        img (nd array): The electrode image.
+        label_map (nd array): The label map which identifies particle IDs.
+        start (tuple): The index of the first voxel of the subvolume along each axis.
+        shape (tuple): The shape of the subvolume.
+
+    Returns:
+        img_crop (nd array): The cropped electrode image.
+        label_map_crop (nd array): The relabelled, cropped label map (uint16, or uint32 if there are more than 65535 particles).
+    """
+
+    if any(s < 0 or s + n > N for s, n, N in zip(start, shape, img.shape)):
+        raise ValueError(f"The subvolume starting at {tuple(start)} with shape {tuple(shape)} does not fit in the image of shape {img.shape}.")
+
+    slices = tuple(slice(s, s + n) for s, n in zip(start, shape))
+    img_crop = np.copy(img[slices])
+
+    # connected regions of equal label, so touching particles stay separate
+    label_map_crop = measure.label(label_map[slices], connectivity=1, background=0)
+
+    dtype = np.uint16 if label_map_crop.max() <= np.iinfo(np.uint16).max else np.uint32
+
+    return img_crop, label_map_crop.astype(dtype)
@@ -0,0 +1,80 @@
+import numpy as np
+from scipy import ndimage
+
+
+def estimate_time_params(label_map, neighbour_ids, voxel, dimensionless=True, D_s=None, L=None, allow_flux=True, n_diffusion_times=None, n_steps=100, n_writes=4):
+    """
+    Chooses the time parameters of the transient closure problem from the diffusion time scale l^2 / D of the largest domain the closure
+    variable diffuses through: the largest particle, or with allow_flux the largest cluster of contacting particles. l is the longest side
+    of the bounding box of the particle (or the union of the bounding boxes of the cluster).
+
+    Separate particles and compact clusters reach steady state (within 0.01 %) in one diffusion time. Clusters joined by narrow contacts
+    relax more slowly than their size suggests, so with allow_flux the run lasts 4 diffusion times, which brought synthetic packings within
+    about 0.5 % of steady state. Check the time to steady state of such cases (or use steady=True).
+    The maximum diffusion number is chosen so that the run takes about n_steps time steps once the time step has grown to its maximum,
+    and the initial time step has a diffusion number of 1.
+
+    Args:
+        label_map (nd array): The particle IDs (beginning at 1), 0 outside the AM.
+        neighbour_ids (dict): The IDs of the components which particle i shares a boundary with (from subdivide_image_using_label_map).
+        voxel (float): The voxel side length of the image in meters.
+        dimensionless (bool): Whether the case is dimensionless or not.
+        D_s (float): The diffusivity of the AM in m2.s-1. Required if dimensionless is False.
+        L (float): The lengthscale used (m) to non-dimensionalise the problem. Required if dimensionless is True.
+        allow_flux (bool): Set to False for closure Option 2, where each particle relaxes on its own.
+        n_diffusion_times (float, optional): The final time in diffusion times of the largest domain. Default is 4 with allow_flux and 1 without.
+        n_steps (int): The approximate number of time steps at the maximum diffusion number.
+        n_writes (int): The number of times the fields are written.
+
+    Returns:
+        time_params (dict): The time parameters "T_end", "dt", "write_interval" and "max_Di", and the "diffusion time" and "extent"
+        (in voxels) of the largest domain.
+    """
+
+    if dimensionless:
+        if L is None:
+            raise ValueError("\nL must be provided for a dimensionless case.")
+        h, D = voxel / L, 1
+    else:
+        if D_s is None:
+            raise ValueError("\nD_s must be provided for dimensional case.")
+        h, D = voxel, D_s
+
+    # the bounding box of each particle, from a single pass over the label map
+    boxes = {idx + 1: np.array([[s.start, s.stop] for s in box]) for idx, box in enumerate(ndimage.find_objects(label_map)) if box is not None}
+
+    # the particles which relax together: clusters of contacting particles with flux, otherwise each particle
+    cluster_ids = {key: key for key in boxes}
+    if allow_flux:
+        def find(key):
+            while cluster_ids[key] != key:
+                cluster_ids[key] = cluster_ids[cluster_ids[key]]
+                key = cluster_ids[key]
+            return key
+
+        for key, neighbours in neighbour_ids.items():
+            for id in neighbours:
+                if not isinstance(id, str) and id in boxes and key in boxes:
+                    cluster_ids[find(key)] = find(id)
+        cluster_ids = {key: find(key) for key in boxes}
+
+    cluster_boxes = {}
+    for key, box in boxes.items():
+        cluster = cluster_ids[key]
+        if cluster in cluster_boxes:
+            cluster_boxes[cluster] = np.column_stack([np.minimum(cluster_boxes[cluster][:, 0], box[:, 0]), np.maximum(cluster_boxes[cluster][:, 1], box[:, 1])])
+        else:
+            cluster_boxes[cluster] = box
+
+    extent = max(int(np.max(box[:, 1] - box[:, 0])) for box in cluster_boxes.values())
+    diffusion_time = (extent * h)**2 / D
+
+    if n_diffusion_times is None:
+        n_diffusion_times = 4.0 if allow_flux else 1.0
+
+    T_end = n_diffusion_times * diffusion_time
+    max_Di = T_end / n_steps * D / h**2
+    dt = min(h**2 / D, T_end / n_steps)
+
+    return {"T_end": float(T_end), "dt": float(dt), "write_interval": float(T_end / n_writes), "max_Di": float(max_Di),
+            "diffusion time": float(diffusion_time), "extent": extent}
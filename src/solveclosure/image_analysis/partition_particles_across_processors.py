@@ -0,0 +1,85 @@
+import numpy as np
+
+def partition_particles_across_processors(subsections, neighbour_ids, n_procs):
+    """
+    Assigns whole particles to processors by bin-packing their voxel counts. Each processor is grown
+    through the neighbour graph so that contacting particles are kept on the same processor where possible.
+
+    Args:
+        subsections (dict): The arrays for each particle subsection (the particle itself is labelled 1).
+        neighbour_ids (dict): The IDs of the components which particle i shares a boundary with.
+        n_procs (int): The number of processors used for parallelisation.
+
+    Returns:
+        particle_procs (dict): The processor assigned to each particle.
+        imbalance (float): The expected load imbalance, i.e. the maximum processor load divided by the mean load, minus 1.
+        n_cut_interfaces (int): The number of particle-particle interfaces that are split between processors.
+    """
+
+    sizes = {key: int(np.sum(subsection == 1)) for key, subsection in subsections.items()}
+
+    # only particle-particle contacts are relevant to the decomposition
+    graph = {key: [id for id in neighbour_ids[key] if not isinstance(id, str) and id in sizes] for key in sizes}
+
+    target = sum(sizes.values()) / n_procs
+    loads = [0] * n_procs
+    particle_procs = {}
+    unassigned = set(sizes)
+
+    def largest_fitting(capacity):
+        candidates = [key for key in unassigned if sizes[key] <= capacity]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda key: (sizes[key], -key))
+
+    for proc in range(n_procs):
+        if not unassigned:
+            break
+
+        # seed each processor with the largest particle left over
+        seed = max(unassigned, key=lambda key: (sizes[key], -key))
+        members = set()
+        frontier = {seed}
+        rejected = set()
+
+        while loads[proc] < target:
+            frontier -= rejected
+            if not frontier:
+                # the connected cluster is exhausted, jump to the largest particle that still fits
+                seed = largest_fitting(target - loads[proc])
+                if seed is None:
+                    break
+                frontier = {seed}
+
+            # prefer the particle with the most contacts on this processor, then the largest
+            key = max(frontier, key=lambda key: (sum(nbr in members for nbr in graph[key]), sizes[key], -key))
+            frontier.discard(key)
+
+            new_load = loads[proc] + sizes[key]
+            if members and new_load > target and new_load - target > target - loads[proc]:
+                # adding this particle would overshoot more than stopping short
+                rejected.add(key)
+                continue
+
+            members.add(key)
+            particle_procs[key] = proc
+            unassigned.discard(key)
+            loads[proc] = new_load
+            frontier.update(nbr for nbr in graph[key] if nbr in unassigned)
+
+    # any remaining particles go to the least loaded processor, largest first
+    for key in sorted(unassigned, key=lambda key: (-sizes[key], key)):
+        proc = int(np.argmin(loads))
+        particle_procs[key] = proc
+        loads[proc] += sizes[key]
+
+    imbalance = max(loads) / target - 1 if target > 0 else 0.0
+
+    cut_pairs = set()
+    for key, neighbours in graph.items():
+        for nbr in neighbours:
+            if particle_procs[key] != particle_procs[nbr]:
+                cut_pairs.add((min(key, nbr), max(key, nbr)))
+    n_cut_interfaces = len(cut_pairs)
+
+    return particle_procs, imbalance, n_cut_interfaces
@@ -0,0 +1,22 @@
+import numpy as np
+
+def return_region_cell_labels(img, label_map, particle_ids):
+    """
+    Returns the particle ID of every cell in a solver region, in the cell order of the region mesh. 
+    splitMeshRegions keeps cells in the order of the blockMesh cell ID (i + nx * j + nx * ny * k).
+    
+    Args:
+        img (nd array): The electrode image.
+        label_map (nd array): A map identifying particle IDs (beginning at 1).
+        particle_ids (list): The IDs of the particles which make up the region.
+
+    Returns:
+        cell_labels (nd array): The particle ID of each cell in the region.
+    """
+
+    region_mask = (img == 1) & np.isin(label_map, list(particle_ids))
+
+    # transposing makes i the fastest varying index, matching the blockMesh cell numbering
+    cell_labels = label_map.transpose(2, 1, 0)[region_mask.transpose(2, 1, 0)]
+
+    return cell_labels
@@ -1,11 +1,10 @@
 import tifffile as tif
 import numpy as np
-import matplotlib.pyplot as plt
 from skimage import measure
 from scipy import ndimage
 from scipy.ndimage import binary_dilation
 
-def subdivide_image_using_label_map(label_map_path, entire_img, show_subsections=False):
+def subdivide_image_using_label_map(label_map_path, entire_img, show_subsections=False, particle_ids=None):
     """
     Subdivides the electrode into subsections surrounding each particle. 
     
@@ -13,10 +12,11 @@ def subdivide_image_using_label_map(label_map_path, entire_img, show_subsections
         label_map_path (str): Path to the tif file containing particle IDs.
         entire_img (nd array): The electrode image to be subdivided.
         show_subsections (bool): Plots slices of the particle subsections. Useful for debugging. 
+        particle_ids (list, optional): Only subdivide these particles (e.g. those affected by an edit of the image). Default is all particles.
 
     Returns:
         subsections (dict): The arrays for each particle subsection.
-        centres (nd array): The centres of each particle
+        centres (nd array): The centres of each particle (always for all particles)
         neighbour_ids (dict): The IDs of the components which particle i shares a boundary with. 
     """
 
@@ -35,6 +35,7 @@ def subdivide_image_using_label_map(label_map_path, entire_img, show_subsections
             remove_ids = (labelled_components != most_frequent) & (labelled_components > 0) # ensures cbd not removed
 
             if np.sum(remove_ids) > 0:
+                import matplotlib.pyplot as plt
                 plt.imshow(img)
                 plt.show()
                 if raise_error:
@@ -103,17 +104,24 @@ def subdivide_image_using_label_map(label_map_path, entire_img, show_subsections
     centres = calculate_centre_coordinates(label_map)
 
 
+    if particle_ids is None:
+        particle_ids = range(1, n_particles + 1)
+
+    # bounding boxes of every particle from a single pass over the label map
+    particle_slices = ndimage.find_objects(label_map)
+
     min_coords = {}
     max_coords = {}
     subsections = {}
     neighbour_ids = {}
-    for i in range(1, n_particles + 1):
+    for i in particle_ids:
         min_coords[i] = []
         max_coords[i] = []
-        particle_member_coords = np.where(label_map == i)
-        for idx in range(3):
-            min_coord = np.min(particle_member_coords[idx])
-            max_coord = np.max(particle_member_coords[idx])
+        if i > len(particle_slices) or particle_slices[i - 1] is None:
+            raise ValueError(f"Particle {i} is not present in the label map.")
+        for idx, particle_slice in enumerate(particle_slices[i - 1]):
+            min_coord = particle_slice.start
+            max_coord = particle_slice.stop - 1
             # pad the min and max coordinates by 1 to include the boundary
             min_coords[i].append(min_coord - 1 if min_coord > 0 else min_coord)
             max_coords[i].append(max_coord + 1 if max_coord < entire_img.shape[idx] - 1 else max_coord)
@@ -139,6 +147,7 @@ def subdivide_image_using_label_map(label_map_path, entire_img, show_subsections
         subsections[i] = np.copy(subsection)
 
         if show_subsections:
+            import matplotlib.pyplot as plt
             plt.imshow(subsections[i][:, :, 0])
             plt.title(f"Particle {i} Subsection")
             plt.show()
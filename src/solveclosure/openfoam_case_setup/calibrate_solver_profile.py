@@ -0,0 +1,99 @@
+# this file times the linear solver profiles on a few regions of a built case, to choose the fastest profile for the full solve.
+
+import os
+import re
+import subprocess
+import numpy as np
+
+from solveclosure.utility import parse_solver_log
+from solveclosure.openfoam_case_setup.multiparticle import write_controlDict_file, write_fvSolution_file, write_regionProperties_file
+
+DEFAULT_CALIBRATION_PROFILES = ["PCG-DIC", "PCG-FDIC", "GAMG"]
+
+
+def calibrate_solver_profile(of_case_dir, region_sizes, load_of_cmd, trace, time_params, dimensionless, h, D, steady=False, profiles=None, n_regions=3, n_steps=20):
+    """
+    Runs a short, fixed number of time steps (or iterations) with each linear solver profile on a representative subset of the regions
+    of a built case, and returns the fastest profile. The regions are chosen evenly across the range of region sizes, including the largest,
+    and copied to calibration_case/ next to the OpenFOAM case. chtMultiRegionFoam solves the regions one after the other, so the
+    coupled patches between particles are set to zeroGradient in the copy, and each region is timed as it would be in the full case.
+    The time per step is taken from the ExecutionTime of the log, leaving out the first step (mesh loading and GAMG agglomeration).
+
+    Args:
+        of_case_dir (str): The path to the OpenFOAM case, after the regions have been split and their files written.
+        region_sizes (dict): The number of cells of each region.
+        load_of_cmd (str): The command which loads OpenFOAM.
+        trace (Trace): The trace the calibration runs are recorded in.
+        time_params (dict): The time parameters of the case ("max_Di" sets the time step of the calibration runs).
+        dimensionless (bool): Whether the case is dimensionless or not.
+        h (float): The cell size of the mesh (dimensionless if the case is).
+        D (float): The diffusivity of the AM (1 if the case is dimensionless).
+        steady (bool): Set to True to time iterations of chtMultiRegionSimpleFoam.
+        profiles (list, optional): The profiles compared. Default is DEFAULT_CALIBRATION_PROFILES, which give the same solution.
+        n_regions (int): The number of regions timed.
+        n_steps (int): The number of time steps (or iterations) of each run.
+
+    Returns:
+        profile (str): The fastest profile. The first profile if no run could be timed.
+        calibration (dict): The regions timed, and the time per step of each profile (None if its run failed).
+    """
+
+    if profiles is None:
+        profiles = list(DEFAULT_CALIBRATION_PROFILES)
+
+    # regions spread evenly over the sizes, from the smallest to the largest
+    region_names = sorted(region_sizes, key=lambda name: region_sizes[name])
+    picks = np.unique(np.round(np.linspace(0, len(region_names) - 1, min(n_regions, len(region_names)))).astype(int))
+    calibration_regions = [region_names[idx] for idx in picks]
+    print(f"Calibrating the linear solver profiles {profiles} on regions {calibration_regions}.")
+
+    calibration_dir = os.path.dirname(os.path.normpath(of_case_dir)) + "/calibration_case/"
+    subprocess.run(["bash", "-c", f"rm -rf {calibration_dir} && mkdir -p {calibration_dir}system {calibration_dir}constant {calibration_dir}0"], check=True)
+    subprocess.run(["bash", "-c", f"cp {of_case_dir}system/fvSchemes {of_case_dir}system/fvSolution {calibration_dir}system/ && touch {calibration_dir}system/myFunctionsDict"], check=True)
+    for region_name in calibration_regions:
+        for dir_name in ["0", "constant", "system"]:
+            subprocess.run(["bash", "-c", f"cp -r {of_case_dir}{dir_name}/{region_name} {calibration_dir}{dir_name}/"], check=True)
+
+        # decouple the region from the regions which are not copied
+        T_path = f"{calibration_dir}0/{region_name}/T"
+        with open(T_path, 'rb') as f:
+            content = f.read()
+        content = re.sub(rb"type\s+compressible::turbulentTemperatureRadCoupledMixed;[^}]*", b"type            zeroGradient;\n    ", content)
+        with open(T_path, 'wb') as f:
+            f.write(content)
+
+    write_regionProperties_file(calibration_dir + "constant/regionProperties", calibration_regions)
+    if steady:
+        write_controlDict_file(calibration_dir + "system/controlDict", dimensionless, {"n_iterations": n_steps, "write_interval": n_steps}, steady=True)
+    else:
+        # the time step at the maximum diffusion number, where most of the steps of the full run are taken
+        dt = time_params["max_Di"] * h**2 / D
+        write_controlDict_file(calibration_dir + "system/controlDict", dimensionless, {"T_end": n_steps * dt, "dt": dt, "write_interval": n_steps * dt, "max_Di": time_params["max_Di"]})
+
+    solver = "chtMultiRegionSimpleFoam" if steady else "chtMultiRegionFoam"
+    calibration = {"regions": calibration_regions, "seconds per step": {}}
+    for profile in profiles:
+        for region_name in calibration_regions:
+            write_fvSolution_file(f"{calibration_dir}system/{region_name}/fvSolution", profile=profile, steady=steady)
+
+        log_path = f"{calibration_dir}log.{profile}"
+        cmd = f"{load_of_cmd} && foamListTimes -rm -case {calibration_dir} > /dev/null 2>&1; {solver} -case {calibration_dir} > {log_path} 2>&1"
+        returncode = trace.run(f"calibrate {profile}", cmd, check=False)
+
+        execution_times = [t for t in parse_solver_log(log_path)["execution times"] if t is not None]
+        if returncode != 0 or len(execution_times) < 2:
+            print(f"The calibration run of {profile} failed, see {log_path}.")
+            calibration["seconds per step"][profile] = None
+        else:
+            calibration["seconds per step"][profile] = (execution_times[-1] - execution_times[0]) / (len(execution_times) - 1)
+
+    timed = {profile: seconds for profile, seconds in calibration["seconds per step"].items() if seconds is not None}
+    if not timed:
+        print(f"\nNo calibration run could be timed, so the {profiles[0]} profile is used.")
+        return profiles[0], calibration
+
+    # ties go to the earlier profile
+    profile = min(timed, key=lambda profile: (timed[profile], profiles.index(profile)))
+    print("Seconds per step of each profile: ", {name: round(seconds, 4) for name, seconds in timed.items()}, f". The fastest is {profile}.")
+
+    return profile, calibration
@@ -2,7 +2,7 @@
 
 import numpy as np
 
-def make_topoSetDict(topoSetDict_path, img, multi_particle=False, label_map=None):
+def make_topoSetDict(topoSetDict_path, img, multi_particle=False, label_map=None, region_map=None):
     """
     Writes the topoSetDict file for use with the splitMeshRegions method in Openfoam.
     
@@ -11,6 +11,8 @@ def make_topoSetDict(topoSetDict_path, img, multi_particle=False, label_map=None
         img (nd array): The electrode image.
         multiparticle (bool): Set to True if a multiparticle case is being solved. 
         label_map (nd array): A map identifying particle IDs (beginning at 1). Must be provided if multiparticle is True. 
+        region_map (dict, optional): The solver region name of each particle, to merge several particles into one region. 
+        If None, each particle is its own region (particle_i).
 
     Returns:
     """
@@ -110,7 +112,14 @@ FoamFile
                     raise ValueError("Unknown phase id in image: " + str(phase_id))
     
     
-    if multi_particle:
+    if multi_particle and region_map is not None:
+        # one cellSet per region, made from the cells of all its particles
+        region_cell_lists = {}
+        for key, cell_list in particle_cell_lists.items():
+            region_cell_lists.setdefault(region_map[key], []).extend(cell_list)
+        for region_name, cell_list in region_cell_lists.items():
+            topo_content = add_topo_labelToCell(topo_content, sorted(cell_list), f"c_{region_name}")
+    elif multi_particle:
         for key, cell_list in particle_cell_lists.items():
             region_label = f"c_am_{key}"
             topo_content = add_topo_labelToCell(topo_content, cell_list, region_label)
@@ -127,7 +136,10 @@ FoamFile
     
     
     # now define regions
-    if multi_particle:
+    if multi_particle and region_map is not None:
+        for region_name in region_cell_lists.keys():
+            topo_content = add_region(topo_content, region_name, f"c_{region_name}")
+    elif multi_particle:
         for key, cell_list in particle_cell_lists.items():
             region_label = f"c_am_{key}"
             region_name = f"particle_{key}"
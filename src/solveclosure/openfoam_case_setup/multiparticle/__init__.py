@@ -7,4 +7,7 @@ from .write_surface_integral_func import write_surface_integral_func
 from .write_volume_integral_func import write_volume_integral_func
 from .write_myFunctionsDict_multiparticle import write_myFunctionsDict_multiparticle
 from .write_decomposeParDict_file import write_decomposeParDict_file
-from .write_controlDict_file import write_controlDict_file
\ No newline at end of file
+from .write_controlDict_file import write_controlDict_file
+from .write_cellDecomposition_file import write_cellDecomposition_file
+from .write_region_topoSetDict_file import write_region_topoSetDict_file
+from .write_fvSolution_file import write_fvSolution_file, SOLVER_PROFILES
\ No newline at end of file
@@ -1,4 +1,6 @@
-def write_bc_file_multiparticle(file_path, particle_name, elec_source, cbd_source, neighbour_ids, T_offset, allow_flux=True):
+import numpy as np
+
+def write_bc_file_multiparticle(file_path, particle_name, elec_source, cbd_source, neighbour_ids, T_offset, allow_flux=True, neighbour_prefix="particle_", initial_field=None):
     """
     Writes the OpenFOAM BC file for a multiparticle case  
     
@@ -10,15 +12,29 @@ def write_bc_file_multiparticle(file_path, particle_name, elec_source, cbd_sourc
         neighbour_ids (list): The IDs of particles which share a boundary with particle i.
         T_offset (float): A large number to prevent the OpenFOAM solver from encountering negative 'temperatures'.  
         allow_flux(bool): True for Option 1, False for Option 2 (see documentation).
+        neighbour_prefix (str): The prefix of neighbouring region names. Set to "region_" when particles are agglomerated into regions.
+        initial_field (nd array, optional): The initial value of T in each cell of the region (in region cell order), e.g. from a previous solution. 
+        It is written as a nonuniform field in binary format. Default is a uniform field of T_offset.
 
     Returns:
     """
 
+    if initial_field is None:
+        file_format = "ascii"
+        internal_field = f"uniform {T_offset}"
+        coupled_value = "$internalField"
+    else:
+        # the binary data is inserted in place of the marker when the file is written
+        initial_field = np.ascontiguousarray(initial_field, dtype="<f8")
+        file_format = "binary;\n    arch        \"LSB;label=32;scalar=64\""
+        internal_field = f"nonuniform List<scalar> \n{len(initial_field)}\n(binary_data)\n"
+        coupled_value = f"uniform {float(np.mean(initial_field))}"
+
     content = f"""
 FoamFile
 {{
     version     2.0;
-    format      ascii;
+    format      {file_format};
     class       volScalarField;
     location    "0/{particle_name}";
     object      T;
@@ -27,7 +43,7 @@ FoamFile
 
 dimensions      [ 0 0 0 1 0 0 0 ];
 
-internalField   uniform {T_offset};
+internalField   {internal_field};
 
 boundaryField
 {{
@@ -67,7 +83,7 @@ boundaryField
         if isinstance(id, str):
             continue
 
-        neighbour_name = f"particle_{id}"
+        neighbour_name = f"{neighbour_prefix}{id}"
 
         if allow_flux:
             content += f"""
@@ -75,7 +91,7 @@ boundaryField
     {{
         type            compressible::turbulentTemperatureRadCoupledMixed;
         qr              none;
-        value           $internalField;
+        value           {coupled_value};
         Tnbr            T;
         kappaMethod     solidThermo;
     }}
@@ -92,6 +108,11 @@ boundaryField
     # add final bracket
     content += "}"
 
-    with open(file_path, 'w') as f:
-        f.write(content)
+    if initial_field is None:
+        with open(file_path, 'w') as f:
+            f.write(content)
+    else:
+        before, after = content.split("binary_data")
+        with open(file_path, 'wb') as f:
+            f.write(before.encode() + initial_field.tobytes() + after.encode())
 
@@ -0,0 +1,35 @@
+def write_cellDecomposition_file(file_path, region_name, cell_procs):
+    """
+    Writes the cellDecomposition file read by the manual decomposition method for one region.  
+    
+    Args:
+        file_path (str): The absolute path to the cellDecomposition file (in constant/region_name). 
+        region_name (str): The name of the region, e.g. particle_i.
+        cell_procs (list): The processor assigned to each cell of the region, in cell order.
+
+    Returns:
+    """
+
+    n_cells = len(cell_procs)
+
+    content = f"""
+FoamFile
+{{
+    version     2.0;
+    format      ascii;
+    class       labelList;
+    location    "constant/{region_name}";
+    object      cellDecomposition;
+}}
+
+"""
+
+    # use OpenFOAM's uniform list shorthand when the whole region is on one processor
+    if n_cells > 0 and all(proc == cell_procs[0] for proc in cell_procs):
+        content += f"{n_cells}{{{int(cell_procs[0])}}}\n"
+    else:
+        procs_str = "\n".join(str(int(proc)) for proc in cell_procs)
+        content += f"{n_cells}\n(\n{procs_str}\n)\n"
+    
+    with open(file_path, 'w') as f:
+        f.write(content)
@@ -1,20 +1,76 @@
-def write_controlDict_file(file_path, dimensionless, time_params):
+def write_controlDict_file(file_path, dimensionless, time_params, steady=False):
     """
     Writes the OpenFOAM controlDict file for a multiparticle case. Final time and t step will be different depending on whether dimensionless is True or False.  
     
     Args:
         file_path (str): The absolute path to the p file for the OpenFOAM case. 
         dimensionless (bool): Whether the case is dimensionless or not.
-        time_params (dict): A dictionary specifying time parameters. If None, default values will be used.
+        time_params (dict): A dictionary specifying time parameters, with entries "T_end", "dt", "write_interval" and "max_Di" 
+        (the maximum diffusion number of the adjustable time step). Missing entries take default values.
+        For a steady case, the entries are "n_iterations" (the maximum number of iterations) and "write_interval" (in iterations).
+        steady (bool): Set to True to write a controlDict for chtMultiRegionSimpleFoam, which iterates to steady state 
+        (stopped by the residualControl in fvSolution) instead of marching in time.
 
     Returns:
+        time_params (dict): The time parameters written, including the defaults.
     """
     
-    if time_params is None:
-        if dimensionless:
-            time_params = {"T_end": 0.0056, "dt": 1e-8, "write_interval": 0.0014}
-        else:
-            time_params = {"T_end": 800.0, "dt": 1e-3, "write_interval": 200}
+    if steady:
+        time_params = {"n_iterations": 5000, "write_interval": 5000} if time_params is None else {"write_interval": time_params.get("n_iterations", 5000), **time_params}
+
+        content = f"""
+FoamFile
+{{
+    version     2.0;
+    format      ascii;
+    class       dictionary;
+    location    "system";
+    object      controlDict;
+}}
+// * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * //
+
+application     chtMultiRegionSimpleFoam;
+
+startFrom       startTime;
+
+startTime       0;
+
+stopAt          endTime;
+
+endTime         {time_params.get("n_iterations", 5000)};
+
+deltaT          1;
+
+writeControl    timeStep;
+
+writeInterval   {time_params["write_interval"]};
+
+purgeWrite      0;
+
+writeFormat     binary;
+
+writePrecision  10;
+
+writeCompression off;
+
+timeFormat      general;
+
+timePrecision   6;
+
+runTimeModifiable true;
+
+#include myFunctionsDict
+"""
+
+        with open(file_path, 'w') as f:
+            f.write(content)
+        return time_params
+
+    if dimensionless:
+        default_time_params = {"T_end": 0.0056, "dt": 1e-8, "write_interval": 0.0014, "max_Di": 10.0}
+    else:
+        default_time_params = {"T_end": 800.0, "dt": 1e-3, "write_interval": 200, "max_Di": 10.0}
+    time_params = {**default_time_params, **(time_params or {})}
 
     content = f"""
 FoamFile
@@ -59,7 +115,7 @@ runTimeModifiable true;
 
 maxCo           1.0;
 
-maxDi           10.0;
+maxDi           {time_params["max_Di"]};
 
 adjustTimeStep  yes;
 
@@ -67,4 +123,6 @@ adjustTimeStep  yes;
 """
     
     with open(file_path, 'w') as f:
-        f.write(content)
\ No newline at end of file
+        f.write(content)
+
+    return time_params
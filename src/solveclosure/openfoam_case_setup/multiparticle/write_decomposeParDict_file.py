@@ -1,15 +1,19 @@
 
-def write_decomposeParDict_file(file_path, n_procs):
+def write_decomposeParDict_file(file_path, n_procs, method="scotch"):
     """
     Writes the OpenFOAM decomposeParDict file for a parallelised case.  
     
     Args:
         file_path (str): The absolute path to the decomposeParDict file. 
         n_procs (int): The number of processors used for parallelisation.
+        method (str): The decomposition method. Either "scotch", or "manual" to read the processor of each cell from a cellDecomposition file in each region.
 
     Returns:
     """
 
+    if method not in ["scotch", "manual"]:
+        raise ValueError("Decomposition method not recognised")
+
     content = f"""
 FoamFile
 {{
@@ -21,9 +25,17 @@ FoamFile
 
 numberOfSubdomains {n_procs};
 
-method          scotch;
+method          {method};
+
+"""
+
+    if method == "manual":
+        content += """manualCoeffs
+{
+    dataFile    "cellDecomposition";
+}
 
 """
     
     with open(file_path, 'w') as f:
-        f.write(content)
\ No newline at end of file
+        f.write(content)
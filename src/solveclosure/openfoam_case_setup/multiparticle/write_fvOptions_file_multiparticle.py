@@ -5,7 +5,8 @@ def write_fvOptions_file_multiparticle(file_path, particle_name, vol_source):
     Args:
         file_path (str): The absolute path to the fvOptions file for the OpenFOAM case. 
         particle_name (str): The name of the particle in format particle_i.
-        vol_source (float): The source term within the AM volume.  
+        vol_source (float or dict): The source term within the AM volume. If a dict is given, a separate source 
+        is applied to each cellZone (key) of the region, for particles agglomerated into one region.
 
     Returns:
     """
@@ -22,6 +23,26 @@ FoamFile
 
 options
 {{
+"""
+
+    if isinstance(vol_source, dict):
+        for zone_name, zone_source in vol_source.items():
+            content += f"""
+    {zone_name}_energySource
+    {{
+        type            scalarSemiImplicitSource;
+        selectionMode   cellZone;
+        cellZone        {zone_name};
+        volumeMode      specific;
+
+        injectionRateSuSp
+        {{
+            h          ({zone_source} 0); // W/m^3 == kg/m/s^3
+        }}
+    }}
+"""
+    else:
+        content += f"""
     energySource
     {{
         type            scalarSemiImplicitSource;
@@ -33,8 +54,9 @@ options
             h          ({vol_source} 0); // W/m^3 == kg/m/s^3
         }}
     }}
-}}
 """
+
+    content += "}\n"
     
     with open(file_path, 'w') as f:
         f.write(content)
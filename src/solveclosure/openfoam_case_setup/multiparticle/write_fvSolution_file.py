@@ -0,0 +1,90 @@
+SOLVER_PROFILES = {
+    # the settings of solver_settings/fvSolution
+    "PCG-DIC": {"solver": "PCG", "preconditioner": "DIC", "tolerance": 1e-8, "relTol": 0},
+    "PCG-FDIC": {"solver": "PCG", "preconditioner": "FDIC", "tolerance": 1e-8, "relTol": 0},
+    "GAMG": {"solver": "GAMG", "smoother": "DICGaussSeidel", "nCellsInCoarsestLevel": 10, "agglomerator": "faceAreaPair",
+             "mergeLevels": 1, "cacheAgglomeration": "true", "tolerance": 1e-8, "relTol": 0},
+    # each time step only reduces the residual 100 times (down to the tolerance), which is cheaper but less accurate in time
+    "PCG-DIC-relTol": {"solver": "PCG", "preconditioner": "DIC", "tolerance": 1e-8, "relTol": 0.01},
+    "GAMG-relTol": {"solver": "GAMG", "smoother": "DICGaussSeidel", "nCellsInCoarsestLevel": 10, "agglomerator": "faceAreaPair",
+                    "mergeLevels": 1, "cacheAgglomeration": "true", "tolerance": 1e-8, "relTol": 0.01},
+}
+
+
+def write_fvSolution_file(file_path, profile="PCG-DIC", steady=False):
+    """
+    Writes the fvSolution file of a region with the linear solver settings of a solver profile.
+
+    Args:
+        file_path (str): The absolute path to the fvSolution file.
+        profile (str or dict): The name of a profile in SOLVER_PROFILES ("PCG-DIC", "PCG-FDIC", "GAMG", "PCG-DIC-relTol" or "GAMG-relTol"),
+        or a dictionary of the OpenFOAM solver keywords for h, e.g. {"solver": "PCG", "preconditioner": "DIC", "tolerance": 1e-8}.
+        steady (bool): Set to True to write the fvSolution of chtMultiRegionSimpleFoam. Each iteration then has a relTol of 0.01,
+        as in solver_settings_steady/fvSolution.
+
+    Returns:
+    """
+
+    if isinstance(profile, str):
+        if profile not in SOLVER_PROFILES:
+            raise ValueError(f"\nSolver profile {profile} not recognised. The profiles are {list(SOLVER_PROFILES)}.")
+        profile = SOLVER_PROFILES[profile]
+
+    if steady:
+        profile = {**profile, "relTol": 0.01}
+
+    entries = "".join(f"        {keyword:<24}{value};\n" for keyword, value in profile.items())
+
+    content = f"""
+FoamFile
+{{
+    version     2.0;
+    format      ascii;
+    class       dictionary;
+    object      fvSolution;
+}}
+
+solvers
+{{
+    h
+    {{
+{entries}    }}
+"""
+
+    if steady:
+        content += """}
+
+SIMPLE
+{
+    nNonOrthogonalCorrectors 0;
+
+    residualControl
+    {
+        h   1e-6;
+    }
+}
+
+relaxationFactors
+{
+    equations
+    {
+        h   0.9;
+    }
+}
+"""
+    else:
+        content += """
+    hFinal
+    {
+        $h;
+    }
+}
+
+PIMPLE
+{
+    nNonOrthogonalCorrectors 0;
+}
+"""
+
+    with open(file_path, 'w') as f:
+        f.write(content)
@@ -0,0 +1,89 @@
+def write_region_topoSetDict_file(file_path, region_name, particle_cell_ids, neighbour_ids):
+    """
+    Writes the topoSetDict for a region containing several agglomerated particles.
+    A cellZone is made for each particle, and a faceZone for each of its AM-elec and AM-CBD boundaries,
+    so that sources and integrals can still be applied per particle.
+
+    Args:
+        file_path (str): The absolute path to the topoSetDict file (in system/region_name).
+        region_name (str): The name of the region in format region_i.
+        particle_cell_ids (dict): The region cell IDs of each particle in the region.
+        neighbour_ids (dict): The IDs of the components which particle i shares a boundary with.
+
+    Returns:
+    """
+
+    extensions = {"elec": "_to_Elec", "cbd": "_to_CBD"}
+
+    content = """
+FoamFile
+{
+    version     2.0;
+    format      ascii;
+    class       dictionary;
+    object      topoSetDict;
+}
+
+actions
+("""
+
+    for key, cell_ids in particle_cell_ids.items():
+        particle_name = f"particle_{key}"
+        id_list = "\n".join(str(n) for n in cell_ids)
+
+        content += f"""
+    {{
+            name    c_{particle_name};
+            type    cellSet;
+            action  new;
+            source  labelToCell;
+            value
+            (
+                {id_list}
+            );
+    }}
+    {{
+            name    {particle_name};
+            type    cellZoneSet;
+            action  new;
+            source  setToCellZone;
+            sourceInfo
+            {{
+                set c_{particle_name};
+            }}
+    }}"""
+
+        for type, extension in extensions.items():
+            if type not in neighbour_ids[key]:
+                continue
+
+            # faces of the region patch which belong to this particle
+            face_name = particle_name + extension
+            content += f"""
+    {{
+            name    f_{face_name};
+            type    faceSet;
+            action  new;
+            source  patchToFace;
+            patch   {region_name}{extension};
+    }}
+    {{
+            name    f_{face_name};
+            type    faceSet;
+            action  subset;
+            source  cellToFace;
+            set     c_{particle_name};
+            option  all;
+    }}
+    {{
+            name    {face_name};
+            type    faceZoneSet;
+            action  new;
+            source  setToFaceZone;
+            faceSet f_{face_name};
+    }}"""
+
+    content += "\n);\n" + "// ************************************************************************* //\n"
+
+    with open(file_path, 'w') as f:
+        f.write(content)
@@ -1,4 +1,4 @@
-def write_surface_integral_func(file_path, particle_name, type):
+def write_surface_integral_func(file_path, particle_name, type, region_name=None):
     """
     Writes the surface integral function for a multiparticle case.  
     
@@ -6,6 +6,8 @@ def write_surface_integral_func(file_path, particle_name, type):
         file_path (str): The absolute path to the surface integral function file. 
         particle_name (str): The name of the particle in format particle_i.
         type (str): The type of boundary. Can be "elec", "cbd", "sep". 
+        region_name (str, optional): The solver region containing the particle, if particles are agglomerated into regions. 
+        The integral is then taken over the faceZone of the particle's faces rather than a patch.
 
     Returns:
     """
@@ -21,13 +23,19 @@ def write_surface_integral_func(file_path, particle_name, type):
           
     patch_name = particle_name + extension
 
+    if region_name is None:
+        region_type = "patch"
+        region_name = particle_name
+    else:
+        region_type = "faceZone"
+
     content = f"""
 type            surfaceFieldValue;
 libs            ("libfieldFunctionObjects.so");
 log             true;
 writeFields     false;
-regionType      patch;
-region          {particle_name};
+regionType      {region_type};
+region          {region_name};
 name            {patch_name};
 operation       areaIntegrate;
 weightField     none;
@@ -1,23 +1,27 @@
-def write_volume_integral_func(file_path, particle_name):
+def write_volume_integral_func(file_path, particle_name, region_name=None):
     """
     Writes the volume integral function file for a multiparticle case.  
     
     Args:
         file_path (str): The absolute path to the volume integral function file. 
         particle_name (str): The name of the particle in format particle_i.
+        region_name (str, optional): The solver region containing the particle, if particles are agglomerated into regions.
 
     Returns:
     """
         
     vol_name = particle_name
 
+    if region_name is None:
+        region_name = particle_name
+
     content = f"""
 type            volFieldValue;
 libs            ("libfieldFunctionObjects.so");
 log             true;
 writeFields     false;
 regionType      cellZone;
-region          {vol_name};
+region          {region_name};
 name            {vol_name};
 operation       volIntegrate;
 weightField     none;
@@ -0,0 +1,97 @@
+import os
+import pickle
+
+from solveclosure.utility import SolverWatchdog
+from solveclosure.openfoam_case_setup.multiparticle import write_controlDict_file
+
+
+def run_closure_solver(of_case_dir, closure_data, closure_data_path, load_of_cmd, trace, parallelise=False, n_procs=8, watchdog=False, n_retries=0):
+    """
+    Runs the solver of a case set up by solve_closure_multiparticle (chtMultiRegionFoam, or chtMultiRegionSimpleFoam for a steady case).
+    If watched, the solver is killed as soon as it fails (see SolverWatchdog), and a transient solve is rerun with safer time parameters
+    up to n_retries times. The attempts are recorded in closure_data["solver watchdog"], which is written to closure_data_path.
+
+    Args:
+        of_case_dir (str): The path to the OpenFOAM case.
+        closure_data (dict): The closure data of the case.
+        closure_data_path (str): The path to the closure data file.
+        load_of_cmd (str): The command which must be executed in your terminal to load OpenFOAM.
+        trace (Trace): The trace the solver runs are recorded in.
+        parallelise (bool): Set to True to solve a decomposed case in parallel.
+        n_procs (int): The number of processors of a parallel solve.
+        watchdog (bool or dict): Set to True to watch the solver, or to a dict of keyword arguments of SolverWatchdog.
+        n_retries (int): The number of times a transient solve killed by the watchdog is rerun.
+
+    Returns:
+        reason (str): The reason the watchdog killed the last run, or None if the solve was not killed.
+    """
+
+    solver, cmd = solver_command(of_case_dir, load_of_cmd, closure_data.get("steady"), parallelise, n_procs)
+
+    if not watchdog:
+        trace.run(solver, f"{cmd} > {of_case_dir}log.solver 2>&1", check=False)
+        return None
+
+    watchdog_settings = start_solver_watchdog(closure_data, watchdog)
+    time_params = closure_data["time params"]
+
+    for attempt in range(n_retries + 1):
+        solver_watchdog = SolverWatchdog(of_case_dir + "log.solver", **watchdog_settings)
+        returncode = trace.run(solver if attempt == 0 else f"{solver} retry {attempt}", cmd, check=False, watchdog=solver_watchdog)
+
+        if not record_solver_attempt(closure_data, time_params, solver_watchdog.reason, returncode, attempt, n_retries):
+            break
+
+        time_params = next_retry_time_params(time_params)
+        print(f"Retrying the solver with dt = {time_params['dt']:g} and maxDi = {time_params['max_Di']:g}.")
+        reset_case_for_retry(of_case_dir, attempt, time_params, closure_data["dimensionless"], load_of_cmd, trace, parallelise)
+
+    return finish_solver_watchdog(closure_data, closure_data_path, of_case_dir)
+
+
+def solver_command(of_case_dir, load_of_cmd, steady, parallelise, n_procs):
+    # the solver of the case, and the command which runs it (without redirecting its output)
+    solver = "chtMultiRegionSimpleFoam" if steady else "chtMultiRegionFoam"
+    if parallelise:
+        cmd = f"{load_of_cmd} && mpirun -np {n_procs} {solver} -parallel -case {of_case_dir}"
+    else:
+        cmd = f"{load_of_cmd} && {solver} -case {of_case_dir}"
+    return solver, cmd
+
+
+def start_solver_watchdog(closure_data, watchdog):
+    # the keyword arguments of SolverWatchdog, with T kept above 10 % of T_offset by default, and an empty record of the attempts
+    watchdog_settings = {"min_T": 0.1 * closure_data["T offset"], **(watchdog if isinstance(watchdog, dict) else {})}
+    closure_data["solver watchdog"] = {"settings": watchdog_settings, "attempts": [], "reason": None}
+    return watchdog_settings
+
+
+def record_solver_attempt(closure_data, time_params, reason, returncode, attempt, n_retries):
+    # records a watched run, and returns whether it should be retried (only killed transient runs with retries left are)
+    closure_data["solver watchdog"]["attempts"].append({"time params": time_params, "reason": reason, "exit status": returncode})
+    closure_data["solver watchdog"]["reason"] = reason
+    return reason is not None and not closure_data.get("steady") and attempt < n_retries
+
+
+def next_retry_time_params(time_params):
+    # a 10 times smaller initial time step and half the maximum diffusion number
+    return {**time_params, "dt": time_params["dt"] / 10, "max_Di": time_params["max_Di"] / 2}
+
+
+def reset_case_for_retry(of_case_dir, attempt, time_params, dimensionless, load_of_cmd, trace, parallelise):
+    # keeps the log of the killed run, and restarts from the initial field with the new time parameters
+    os.rename(of_case_dir + "log.solver", of_case_dir + f"log.solver.failed_{attempt + 1}")
+    trace.run("foamListTimes", f"{load_of_cmd} && foamListTimes -rm -case {of_case_dir}" + (" -processor" if parallelise else ""))
+    trace.run("remove postProcessing", f"rm -rf {of_case_dir}postProcessing")
+    write_controlDict_file(of_case_dir + "system/controlDict", dimensionless, time_params)
+
+
+def finish_solver_watchdog(closure_data, closure_data_path, of_case_dir):
+    # writes the record of the attempts, and returns the reason the last run was killed
+    with open(closure_data_path, 'wb') as f:
+        pickle.dump(closure_data, f)
+
+    reason = closure_data["solver watchdog"]["reason"]
+    if reason is not None:
+        print(f"\nThe solver was killed by the watchdog ({reason}), so the results are not processed. See {of_case_dir}log.solver.")
+    return reason
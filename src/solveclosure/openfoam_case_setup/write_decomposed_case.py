@@ -0,0 +1,241 @@
+import os
+import re
+import concurrent.futures
+import numpy as np
+
+from solveclosure.utility import add_slash, read_openfoam_mesh
+from solveclosure.utility.read_openfoam_mesh import read_foam_file, read_list
+
+
+def write_decomposed_case(of_case_dir, region_cell_procs, n_procs, time_dir="0", n_workers=None):
+    """
+    Writes the processor directories of a case in place of decomposePar -allRegions, from a partition of the cells made in Python
+    (e.g. by partition_particles_across_processors). For each region, the mesh written by splitMeshRegions is split into
+    processorN/constant/<region>/polyMesh with the processor boundary patches and the addressing files reconstructPar reads, and the
+    fields of time_dir are split into processorN/<time_dir>/<region>. The layout follows decomposePar: each processor keeps the
+    cell order of the region, its internal faces come first, then its faces on each patch of the region, then one processor patch
+    per neighbouring processor, whose faces are turned on the processor of the higher neighbour cell. The processors are written in
+    parallel, since decomposePar is serial and rereads every region mesh.
+
+    Args:
+        of_case_dir (str): The path to the OpenFOAM case.
+        region_cell_procs (dict): The processor of each cell of each region, in the cell order of the region mesh, e.g. {"region_0": [0, 0, 1, ...]}.
+        n_procs (int): The number of processors.
+        time_dir (str): The time directory whose fields are decomposed.
+        n_workers (int, optional): The number of processors written at once. Default is the number of cores of the machine.
+
+    Returns:
+        n_cells (dict): The number of cells of each region on each processor.
+    """
+
+    of_case_dir = add_slash(of_case_dir)
+    region_names = list(region_cell_procs.keys())
+
+    with concurrent.futures.ThreadPoolExecutor(n_workers) as executor:
+        meshes = dict(zip(region_names, executor.map(lambda region_name: read_openfoam_mesh(of_case_dir + f"constant/{region_name}/polyMesh"), region_names)))
+        partitions = {region_name: partition_region(meshes[region_name], region_cell_procs[region_name], n_procs) for region_name in region_names}
+
+        tasks = [executor.submit(write_processor_region, of_case_dir, region_name, meshes[region_name], partitions[region_name], proc, time_dir)
+                 for region_name in region_names for proc in range(n_procs)]
+        for task in tasks:
+            task.result()
+
+    n_cells = {region_name: np.bincount(partitions[region_name]["cell procs"], minlength=n_procs).tolist() for region_name in region_names}
+    return n_cells
+
+
+def partition_region(mesh, cell_procs, n_procs):
+    # the processor of every cell and face of a region, and the label of each cell on its processor (which keeps the cell order)
+    cell_procs = np.asarray(cell_procs, dtype=np.int64)
+    if len(cell_procs) != mesh["n cells"]:
+        raise ValueError(f"\nThe region mesh has {mesh['n cells']} cells, but {len(cell_procs)} cell processors were given.")
+    if len(cell_procs) and (cell_procs.min() < 0 or cell_procs.max() >= n_procs):
+        raise ValueError(f"\nThe cell processors must be between 0 and {n_procs - 1}.")
+
+    order = np.argsort(cell_procs, kind="stable")
+    counts = np.bincount(cell_procs, minlength=n_procs)
+    cell_local = np.empty(len(cell_procs), dtype=np.int64)
+    cell_local[order] = np.arange(len(cell_procs)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    n_internal = len(mesh["neighbour"])
+    owner_procs = cell_procs[mesh["owner"]]
+    neighbour_procs = cell_procs[mesh["neighbour"]]
+
+    return {"cell procs": cell_procs, "cell local": cell_local, "owner procs": owner_procs, "neighbour procs": neighbour_procs,
+            "cut": owner_procs[:n_internal] != neighbour_procs}
+
+
+def write_processor_region(of_case_dir, region_name, mesh, partition, proc, time_dir):
+    # writes the mesh and fields of one region on one processor
+    owner, neighbour = mesh["owner"], mesh["neighbour"]
+    cell_local, owner_procs, neighbour_procs, cut = partition["cell local"], partition["owner procs"], partition["neighbour procs"], partition["cut"]
+    n_internal = len(neighbour)
+
+    internal_faces = np.flatnonzero(~cut & (owner_procs[:n_internal] == proc))
+    patch_faces = [patch["start face"] + np.flatnonzero(owner_procs[patch["start face"]:patch["start face"] + patch["n faces"]] == proc) for patch in mesh["patches"]]
+
+    # the faces cut by the partition, grouped by the neighbouring processor and in face order within a group, as on the other side
+    own_side = cut & (owner_procs[:n_internal] == proc)
+    cut_faces = np.flatnonzero(own_side | (cut & (neighbour_procs == proc)))
+    other_procs = np.where(own_side[cut_faces], neighbour_procs[cut_faces], owner_procs[cut_faces])
+    order = np.argsort(other_procs, kind="stable")
+    cut_faces, other_procs = cut_faces[order], other_procs[order]
+    neighbour_proc_ids, proc_patch_sizes = np.unique(other_procs, return_counts=True)
+
+    # the face addressing is the region face + 1, negative where the face is turned so that its owner is on this processor
+    turned = np.concatenate([np.zeros(len(internal_faces) + sum(len(faces) for faces in patch_faces), dtype=bool), ~own_side[cut_faces]])
+    faces = np.concatenate([internal_faces, *patch_faces, cut_faces]).astype(np.int64)
+    face_addressing = np.where(turned, -(faces + 1), faces + 1)
+
+    # the points of each face, reversed (keeping the first point) for turned faces
+    offsets = mesh["face offsets"]
+    sizes = offsets[faces + 1] - offsets[faces]
+    local_offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+    position = np.arange(local_offsets[-1]) - np.repeat(local_offsets[:-1], sizes)
+    position = np.where(np.repeat(turned, sizes) & (position > 0), np.repeat(sizes, sizes) - position, position)
+    face_points = mesh["face labels"][np.repeat(offsets[faces], sizes) + position]
+
+    point_addressing = np.unique(face_points)
+    local_face_points = np.searchsorted(point_addressing, face_points)
+
+    local_owner = cell_local[owner[faces]]
+    local_owner[turned] = cell_local[neighbour[faces[turned]]]
+    local_neighbour = cell_local[neighbour[internal_faces]]
+    cell_addressing = np.flatnonzero(partition["cell procs"] == proc)
+
+    patches = []
+    start_face = len(internal_faces)
+    for patch, p_faces in zip(mesh["patches"], patch_faces):
+        patches.append({"name": patch["name"], "n faces": len(p_faces), "start face": start_face, "entries": patch["entries"]})
+        start_face += len(p_faces)
+    for neighbour_proc, n_faces in zip(neighbour_proc_ids, proc_patch_sizes):
+        entries = f"type            processor;\n        inGroups        1(processor);\n        matchTolerance  0.0001;\n        transform       unknown;\n" \
+                  f"        myProcNo        {proc};\n        neighbProcNo    {neighbour_proc};"
+        patches.append({"name": f"procBoundary{proc}to{neighbour_proc}", "n faces": int(n_faces), "start face": start_face, "entries": entries})
+        start_face += int(n_faces)
+
+    mesh_dir = of_case_dir + f"processor{proc}/constant/{region_name}/polyMesh/"
+    os.makedirs(mesh_dir, exist_ok=True)
+    location = f"constant/{region_name}/polyMesh"
+    mesh_format = mesh["format"]
+    note = f"nPoints:{len(point_addressing)}  nCells:{len(cell_addressing)}  nFaces:{len(faces)}  nInternalFaces:{len(internal_faces)}"
+
+    write_foam_file(mesh_dir + "points", mesh_format, "vectorField", location, "points", format_list(mesh["points"][point_addressing], mesh_format, "scalar"))
+    if mesh_format["binary"]:
+        content = format_list(local_offsets, mesh_format, "label") + b"\n\n" + format_list(local_face_points, mesh_format, "label")
+        write_foam_file(mesh_dir + "faces", mesh_format, "faceCompactList", location, "faces", content)
+    else:
+        content = f"{len(faces)}\n(\n".encode() + "\n".join(f"{size}({' '.join(map(str, local_face_points[start:start + size]))})"
+                                                           for start, size in zip(local_offsets[:-1], sizes)).encode() + b"\n)"
+        write_foam_file(mesh_dir + "faces", mesh_format, "faceList", location, "faces", content)
+    write_foam_file(mesh_dir + "owner", mesh_format, "labelList", location, "owner", format_list(local_owner, mesh_format, "label"), note=note)
+    write_foam_file(mesh_dir + "neighbour", mesh_format, "labelList", location, "neighbour", format_list(local_neighbour, mesh_format, "label"), note=note)
+
+    content = f"{len(patches)}\n(\n" + "".join(f"    {patch['name']}\n    {{\n        {patch['entries']}\n        nFaces          {patch['n faces']};\n"
+                                                f"        startFace       {patch['start face']};\n    }}\n" for patch in patches) + ")"
+    write_foam_file(mesh_dir + "boundary", {**mesh_format, "binary": False}, "polyBoundaryMesh", location, "boundary", content.encode())
+
+    for name, addressing in [("pointProcAddressing", point_addressing), ("faceProcAddressing", face_addressing), ("cellProcAddressing", cell_addressing),
+                             ("boundaryProcAddressing", np.concatenate([np.arange(len(mesh["patches"])), -np.ones(len(neighbour_proc_ids), dtype=np.int64)]))]:
+        write_foam_file(mesh_dir + name, mesh_format, "labelIOList", location, name, format_list(addressing, mesh_format, "label"))
+
+    # the zones list their members in the local order, with the flip of turned faces reversed
+    local_labels = {"cellZones": np.full(mesh["n cells"], -1, dtype=np.int64), "faceZones": np.full(len(owner), -1, dtype=np.int64),
+                    "pointZones": np.full(len(mesh["points"]), -1, dtype=np.int64)}
+    local_labels["cellZones"][cell_addressing] = np.arange(len(cell_addressing))
+    local_labels["faceZones"][faces] = np.arange(len(faces))
+    local_labels["pointZones"][point_addressing] = np.arange(len(point_addressing))
+    label_names = {"cellZones": "cellLabels", "faceZones": "faceLabels", "pointZones": "pointLabels"}
+
+    for zone_type, zones in mesh["zones"].items():
+        content = f"{len(zones)}\n(\n".encode()
+        for zone in zones:
+            labels = local_labels[zone_type][zone["lists"][label_names[zone_type]]]
+            kept = labels >= 0
+            order = np.argsort(labels[kept], kind="stable")
+            content += f"{zone['name']}\n{{\n    type {zone['type']};\n".encode()
+            content += f"{label_names[zone_type]} List<label> ".encode() + format_list(labels[kept][order], mesh_format, "label") + b";\n"
+            if zone_type == "faceZones":
+                flips = zone["lists"]["flipMap"][kept].astype(bool) ^ turned[labels[kept]]
+                content += b"flipMap List<bool> " + format_list(flips[order], mesh_format, "bool") + b";\n"
+            content += "".join(f"{entry}\n" for entry in zone["entries"]).encode() + b"}\n\n"
+        write_foam_file(mesh_dir + zone_type, mesh_format, "regIOobject", location, zone_type, content + b")")
+
+    # the fields of the region
+    field_dir = of_case_dir + f"{time_dir}/{region_name}/"
+    if os.path.isdir(field_dir):
+        proc_field_dir = of_case_dir + f"processor{proc}/{time_dir}/{region_name}/"
+        os.makedirs(proc_field_dir, exist_ok=True)
+        proc_patch_faces = np.split(cut_faces, np.cumsum(proc_patch_sizes)[:-1]) if len(cut_faces) else []
+        for field_name in sorted(os.listdir(field_dir)):
+            if os.path.isfile(field_dir + field_name):
+                write_processor_field(field_dir + field_name, proc_field_dir + field_name, mesh, cell_addressing,
+                                      [patch["name"] for patch in patches[len(mesh["patches"]):]], proc_patch_faces)
+
+
+def write_processor_field(field_path, proc_field_path, mesh, cell_addressing, proc_patch_names, proc_patch_faces):
+    # writes the part of a volScalarField on a processor, with a value for each processor patch
+    content, header = read_foam_file(field_path)
+    binary = header["format"] == "binary"
+
+    match = re.compile(rb"internalField\s+").search(content, header["end"])
+    if match is None:
+        raise ValueError(f"\nNo internalField was found in {field_path}.")
+    uniform = re.compile(rb"uniform\s+([^;\s]+)\s*;").match(content, match.end())
+    nonuniform = re.compile(rb"nonuniform\s+List<scalar>\s*").match(content, match.end())
+
+    if uniform is not None:
+        internal_field = content[match.start():uniform.end()]
+        patch_values = [b"uniform " + uniform.group(1) for _ in proc_patch_names]
+        end = uniform.end()
+    elif nonuniform is not None:
+        values, end = read_list(content, nonuniform.end(), header, "scalar")
+        end = re.compile(rb"\s*;").match(content, end).end()
+        internal_field = b"internalField   nonuniform List<scalar> " + format_list(values[cell_addressing], {"binary": binary}, "scalar") + b";"
+        # the face value of a processor face is the mean of its two cells, as on a uniform voxel mesh
+        patch_values = [b"nonuniform List<scalar> " + format_list(0.5 * (values[mesh["owner"][faces]] + values[mesh["neighbour"][faces]]), {"binary": binary}, "scalar")
+                        for faces in proc_patch_faces]
+    else:
+        raise ValueError(f"\nThe internalField of {field_path} is not a uniform or nonuniform scalar field.")
+
+    closing = content.rindex(b"}")
+    if b"nonuniform" in content[end:closing]:
+        raise ValueError(f"\nThe boundaryField of {field_path} has nonuniform values, which cannot be decomposed.")
+
+    proc_patches = b"".join(f"    {name}\n    {{\n        type            processor;\n        value           ".encode() + value + b";\n    }\n"
+                            for name, value in zip(proc_patch_names, patch_values))
+
+    with open(proc_field_path, 'wb') as f:
+        f.write(content[:match.start()] + internal_field + content[end:closing] + proc_patches + content[closing:])
+
+
+def format_list(values, mesh_format, value_type):
+    # a list in the OpenFOAM format, e.g. 3(0 1 2) in ascii
+    values = np.asarray(values)
+    n = len(values)
+    if mesh_format["binary"]:
+        dtype = {"label": f"<i{mesh_format.get('label bytes', 4)}", "scalar": "<f8", "bool": "u1"}[value_type]
+        return f"{n}\n(".encode() + np.ascontiguousarray(values, dtype=dtype).tobytes() + b")"
+
+    if values.ndim > 1:
+        lines = ("(" + " ".join(format(float(x), ".17g") for x in row) + ")" for row in values)
+    elif value_type == "scalar":
+        lines = (format(float(x), ".17g") for x in values)
+    else:
+        lines = (str(int(x)) for x in values)
+    return f"{n}\n(\n".encode() + "\n".join(lines).encode() + b"\n)"
+
+
+def write_foam_file(file_path, mesh_format, class_name, location, object_name, content, note=None):
+    header = "FoamFile\n{\n    version     2.0;\n"
+    if mesh_format["binary"]:
+        header += f"    format      binary;\n    arch        \"LSB;label={8 * mesh_format['label bytes']};scalar=64\";\n"
+    else:
+        header += "    format      ascii;\n"
+    header += f"    class       {class_name};\n"
+    if note is not None:
+        header += f"    note        \"{note}\";\n"
+    header += f"    location    \"{location}\";\n    object      {object_name};\n}}\n\n"
+
+    with open(file_path, 'wb') as f:
+        f.write(header.encode() + content + b"\n")
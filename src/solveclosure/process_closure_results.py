@@ -1,10 +1,11 @@
+import os
 import numpy as np 
 import pickle
 import subprocess
-from solveclosure.utility import load_openfoam_data
+from solveclosure.utility import load_openfoam_data, parse_solver_log, find_time_to_steady_state
 
 
-def process_closure_results(case_dir, cbd_surf_por, sep_surf_por, dimensionless, L=None, write=True, multiparticle=True):
+def process_closure_results(case_dir, cbd_surf_por, sep_surf_por, dimensionless, L=None, write=True, multiparticle=True, steady=None):
     """
     Processes the closure results from a solved OpenFOAM case, and writes them to the closure_data dictionary. 
     
@@ -16,6 +17,8 @@ def process_closure_results(case_dir, cbd_surf_por, sep_surf_por, dimensionless,
         L (float): The lengthscale used (m) to non-dimensionalise the problem.
         write (bool): To set to False to vot write results to the closure_dict, but only print them.
         multiparticle (bool): To set to True for a multiparticle case.
+        steady (bool, optional): Set to True if the case was solved with the steady solver, so that the outputs are indexed by iteration 
+        and only the final (converged) values are used. Default is read from the closure data.
 
     Returns: 
         closure_data (dict): The dictionary containing the closure results and other image data.
@@ -51,20 +54,38 @@ def process_closure_results(case_dir, cbd_surf_por, sep_surf_por, dimensionless,
         offset = closure_data["T offset"]
         closure_data["method"] = "multiparticle" 
 
+    if steady is None:
+        steady = closure_data.get("steady", False)
+
+    # summarise the OpenFOAM logs, e.g. the linear solver iterations of each region and any stall or divergence of the solver
+    of_case_dir = case_dir + "openfoam_case/"
+    if multiparticle and os.path.isdir(of_case_dir):
+        closure_data["log summaries"] = {name: parse_solver_log(of_case_dir + name) for name in sorted(os.listdir(of_case_dir)) if name.startswith("log.")}
+        solver_log_summary = closure_data["log summaries"].get("log.solver")
+        if solver_log_summary is not None:
+            print("\nThe regions which needed the most linear solver iterations are ", solver_log_summary["regions by iterations"][:3])
+            for flag in solver_log_summary["flags"]:
+                print(f"\n Warning from log.solver: {flag}")
+
     t_initiated = False
+    iterations = None
 
     no_file_found = {"elec" : 0, "cbd" : 0, "sep" : 0}
 
     surf_por = {"elec" : 1, "cbd" : cbd_surf_por, "sep" : sep_surf_por}
 
+    # the solver region of each particle (several particles share a region if they were agglomerated)
+    region_map = closure_data.get("region map") or {}
+
     for key in closure_data["particle data"].keys():
         
         particle_initiated = False
+        region_name = region_map.get(key, f"particle_{key}")
 
         for type in ["elec", "cbd", "sep"]:
 
             if multiparticle:
-                s_surf_int_path = case_dir + f"/openfoam_case/postProcessing/particle_{key}/particle_{key}_surfaceIntegral_{type}/0/surfaceFieldValue.dat"
+                s_surf_int_path = case_dir + f"/openfoam_case/postProcessing/{region_name}/particle_{key}_surfaceIntegral_{type}/0/surfaceFieldValue.dat"
             else:              
                 s_surf_int_path = case_dir + "particle_" + str(key) + f"/openfoam_case/postProcessing/surfaceIntegral_{type}/0/surfaceFieldValue.dat"
 
@@ -79,7 +100,12 @@ def process_closure_results(case_dir, cbd_surf_por, sep_surf_por, dimensionless,
                 print(f"\n Although a surface integral file existed for particle {key} with type {type} it is empty \n")
                 continue 
             
-            check_steady_state(t, s_surf_int_i, key)
+            if steady:
+                # outputs are indexed by iteration, only the converged values are needed
+                iterations = t[-1]
+                t, s_surf_int_i = t[-1:], s_surf_int_i[-1:]
+            else:
+                check_steady_state(t, s_surf_int_i, key)
 
             if not t_initiated:
                 global_sum_s_surf_int_transient = np.zeros(len(t))
@@ -97,7 +123,7 @@ def process_closure_results(case_dir, cbd_surf_por, sep_surf_por, dimensionless,
 
         # get volume integral to calculate volume average 
         if multiparticle:
-            s_vol_int_path = case_dir + f"/openfoam_case/postProcessing/particle_{key}/particle_{key}_volumeIntegral/0/volFieldValue.dat"
+            s_vol_int_path = case_dir + f"/openfoam_case/postProcessing/{region_name}/particle_{key}_volumeIntegral/0/volFieldValue.dat"
         else:              
             s_vol_int_path = case_dir + f"particle_{key}/openfoam_case/postProcessing/volumeIntegral/0/volFieldValue.dat" 
 
@@ -107,6 +133,9 @@ def process_closure_results(case_dir, cbd_surf_por, sep_surf_por, dimensionless,
             print(f"\n No file found for the volume integral/average for particle {key}")
             continue  
 
+        if steady:
+            s_vol_int_i = s_vol_int_i[-1:]
+
         for t_idx in range(len(closure_data["times for transient data"])):
             global_sum_s_vol_int_transient[t_idx] += s_vol_int_i[t_idx]
  
@@ -114,6 +143,9 @@ def process_closure_results(case_dir, cbd_surf_por, sep_surf_por, dimensionless,
     for type in ["elec", "cbd", "sep"]:
         print(f"\n{no_file_found[type]} particles did not have an AM-{type} surface integral file.")
 
+    if not t_initiated:
+        raise ValueError(f"\nNo surface integral data was found in {case_dir}, so the closure results cannot be processed. Check that the solver ran (see log.solver).")
+
     
     # divde by A
     if dimensionless:
@@ -153,6 +185,19 @@ def process_closure_results(case_dir, cbd_surf_por, sep_surf_por, dimensionless,
     closure_data["global s volume average final"] = s_vol_ave_final
     closure_data["global s volume average transient"] = s_vol_ave_transient
 
+    if steady:
+        # there is no transient history, only the converged iteration
+        closure_data["times for transient data"] = None
+        closure_data["global s surface average transient"] = None
+        closure_data["global s volume average transient"] = None
+        closure_data["time to steady state"] = None
+        closure_data["iterations to steady state"] = None if iterations is None else int(iterations)
+        if iterations is not None:
+            print("\nThe steady solver stopped after ", int(iterations), " iterations.\n")
+    else:
+        closure_data["time to steady state"] = find_time_to_steady_state(closure_data["times for transient data"], global_s_surf_ave_transient_corr)
+        print("\nThe global surface average reached steady state (within 0.1 %) at time ", closure_data["time to steady state"], "\n")
+
     if write:
         with open(closure_data_dict_path, 'wb') as closure_data_file:
             pickle.dump(closure_data, closure_data_file)
@@ -0,0 +1,92 @@
+import copy
+import pickle
+import numpy as np
+
+from solveclosure.utility import add_slash
+
+
+def rescale_dimensionless_closure_data(closure_data, D_s, voxel=None, T_offset=1e5, write_path=None):
+    """
+    Produces the closure data of a dimensional case from a solved dimensionless case, without re-running OpenFOAM. 
+    Using the dimensionless groups s = L / (D_s F) s_hat, x = L x_hat and t = L^2 / D_s t_hat (see docs), the closure 
+    variable, times, areas and volumes are rescaled for any D_s and voxel size. 
+
+    Args:
+        closure_data (dict or str): The processed closure data dictionary of a dimensionless case, or the path to its case directory.
+        D_s (float): The diffusivity of the AM in m2.s-1.
+        voxel (float, optional): The voxel side length of the image in meters. If None, the voxel size of the dimensionless case is used.
+        T_offset (float): The T offset recorded for the per-particle surface integrals, as if the dimensional case had been solved. Default 1e5.
+        write_path (str, optional): The path to write the rescaled closure data dictionary (pickle) to. 
+
+    Returns:
+        dimensional_closure_data (dict): The closure data dictionary of the equivalent dimensional case.
+    """
+
+    if isinstance(closure_data, str):
+        with open(add_slash(closure_data) + "closure_data.pickle", 'rb') as f:
+            closure_data = pickle.load(f)
+
+    if not closure_data["dimensionless"]:
+        raise ValueError("The closure data provided is not from a dimensionless case.")
+
+    if closure_data["global s surface average steady"] is None:
+        raise ValueError("The closure data provided has not been processed. Run process_closure_results first.")
+
+    if closure_data.get("L") is None or closure_data.get("voxel") is None:
+        raise ValueError("The closure data provided does not record L and voxel. Re-run process_closure_results on a case solved with this version.")
+
+    F = 96485
+
+    L_hat = closure_data["L"]
+    voxel_hat = closure_data["voxel"]
+    if voxel is None:
+        voxel = voxel_hat
+
+    # the dimensionless mesh depends only on the lengthscale in voxels, so it is the same for any voxel size
+    length_ratio = voxel / voxel_hat
+    L = L_hat * length_ratio
+
+    s_scale = L / (D_s * F)
+    t_scale = L**2 / D_s
+
+    dimensional_closure_data = copy.deepcopy(closure_data)
+
+    dimensional_closure_data["dimensionless"] = False
+    dimensional_closure_data["D_s"] = D_s
+    dimensional_closure_data["voxel"] = voxel
+    dimensional_closure_data["L"] = None
+    dimensional_closure_data["T offset"] = T_offset
+    dimensional_closure_data["rescaled from dimensionless"] = {"L": L_hat, "voxel": voxel_hat, "T offset": closure_data["T offset"]}
+
+    for key in ["total area (surface porosity included)", "am-elec area", "am-cbd area (surface porosity omitted)"]:
+        dimensional_closure_data[key] = closure_data[key] * length_ratio**2
+    dimensional_closure_data["total particle volume"] = closure_data["total particle volume"] * length_ratio**3
+
+    if closure_data["times for transient data"] is not None:
+        dimensional_closure_data["times for transient data"] = list(np.array(closure_data["times for transient data"]) * t_scale)
+
+    if closure_data.get("time to steady state") is not None:
+        dimensional_closure_data["time to steady state"] = closure_data["time to steady state"] * t_scale
+
+    for key in ["global s surface average steady", "global s surface average transient", "global s volume average final", "global s volume average transient"]:
+        if closure_data.get(key) is not None:
+            dimensional_closure_data[key] = closure_data[key] * s_scale
+
+    for key, particle_data in closure_data["particle data"].items():
+        dimensional_particle_data = dimensional_closure_data["particle data"][key]
+        dimensional_particle_data["particle surface area"] = particle_data["particle surface area"] * length_ratio**2
+        dimensional_particle_data["particle volume"] = particle_data["particle volume"] * length_ratio**3
+        dimensional_particle_data["centre x position"] = particle_data["centre x position"] * length_ratio
+
+        if "s surf int transient" in particle_data:
+            # remove the dimensionless offset, rescale the integral of s (area scales with L^2), and add the dimensional offset
+            area_hat = particle_data["particle surface area"] / L_hat**2
+            s_surf_int_hat = np.array(particle_data["s surf int transient"]) - closure_data["T offset"] * area_hat
+            dimensional_particle_data["s surf int transient"] = s_surf_int_hat * s_scale * L**2 + T_offset * dimensional_particle_data["particle surface area"]
+
+    if write_path is not None:
+        with open(write_path, 'wb') as f:
+            pickle.dump(dimensional_closure_data, f)
+        print(f"The rescaled closure data was written to {write_path}")
+
+    return dimensional_closure_data
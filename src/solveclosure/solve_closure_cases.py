@@ -0,0 +1,42 @@
+import os
+import asyncio
+import concurrent.futures
+
+from solveclosure.utility import CoreScheduler
+
+
+def solve_closure_cases(cases, core_budget=None, n_setup_workers=1):
+    """
+    Sets up and solves many closure cases at once with solve_closure_multiparticle_async, so that the set up of the next cases
+    (which runs in Python) overlaps with the OpenFOAM solves of the previous ones. The solves share a core budget: a case solved in
+    parallel uses n_procs cores, otherwise 1, and waits until its cores are free. The set up and processing of each case run in a
+    process pool rather than a thread pool: they are mostly CPU-bound Python, and the CPU time, peak RSS and bytes written of a
+    Trace stage are read for the whole process, so stages of cases run at once in threads would reset and inflate each other's.
+
+    Args:
+        cases (list): The arguments of solve_closure_multiparticle for each case, as dictionaries, e.g. [{"case_dir": ..., "img_path": ...,
+        "label_map_path": ..., "voxel": 1e-7, "cbd_surf_por": 0.5, "parallelise": True, "n_procs": 8}, ...].
+        core_budget (int, optional): The number of cores the solvers may use at once. Default is the number of cores of the machine.
+        n_setup_workers (int): The number of cases set up (or processed) at once, each in its own worker process.
+
+    Returns:
+        traces (list): The trace of each case (see solve_closure_multiparticle), or the exception raised by the case if it failed.
+    """
+
+    from solveclosure.solve_closure_multiparticle_async import solve_closure_multiparticle_async
+
+    if core_budget is None:
+        core_budget = os.cpu_count()
+
+    async def solve_all():
+        scheduler = CoreScheduler(core_budget)
+        with concurrent.futures.ProcessPoolExecutor(n_setup_workers) as executor:
+            return await asyncio.gather(*[solve_closure_multiparticle_async(scheduler=scheduler, executor=executor, **case) for case in cases], return_exceptions=True)
+
+    traces = asyncio.run(solve_all())
+
+    for case, trace in zip(cases, traces):
+        if isinstance(trace, BaseException):
+            print(f"\nThe case {case.get('case_dir')} failed: {trace!r}")
+
+    return traces
@@ -3,17 +3,21 @@ import os
 import tifffile as tif
 import pickle
 import time 
+import numpy as np
 
-from solveclosure.utility import add_slash, check_for_existing_solutions, find_latest_openfoam_installation
-from solveclosure.image_analysis import calculate_source_terms_dimensional, calculate_source_terms_dimensionless, check_and_write_area_and_volume_total, return_x_positions, subdivide_image_using_label_map
+from solveclosure.utility import add_slash, check_for_existing_solutions, find_latest_openfoam_installation, load_closure_field, resample_closure_field, Trace
+from solveclosure.image_analysis import calculate_source_terms_dimensional, calculate_source_terms_dimensionless, check_and_write_area_and_volume_total, return_x_positions, subdivide_image_using_label_map, partition_particles_across_processors, colour_neighbour_graph, return_region_cell_labels, estimate_time_params
 from solveclosure.openfoam_case_setup.make_blockMeshDict import make_blockMeshDict 
 from solveclosure.openfoam_case_setup.make_topoSetDict import make_topoSetDict
-from solveclosure.openfoam_case_setup.multiparticle import write_bc_file_multiparticle, write_fvOptions_file_multiparticle, write_myFunctionsDict_multiparticle, write_p_file, write_regionProperties_file, write_surface_integral_func, write_volume_integral_func, write_thermophysicalProperties_file, write_decomposeParDict_file, write_controlDict_file
+from solveclosure.openfoam_case_setup.calibrate_solver_profile import calibrate_solver_profile
+from solveclosure.openfoam_case_setup.write_decomposed_case import write_decomposed_case
+from solveclosure.openfoam_case_setup.run_closure_solver import run_closure_solver
+from solveclosure.openfoam_case_setup.multiparticle import write_bc_file_multiparticle, write_fvOptions_file_multiparticle, write_myFunctionsDict_multiparticle, write_p_file, write_regionProperties_file, write_surface_integral_func, write_volume_integral_func, write_thermophysicalProperties_file, write_decomposeParDict_file, write_controlDict_file, write_cellDecomposition_file, write_region_topoSetDict_file, write_fvSolution_file
 
 
 # ============ Inputs ==============
 
-def solve_closure_multiparticle(case_dir, img_path, label_map_path, voxel, cbd_surf_por, sep_surf_por=1.0, dimensionless=True, D_s=None, L=None, load_of_cmd=None, allow_flux=True, parallelise=False, n_procs=8, run_solver=True, T_offset=None, time_params=None):
+def solve_closure_multiparticle(case_dir, img_path, label_map_path, voxel, cbd_surf_por, sep_surf_por=1.0, dimensionless=True, D_s=None, L=None, load_of_cmd=None, allow_flux=True, parallelise=False, n_procs=8, decomposition="scotch", agglomerate_regions=False, run_solver=True, T_offset=None, time_params=None, initial_field=None, steady=False, trace_path=None, trace_format="json", profile=False, watchdog=False, n_retries=0, solver_profile=None, decomposer="decomposePar", reconstruct=False):
 
     """
     Solves the closure problem as described in [1] using OpenFOAM. 
@@ -32,19 +36,63 @@ def solve_closure_multiparticle(case_dir, img_path, label_map_path, voxel, cbd_s
         allow_flux (bool): Set to False for closure Option 2 (see article). 
         parallelise (bool): Set to True to solve in parallel.   
         n_procs (int): The number of processors to use if parallelisation chosen. 
+        decomposition (str): The domain decomposition used if parallelisation chosen. "scotch" decomposes the merged mesh, 
+        "particles" assigns whole particles to processors (keeping contacting particles together) using the manual method. 
+        agglomerate_regions (bool): Set to True to merge particles which do not touch into a small number of solver regions, 
+        which reduces the per-region overhead of chtMultiRegionFoam for cases with many particles. 
         run_solver (bool): Set to false to setup the OpenFOAM case without running the solver. 
         T_offset (float): A large number to make compatible with OpenFOAM's solvers (see docs). Default 1e5 for dimensional and 10 for dimensionless. 
         time_params (dict, optional): A dictionary specifying time parameters for the solver, 
         with entries "T_end" (the final simulation time), "dt" (the intial time step), "write_interval" 
-        (the interval at which spatial fields are written). If None, default values will be used.
+        (the interval at which spatial fields are written) and "max_Di" (the maximum diffusion number). Missing entries take default values.
+        Set to "auto" to choose them from the diffusion time scale of the largest particle, or cluster of contacting particles (see estimate_time_params).
+        initial_field (str or nd array, optional): Warm-starts the solver from a previous solution instead of a uniform field. Either the case_dir 
+        of a solved case (e.g. with another surface porosity, or a coarser resolution) or an array of s with NaN outside the active material 
+        (e.g. from the native solver). Fields of a different resolution are interpolated onto the image. 
+        steady (bool): Set to True to iterate directly to steady state with chtMultiRegionSimpleFoam (steadyState ddt, with residual 
+        control in solver_settings_steady/fvSolution) instead of solving the pseudo-transient problem. time_params then takes "n_iterations" 
+        and "write_interval". The undetermined constant of the steady problem is removed by the volume average correction. 
+        trace_path (str, optional): The path to write the trace of the run to (see Returns). 
+        trace_format (str): The format of the trace file, "json" or "chrome" (for chrome://tracing or Perfetto). 
+        profile (bool): Set to True to profile the Python stages with cProfile and tracemalloc. The cProfile statistics are written 
+        next to trace_path (.prof) and are in trace.profile_stats. 
+        watchdog (bool or dict): Set to True to watch the output of the solver as it is produced (by default the solver runs unwatched, 
+        with its output redirected to log.solver). The solver is then killed as soon as it diverges (NaN residuals or T), stalls (deltaT collapses or the linear solvers reach maxIter), 
+        drifts towards the T_offset boundary (T below 10 % of T_offset) or fails. A dict is passed to SolverWatchdog as keyword arguments 
+        to choose the signatures and thresholds. The outcome is recorded in closure_data["solver watchdog"]. 
+        n_retries (int): The number of times a transient solve killed by the watchdog is rerun with safer time parameters (a 10 times 
+        smaller initial dt and half the maximum diffusion number each time). The log of each killed run is kept as log.solver.failed_<n>. 
+        solver_profile (str or dict, optional): The linear solver settings of every region, either a profile of write_fvSolution_file 
+        ("PCG-DIC", "PCG-FDIC", "GAMG", "PCG-DIC-relTol" or "GAMG-relTol") or a dictionary of OpenFOAM solver keywords. Set to "calibrate" to 
+        time "PCG-DIC", "PCG-FDIC" and "GAMG" on a few regions for a short run and use the fastest (see calibrate_solver_profile). 
+        If None, solver_settings/fvSolution is copied to every region as before. The choice is recorded in closure_data["solver profile"]. 
+        decomposer (str): How a parallel case is decomposed. "decomposePar" runs decomposePar -allRegions, "python" writes the processor 
+        directories directly from the particle partition (see write_decomposed_case), which is faster. "python" requires decomposition="particles". 
+        reconstruct (bool): Set to True to run reconstructPar -allRegions after a parallel solve. The closure results only need the 
+        postProcessing integrals, and load_closure_field reads the fields of a parallel case straight from the processor directories, 
+        so reconstruction is not needed otherwise. 
         
     Returns:
-        No returns. Operates on a filesystem directory. 
+        trace (Trace): The wall time, CPU time, peak RSS and bytes written of each stage and OpenFOAM command, and the exit status of 
+        each command. The OpenFOAM case itself is written to case_dir. 
     """
 
     # check inputs 
     if not dimensionless and D_s is None:
         raise ValueError("\nD_s must be provided for dimensional case.")
+
+    if decomposition not in ["scotch", "particles"]:
+        raise ValueError("\ndecomposition must be either 'scotch' or 'particles'.")
+
+    if decomposer not in ["decomposePar", "python"]:
+        raise ValueError("\ndecomposer must be either 'decomposePar' or 'python'.")
+
+    if parallelise and decomposer == "python" and decomposition != "particles":
+        raise ValueError("\ndecomposer='python' needs the particle partition, so decomposition must be 'particles'.")
+
+    auto_time_params = isinstance(time_params, str)
+    if auto_time_params and (time_params != "auto" or steady):
+        raise ValueError("\ntime_params can only be 'auto' for a transient case." if steady else "\ntime_params must be a dictionary, None or 'auto'.")
     
     if dimensionless:
         D_s = 1
@@ -65,40 +113,57 @@ def solve_closure_multiparticle(case_dir, img_path, label_map_path, voxel, cbd_s
     check_for_existing_solutions(case_dir)
 
     start_time = time.time()
+    trace = Trace(profile=profile, trace_memory=profile)
     
-    print("Copying template files for OpenFOAM case.")
-    # copy necessary template files 
-    template_path = os.path.join(os.path.dirname(__file__), "templates/multiparticle/")
-    cmd = f"cp -r {template_path}* {case_dir}"
-    subprocess.run(["bash", "-c", cmd], check=True)
+    with trace.stage("copy templates"):
+        print("Copying template files for OpenFOAM case.")
+        # copy necessary template files 
+        template_path = os.path.join(os.path.dirname(__file__), "templates/multiparticle/")
+        cmd = f"cp -r {template_path}* {case_dir}"
+        subprocess.run(["bash", "-c", cmd], check=True)
 
-    # write controlDict file
-    controlDict_path = case_dir + "/openfoam_case/system/controlDict"
-    write_controlDict_file(controlDict_path, dimensionless, time_params)
+        # write controlDict file
+        controlDict_path = case_dir + "/openfoam_case/system/controlDict"
+        time_params = write_controlDict_file(controlDict_path, dimensionless, None if auto_time_params else time_params, steady=steady)
 
     # clean directory
     of_case_dir = case_dir + "openfoam_case/"
     cmd = f"{load_of_cmd} && foamListTimes -rm -case {of_case_dir}"
-    subprocess.run(["bash", "-c", cmd], check=True)
-    cmd = f"cd {of_case_dir} && rm -rf ../closure_data.pickle postProcessing/ process* 0/particle_* constant/polyMesh/ constant/particle_* system/particle_* system/myFunctionsDict log*"
+    trace.run("foamListTimes", cmd)
+    cmd = f"cd {of_case_dir} && rm -rf ../closure_data.pickle postProcessing/ process* 0/particle_* 0/region_* constant/polyMesh/ constant/particle_* constant/region_* system/particle_* system/region_* system/myFunctionsDict log*"
     subprocess.run(["bash", "-c", cmd], check=False)
 
-    # load tif 
-    print("Analysing image.")
-    img = tif.imread(img_path)
-    label_map = tif.imread(label_map_path)
+    with trace.stage("read image"):
+        # load tif 
+        print("Analysing image.")
+        img = tif.imread(img_path)
+        label_map = tif.imread(label_map_path)
+
+        if dimensionless and L is None:
+            print("\nLengthscale not provided for dimensionless case. Setting to length of the image's axis 0 by default.")
+            L = img.shape[0] * voxel
 
-    if dimensionless and L is None:
-        print("\nLengthscale not provided for dimensionless case. Setting to length of the image's axis 0 by default.")
-        L = img.shape[0] * voxel
+        # Inactive material is ignored and treated as elec
+        img[img == 51] = 0
 
-    # Inactive material is ignored and treated as elec
-    img[img == 51] = 0
+        if initial_field is not None:
+            if isinstance(initial_field, str):
+                print(f"Loading the initial field from {initial_field}.")
+                initial_field, previous_closure_data = load_closure_field(initial_field)
+                if previous_closure_data["dimensionless"] != dimensionless:
+                    raise ValueError("\nThe initial field must come from a case which is also dimensionless." if dimensionless else "\nThe initial field must come from a case which is also dimensional.")
+            initial_field = resample_closure_field(np.asarray(initial_field, dtype=float), img.shape)
 
-    # subdivide tifs to find source terms
-    subsections, centres, neighbour_ids = subdivide_image_using_label_map(label_map_path, img, show_subsections=False)
+    with trace.stage("subdivide image"):
+        # subdivide tifs to find source terms
+        subsections, centres, neighbour_ids = subdivide_image_using_label_map(label_map_path, img, show_subsections=False)
 
-    x_positions_m = return_x_positions(centres, voxel)
+        x_positions_m = return_x_positions(centres, voxel)
+
+        if auto_time_params:
+            time_params = estimate_time_params(label_map, neighbour_ids, voxel, dimensionless=dimensionless, D_s=D_s, L=L, allow_flux=allow_flux)
+            print(f"Time parameters chosen from a diffusion time of {time_params['diffusion time']:g}: T_end = {time_params['T_end']:g}, maxDi = {time_params['max_Di']:g}.")
+            time_params = write_controlDict_file(controlDict_path, dimensionless, time_params)
 
     # initialise closure data 
     closure_data = {"particle data": {}, 
@@ -112,20 +177,46 @@ def solve_closure_multiparticle(case_dir, img_path, label_map_path, voxel, cbd_s
                     "total particle volume": None,
                     "T offset": T_offset,
                     "dimensionless": dimensionless,
+                    "L": L,
+                    "voxel": voxel,
+                    "D_s": D_s,
+                    "decomposition": None,
+                    "region map": None,
+                    "steady": steady,
+                    "time params": time_params,
+                    "case settings": {"img path": os.path.abspath(img_path), "label map path": os.path.abspath(label_map_path), 
+                                      "cbd surface porosity": cbd_surf_por, "sep surface porosity": sep_surf_por, "allow flux": allow_flux, 
+                                      "parallelise": parallelise, "n procs": n_procs, "decomposition": decomposition, 
+                                      "agglomerate regions": agglomerate_regions, "watchdog": watchdog, "n retries": n_retries},
                     }
 
+    with trace.stage("region map"):
+        # particles which do not touch can share a solver region, since sources and integrals are applied per cellZone/faceZone
+        if agglomerate_regions:
+            particle_colours = colour_neighbour_graph(neighbour_ids)
+            region_map = {key: f"region_{particle_colours[key]}" for key in subsections.keys()}
+        else:
+            region_map = {key: f"particle_{key}" for key in subsections.keys()}
+        closure_data["region map"] = region_map
+
+        region_members = {}
+        for key, region_name in region_map.items():
+            region_members.setdefault(region_name, []).append(key)
+
     
     print("\nGenerating files for OpenFOAM case.")
-    # make blockmeshDict 
-    blockMeshDict_path = case_dir + "/openfoam_case/system/blockMeshDict"
-    make_blockMeshDict(blockMeshDict_path, img, voxel, dimensionless, L)
+    with trace.stage("make blockMeshDict"):
+        # make blockmeshDict 
+        blockMeshDict_path = case_dir + "/openfoam_case/system/blockMeshDict"
+        make_blockMeshDict(blockMeshDict_path, img, voxel, dimensionless, L)
 
-    # make topoSetDict 
-    topoSetDict_path = case_dir + "/openfoam_case/system/topoSetDict"
-    make_topoSetDict(topoSetDict_path, img, multi_particle=True, label_map=label_map)
+    with trace.stage("make topoSetDict"):
+        # make topoSetDict 
+        topoSetDict_path = case_dir + "/openfoam_case/system/topoSetDict"
+        make_topoSetDict(topoSetDict_path, img, multi_particle=True, label_map=label_map, region_map=region_map if agglomerate_regions else None)
 
 
-    particle_names = [f"particle_{key}" for key in subsections.keys()]
+    region_names = list(region_members.keys())
     myFunctionsDict_path = of_case_dir + f"/system/myFunctionsDict"
     # make empty myFunctionsDict file to prevent error when running cmds
     subprocess.run(["bash", "-c", f"touch {myFunctionsDict_path}"], check=True)
@@ -133,119 +224,212 @@ def solve_closure_multiparticle(case_dir, img_path, label_map_path, voxel, cbd_s
     print("Running OpenFOAM commands: blockMesh, topoSet, splitMeshRegions.")
     # Run blockMesh
     cmd = f"{load_of_cmd} && blockMesh -case {of_case_dir} > {of_case_dir}log.blockMesh 2>&1"
-    subprocess.run(["bash", "-c", cmd], check=True)
+    trace.run("blockMesh", cmd)
 
     # Run topoSet
     cmd = f"{load_of_cmd} && topoSet -case {of_case_dir} > {of_case_dir}log.topoSet 2>&1"
-    subprocess.run(["bash", "-c", cmd], check=True)
+    trace.run("topoSet", cmd)
 
     # splitMeshRegions
     cmd = f"{load_of_cmd} && splitMeshRegions -case {of_case_dir} -cellZonesOnly -overwrite > {of_case_dir}log.splitMeshRegions 2>&1"
-    subprocess.run(["bash", "-c", cmd], check=True)
+    trace.run("splitMeshRegions", cmd)
 
     # get rid of Elec and CBD dirs
     cmd = f"cd {of_case_dir} && rm -rf 0/Elec constant/Elec system/Elec 0/CBD constant/CBD system/CBD"
     subprocess.run(["bash", "-c", cmd], check=False)
 
-    # write regionProperties file
-    regionprops_path = of_case_dir + f"/constant/regionProperties"
-    write_regionProperties_file(regionprops_path, particle_names)
-
-
-    print("Calculating and writing source terms and BCs for each particle.")
-    # create source terms file
-    for key, subsection in subsections.items():
-        
-        particle_name = "particle_" + str(key)
+    # the particle ID of each cell of a region, in region cell order
+    region_cell_labels = {}
+    if agglomerate_regions:
+        print("Creating particle cellZones and faceZones in each agglomerated region.")
+        for region_name, members in region_members.items():
+            region_cell_labels[region_name] = return_region_cell_labels(img, label_map, members)
+            particle_cell_ids = {key: np.nonzero(region_cell_labels[region_name] == key)[0] for key in members}
 
-        # write correct source terms to OF files 
-        if dimensionless:
-            S_vol, bc_source_elec, bc_source_cbd, total_particle_area, V_am = calculate_source_terms_dimensionless(subsection, voxel, cbd_surf_por, L)
-        else:
-            S_vol, bc_source_elec, bc_source_cbd, total_particle_area, V_am = calculate_source_terms_dimensional(subsection, voxel, cbd_surf_por, D_s)
+            subprocess.run(["bash", "-c", f"mkdir -p {of_case_dir}system/{region_name}"], check=True)
+            region_topoSetDict_path = of_case_dir + f"system/{region_name}/topoSetDict"
+            write_region_topoSetDict_file(region_topoSetDict_path, region_name, particle_cell_ids, neighbour_ids)
 
-        closure_data["particle data"][key] = {"particle surface area": total_particle_area, "particle volume": V_am, "centre x position": x_positions_m[key - 1]}
+            cmd = f"{load_of_cmd} && topoSet -case {of_case_dir} -region {region_name} > {of_case_dir}log.topoSet.{region_name} 2>&1"
+            trace.run(f"topoSet {region_name}", cmd)
 
-        # === files that are edited here (except p) and not be the user ===
+    # write regionProperties file
+    regionprops_path = of_case_dir + f"/constant/regionProperties"
+    write_regionProperties_file(regionprops_path, region_names)
 
-        bc_path = of_case_dir + f"0/particle_{key}/T"
-        write_bc_file_multiparticle(bc_path, particle_name, bc_source_elec, bc_source_cbd, neighbour_ids, T_offset, allow_flux=allow_flux)
 
-        p_path = of_case_dir + f"/0/particle_{key}/p"
-        write_p_file(p_path, particle_name)
+    with trace.stage("source terms and case files"):
+        print("Calculating and writing source terms and BCs for each particle.")
+        # create source terms file
+        vol_sources = {}
+        bc_sources = {}
+        for key, subsection in subsections.items():
         
-        fvOptions_path = of_case_dir + f"/constant/particle_{key}/fvOptions"
-        write_fvOptions_file_multiparticle(fvOptions_path, particle_name, S_vol)
+            particle_name = "particle_" + str(key)
+
+            # write correct source terms to OF files 
+            if dimensionless:
+                S_vol, bc_source_elec, bc_source_cbd, total_particle_area, V_am = calculate_source_terms_dimensionless(subsection, voxel, cbd_surf_por, L)
+            else:
+                S_vol, bc_source_elec, bc_source_cbd, total_particle_area, V_am = calculate_source_terms_dimensional(subsection, voxel, cbd_surf_por, D_s)
+
+            closure_data["particle data"][key] = {"particle surface area": total_particle_area, "particle volume": V_am, "centre x position": x_positions_m[key - 1], 
+                                                 "neighbour ids": neighbour_ids[key]}
+
+            vol_sources[key] = S_vol
+            bc_sources[key] = (bc_source_elec, bc_source_cbd)
+
+            # integrals are taken over the particle's patches, or its zones if it shares an agglomerated region
+            region_name = region_map[key] if agglomerate_regions else None
+
+            for type in ["elec", "cbd", "sep"]:
+                if type in neighbour_ids[key]:
+                    surface_int_path = of_case_dir + f"/system/{particle_name}_surfaceIntegral_{type}"
+                    write_surface_integral_func(surface_int_path, particle_name, type=type, region_name=region_name)
+
+            vol_int_path = of_case_dir + f"/system/{particle_name}_volumeIntegral"
+            write_volume_integral_func(vol_int_path, particle_name, region_name=region_name)
+
+        for region_name, members in region_members.items():
+
+            if agglomerate_regions:
+                # the boundary sources are the same for every particle, so the region patches can be used directly
+                bc_source_elec = bc_sources[members[0]][0]
+                bc_source_cbd = next((bc_sources[key][1] for key in members if bc_sources[key][1] is not False), False)
+                region_neighbour_ids = sorted({particle_colours[id] for key in members for id in neighbour_ids[key] if not isinstance(id, str)})
+                vol_source = {f"particle_{key}": vol_sources[key] for key in members}
+                neighbour_prefix = "region_"
+            else:
+                key = members[0]
+                bc_source_elec, bc_source_cbd = bc_sources[key]
+                region_neighbour_ids = neighbour_ids
+                vol_source = vol_sources[key]
+                neighbour_prefix = "particle_"
+
+            # === files that are edited here (except p) and not be the user ===
+
+            region_initial_field = None
+            if initial_field is not None:
+                # the region cells are in the blockMesh cell order (i fastest)
+                region_mask = (img == 1) & np.isin(label_map, members)
+                region_initial_field = initial_field.transpose(2, 1, 0)[region_mask.transpose(2, 1, 0)] + T_offset
+
+            bc_path = of_case_dir + f"0/{region_name}/T"
+            write_bc_file_multiparticle(bc_path, region_name, bc_source_elec, bc_source_cbd, region_neighbour_ids, T_offset, allow_flux=allow_flux, neighbour_prefix=neighbour_prefix, initial_field=region_initial_field)
+
+            p_path = of_case_dir + f"/0/{region_name}/p"
+            write_p_file(p_path, region_name)
+        
+            fvOptions_path = of_case_dir + f"/constant/{region_name}/fvOptions"
+            write_fvOptions_file_multiparticle(fvOptions_path, region_name, vol_source)
 
-        thermoprops_path =  of_case_dir + f"/constant/particle_{key}/thermophysicalProperties"
-        write_thermophysicalProperties_file(thermoprops_path, particle_name, D_s)
+            thermoprops_path =  of_case_dir + f"/constant/{region_name}/thermophysicalProperties"
+            write_thermophysicalProperties_file(thermoprops_path, region_name, D_s)
 
-        for type in ["elec", "cbd", "sep"]:
-            if type in neighbour_ids[key]:
-                surface_int_path = of_case_dir + f"/system/{particle_name}_surfaceIntegral_{type}"
-                write_surface_integral_func(surface_int_path, particle_name, type=type)
+            # === files that can be edited by the user ===
+            solver_settings_dir = case_dir + ("solver_settings_steady/" if steady else "solver_settings/")
+            schemes_source_path = solver_settings_dir + "fvSchemes"
+            system_path = of_case_dir + f"/system/{region_name}/"
+            cmd = f"cp {schemes_source_path} {system_path}"
+            subprocess.run(["bash", "-c", cmd], check=True)
 
-        vol_int_path = of_case_dir + f"/system/{particle_name}_volumeIntegral"
-        write_volume_integral_func(vol_int_path, particle_name)
+            if solver_profile is None or solver_profile == "calibrate":
+                solution_source_path = solver_settings_dir + "fvSolution"
+                cmd = f"cp {solution_source_path} {system_path}"
+                subprocess.run(["bash", "-c", cmd], check=True)
+            else:
+                write_fvSolution_file(system_path + "fvSolution", profile=solver_profile, steady=steady)
 
-        # === files that can be edited by the user ===
-        schemes_source_path = case_dir + "solver_settings/fvSchemes"
-        system_path = of_case_dir + f"/system/particle_{key}/"
-        cmd = f"cp {schemes_source_path} {system_path}"
-        subprocess.run(["bash", "-c", cmd], check=True)
+        # add postprocessing functions
+        write_myFunctionsDict_multiparticle(myFunctionsDict_path, neighbour_ids)
 
-        solution_source_path = case_dir + "solver_settings/fvSolution"
-        cmd = f"cp {solution_source_path} {system_path}"
-        subprocess.run(["bash", "-c", cmd], check=True)
+    if solver_profile is not None:
+        closure_data["solver profile"] = {"profile": solver_profile}
 
-    # add postprocessing functions
-    write_myFunctionsDict_multiparticle(myFunctionsDict_path, neighbour_ids)
+    if solver_profile == "calibrate":
+        with trace.stage("calibrate solver profile"):
+            region_sizes = {region_name: int(sum(np.sum(subsections[key] == 1) for key in members)) for region_name, members in region_members.items()}
+            h = voxel / L if dimensionless else voxel
+            chosen_profile, calibration = calibrate_solver_profile(of_case_dir, region_sizes, load_of_cmd, trace, time_params, dimensionless, h, D_s, steady=steady)
+            for region_name in region_names:
+                write_fvSolution_file(of_case_dir + f"system/{region_name}/fvSolution", profile=chosen_profile, steady=steady)
+            closure_data["solver profile"] = {"profile": chosen_profile, "calibration": calibration}
 
 
     if parallelise:
-        print("Decomposing for parallel run.")
-        # make the decomposeParDict file
-        decomposeParDict_path = of_case_dir + "/system/decomposeParDict"
-        write_decomposeParDict_file(decomposeParDict_path, n_procs)
-
-        for particle_name in particle_names:
-            # copy the decomposeParDict file to each particle dir
-            cmd = f"cp {decomposeParDict_path} {of_case_dir}/system/{particle_name}/"
-            subprocess.run(["bash", "-c", cmd], check=True)
-
-        cmd = f"{load_of_cmd} && decomposePar -case {of_case_dir} -allRegions > {of_case_dir}log.decomposePar 2>&1"
-        subprocess.run(["bash", "-c", cmd], check=True)
+        with trace.stage("decomposition"):
+            print("Decomposing for parallel run.")
+            # make the decomposeParDict file
+            decomposeParDict_path = of_case_dir + "/system/decomposeParDict"
+            if decomposition == "particles":
+                write_decomposeParDict_file(decomposeParDict_path, n_procs, method="manual")
+
+                # assign whole particles to processors and report the expected quality before solving
+                particle_procs, imbalance, n_cut_interfaces = partition_particles_across_processors(subsections, neighbour_ids, n_procs)
+                print(f"Particle-aware decomposition: expected load imbalance of {round(imbalance * 100, 1)} % with {n_cut_interfaces} particle interfaces cut between processors.")
+                closure_data["decomposition"] = {"method": "particles", "particle processors": particle_procs, 
+                                                 "load imbalance": imbalance, "cut interfaces": n_cut_interfaces, "decomposer": decomposer}
+
+                region_cell_procs = {}
+                for region_name, members in region_members.items():
+                    if agglomerate_regions:
+                        region_cell_procs[region_name] = [particle_procs[key] for key in region_cell_labels[region_name]]
+                    else:
+                        region_cell_procs[region_name] = [particle_procs[members[0]]] * int(np.sum(subsections[members[0]] == 1))
+                    if decomposer == "decomposePar":
+                        cellDecomposition_path = of_case_dir + f"/constant/{region_name}/cellDecomposition"
+                        write_cellDecomposition_file(cellDecomposition_path, region_name, region_cell_procs[region_name])
+            else:
+                write_decomposeParDict_file(decomposeParDict_path, n_procs)
+                closure_data["decomposition"] = {"method": "scotch"}
+
+            for region_name in region_names:
+                # copy the decomposeParDict file to each region dir
+                cmd = f"cp {decomposeParDict_path} {of_case_dir}/system/{region_name}/"
+                subprocess.run(["bash", "-c", cmd], check=True)
+
+        if decomposer == "python":
+            with trace.stage("write decomposed case"):
+                write_decomposed_case(of_case_dir, region_cell_procs, n_procs)
+        else:
+            cmd = f"{load_of_cmd} && decomposePar -case {of_case_dir} -allRegions > {of_case_dir}log.decomposePar 2>&1"
+            trace.run("decomposePar", cmd)
 
 
-    # check area and volume, and add it to the closure data dictionary
-    closure_data = check_and_write_area_and_volume_total(closure_data, img, voxel, cbd_surf_por)
+    with trace.stage("area and volume check"):
+        # check area and volume, and add it to the closure data dictionary
+        closure_data = check_and_write_area_and_volume_total(closure_data, img, voxel, cbd_surf_por)
 
 
-    # ======= write particle_data file =========
-    closure_data_path = case_dir + "closure_data.pickle"
-    with open(closure_data_path, 'wb') as f:
-        pickle.dump(closure_data, f)
+        # ======= write particle_data file =========
+        closure_data_path = case_dir + "closure_data.pickle"
+        with open(closure_data_path, 'wb') as f:
+            pickle.dump(closure_data, f)
 
     # =========== Run solver if requested =====
     if run_solver: 
         print("Running solver.")
-        if parallelise:
-            cmd = f"{load_of_cmd} && mpirun -np {n_procs} chtMultiRegionFoam -parallel -case {of_case_dir} > {of_case_dir}log.solver 2>&1"
-        else:
-            cmd = f"{load_of_cmd} && chtMultiRegionFoam -case {of_case_dir} > {of_case_dir}log.solver 2>&1"
-        subprocess.run(["bash", "-c", cmd], check=False)
+        reason = run_closure_solver(of_case_dir, closure_data, closure_data_path, load_of_cmd, trace, parallelise=parallelise, n_procs=n_procs, watchdog=watchdog, n_retries=n_retries)
+
+        if reason is None:
+            if parallelise and reconstruct:
+                print("Reconstructing results.")
+                cmd = f"{load_of_cmd} && reconstructPar -case {of_case_dir} -allRegions > {of_case_dir}log.reconstructPar 2>&1"
+                trace.run("reconstructPar", cmd, check=False)
 
-        # reconstruct is parallelised 
-        if parallelise:
-            print("Reconstructing results.")
-            cmd = f"{load_of_cmd} && reconstructPar -case {of_case_dir} -allRegions > {of_case_dir}log.reconstructPar 2>&1"
-            subprocess.run(["bash", "-c", cmd], check=False)
+            from solveclosure.process_closure_results import process_closure_results
+            print("Processing closure results.")
+            with trace.stage("process closure results"):
+                process_closure_results(case_dir, cbd_surf_por, sep_surf_por, dimensionless, L=L, write=True, multiparticle=True)  
 
-        from solveclosure.process_closure_results import process_closure_results
-        print("Processing closure results.")
-        process_closure_results(case_dir, cbd_surf_por, sep_surf_por, dimensionless, L=L, write=True, multiparticle=True)  
+    trace.finish()
+    trace.summary()
+    if trace_path is not None:
+        trace.write(trace_path, format=trace_format)
 
     end_time = time.time()
-    print("\nThe total run time was ", round(end_time - start_time, 1), " seconds.")      
+    print("\nThe total run time was ", round(end_time - start_time, 1), " seconds.")
+
+    return trace      
 
 
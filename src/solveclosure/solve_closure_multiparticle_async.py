@@ -0,0 +1,159 @@
+import os
+import time
+import pickle
+import signal
+import asyncio
+import inspect
+import functools
+
+from solveclosure.utility import add_slash, find_latest_openfoam_installation, CoreScheduler, SolverWatchdog
+from solveclosure.openfoam_case_setup.run_closure_solver import solver_command, start_solver_watchdog, record_solver_attempt, next_retry_time_params, reset_case_for_retry, finish_solver_watchdog
+
+
+async def solve_closure_multiparticle_async(case_dir, img_path, label_map_path, voxel, cbd_surf_por, scheduler=None, executor=None, **kwargs):
+    """
+    Solves the closure problem as solve_closure_multiparticle does, as a coroutine, so that many cases can be set up and solved at once
+    (see solve_closure_cases). The case is set up (image analysis, meshing and case files) by solve_closure_multiparticle with
+    run_solver=False in the executor, so that the event loop is free while it runs. The solver then waits for its cores from the scheduler,
+    and runs as an asyncio subprocess (watched and retried as in solve_closure_multiparticle). The results are processed in the executor.
+
+    Args:
+        case_dir (str): The path to an empty directory where the OpenFOAM case will be built.
+        img_path (str): The path to the image of the electrode micrstructure in tif format. Electrolyte labelled 0, AM as 1, and CBD as 2.
+        label_map_path (str): The path to the label map which identifies particle IDs. Same dimensions as the image.
+        voxel (float): The voxel side length of the image in meters.
+        cbd_surf_por (float): The surface porosity of the CBD phase.
+        scheduler (CoreScheduler, optional): The scheduler shared by the cases solved at once. A solve uses n_procs cores if parallelise
+        is True, and 1 otherwise. If None, the solve does not wait for other cases.
+        executor (concurrent.futures.Executor, optional): The executor of the set up and processing. If None, the default executor of the event loop.
+        Use a ProcessPoolExecutor when cases are set up at once, since the CPU time, peak RSS and bytes written of the trace stages are per process.
+        **kwargs: The other arguments of solve_closure_multiparticle.
+
+    Returns:
+        trace (Trace): The trace of the set up, solve and processing of the case.
+    """
+
+    from solveclosure.solve_closure_multiparticle import solve_closure_multiparticle
+    from solveclosure.process_closure_results import process_closure_results
+
+    # the settings of the case, with the defaults of solve_closure_multiparticle
+    settings = inspect.signature(solve_closure_multiparticle).bind(case_dir, img_path, label_map_path, voxel, cbd_surf_por, **kwargs)
+    settings.apply_defaults()
+    settings = settings.arguments
+
+    # find OpenFOAM once, for both the set up and the solve
+    if settings["load_of_cmd"] is None:
+        settings["load_of_cmd"] = find_latest_openfoam_installation()
+    load_of_cmd = settings["load_of_cmd"]
+
+    loop = asyncio.get_running_loop()
+    setup = functools.partial(solve_closure_multiparticle, **{**settings, "run_solver": False, "trace_path": None})
+    trace = await loop.run_in_executor(executor, setup)
+
+    if not settings["run_solver"]:
+        return trace
+
+    case_dir = add_slash(case_dir)
+    of_case_dir = case_dir + "openfoam_case/"
+    closure_data_path = case_dir + "closure_data.pickle"
+    with open(closure_data_path, 'rb') as f:
+        closure_data = pickle.load(f)
+
+    parallelise, n_procs = settings["parallelise"], settings["n_procs"]
+    watchdog, n_retries = settings["watchdog"], settings["n_retries"]
+    solver, cmd = solver_command(of_case_dir, load_of_cmd, settings["steady"], parallelise, n_procs)
+
+    if scheduler is None:
+        scheduler = CoreScheduler(n_procs if parallelise else 1)
+
+    async with scheduler.cores(n_procs if parallelise else 1):
+        print(f"Running solver for {case_dir}.")
+        reason = None
+        if not watchdog:
+            await run_traced(trace, solver, f"{cmd} > {of_case_dir}log.solver 2>&1")
+        else:
+            # the same attempts and retries as run_closure_solver, with the solver run as an asyncio subprocess
+            watchdog_settings = start_solver_watchdog(closure_data, watchdog)
+            time_params = closure_data["time params"]
+
+            for attempt in range(n_retries + 1):
+                solver_watchdog = SolverWatchdog(of_case_dir + "log.solver", **watchdog_settings)
+                returncode = await run_traced(trace, solver if attempt == 0 else f"{solver} retry {attempt}", cmd, watchdog=solver_watchdog)
+
+                if not record_solver_attempt(closure_data, time_params, solver_watchdog.reason, returncode, attempt, n_retries):
+                    break
+
+                time_params = next_retry_time_params(time_params)
+                print(f"Retrying the solver for {case_dir} with dt = {time_params['dt']:g} and maxDi = {time_params['max_Di']:g}.")
+                reset = functools.partial(reset_case_for_retry, of_case_dir, attempt, time_params, closure_data["dimensionless"], load_of_cmd, trace, parallelise)
+                await loop.run_in_executor(None, reset)
+
+            reason = finish_solver_watchdog(closure_data, closure_data_path, of_case_dir)
+
+        if reason is None and parallelise and settings["reconstruct"]:
+            await run_traced(trace, "reconstructPar", f"{load_of_cmd} && reconstructPar -case {of_case_dir} -allRegions > {of_case_dir}log.reconstructPar 2>&1")
+
+    if reason is None:
+        wall_start = time.perf_counter()
+        process = functools.partial(process_closure_results, case_dir, settings["cbd_surf_por"], settings["sep_surf_por"], closure_data["dimensionless"],
+                                    L=closure_data["L"], write=True, multiparticle=True)
+        await loop.run_in_executor(executor, process)
+        trace.record("process closure results", wall_start)
+
+    if settings["trace_path"] is not None:
+        trace.write(settings["trace_path"], format=settings["trace_format"])
+
+    return trace
+
+
+async def run_traced(trace, name, cmd, watchdog=None):
+    # runs a command with bash as an asyncio subprocess, watched if a watchdog is given, and records it in the trace as Trace.run does
+    wall_start = time.perf_counter()
+
+    if watchdog is None:
+        process = await asyncio.create_subprocess_exec("bash", "-c", cmd)
+    else:
+        # the command gets its own process group, so that the watchdog can kill every process it starts
+        process = await asyncio.create_subprocess_exec("bash", "-c", cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT, start_new_session=True)
+        with open(watchdog.log_path, 'wb') as log:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(process.stdout.read(2**16), watchdog.poll_interval)
+                except asyncio.TimeoutError:
+                    chunk = None
+                if chunk == b"":
+                    break
+                if chunk:
+                    watchdog.feed(chunk, log)
+
+                if watchdog.check_timeout(wall_start) is not None:
+                    watchdog.abort(log)
+                    await kill_process_group(process, watchdog.grace_period)
+                    break
+
+    returncode = await process.wait()
+
+    details = {"exit status": returncode, "command": cmd}
+    if watchdog is not None:
+        details["abort reason"] = watchdog.reason
+    trace.record(name, wall_start, category="subprocess", details=details)
+
+    return returncode
+
+
+async def kill_process_group(process, grace_period):
+    # asks the process group to exit with SIGTERM, then kills whatever is left of it with SIGKILL
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+
+    try:
+        await asyncio.wait_for(process.wait(), grace_period)
+    except asyncio.TimeoutError:
+        pass
+
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
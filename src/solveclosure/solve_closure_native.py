@@ -0,0 +1,345 @@
+# This file solves the multiparticle closure problem with a finite volume discretisation in SciPy, so that the transient results do not need OpenFOAM
+
+import os
+import time
+import inspect
+import pickle
+import numpy as np
+import tifffile as tif
+from scipy import sparse
+from scipy.sparse import linalg as sparse_linalg
+
+from solveclosure.utility import add_slash, load_closure_field, resample_closure_field, find_time_to_steady_state
+from solveclosure.image_analysis import calculate_source_terms_dimensional, calculate_source_terms_dimensionless, check_and_write_area_and_volume_total, return_x_positions, subdivide_image_using_label_map, estimate_time_params
+
+# the relative tolerance of cg is rtol from SciPy 1.12, and tol before (the versions which support Python 3.8)
+CG_RTOL_KEYWORD = "rtol" if "rtol" in inspect.signature(sparse_linalg.cg).parameters else "tol"
+
+
+def assemble_closure_system(img, label_map, h, D, vol_sources, bc_sources, cbd_surf_por, allow_flux=True):
+    """
+    Assembles the finite volume discretisation of the closure problem on the active material voxels. It matches the mesh solved by OpenFOAM:
+    one cell per voxel, two-point fluxes between neighbouring cells (including cells of touching particles if allow_flux is True),
+    fixedGradient faces to the electrolyte and CBD, and zero gradient at the outer walls.
+
+    Args:
+        img (nd array): The electrode image. Electrolyte labelled 0, AM as 1, and CBD as 2.
+        label_map (nd array): The label map which identifies particle IDs.
+        h (float): The cell side length (dimensionless if the case is dimensionless).
+        D (float): The diffusivity (1 if the case is dimensionless).
+        vol_sources (dict): The volume source term of each particle.
+        bc_sources (dict): The (AM-elec, AM-CBD) gradients of each particle. The AM-CBD gradient is False if the particle does not touch CBD.
+        cbd_surf_por (float): The CBD surface porosity, used to weight the AM-CBD faces in the surface integrals.
+        allow_flux (bool): Set to False for closure Option 2, so that faces between particles have zero gradient.
+
+    Returns:
+        system (dict): The AM cells ("cells", flat C-order image indices), the diffusion operator per unit volume ("K"),
+        the sources per unit volume ("b"), and the matrices ("surface", "volume") and constants ("surface constant") which give the
+        surface and volume integrals of each particle (rows ordered as "particle ids").
+    """
+
+    am_mask = img == 1
+    if np.any(label_map[am_mask] == 0):
+        raise ValueError("\nEvery AM voxel must belong to a particle in the label map.")
+
+    cells = np.flatnonzero(am_mask)
+    n_cells = len(cells)
+    cell_index = np.full(img.size, -1, dtype=np.int64)
+    cell_index[cells] = np.arange(n_cells)
+    cell_index = cell_index.reshape(img.shape)
+    cell_labels = label_map.ravel()[cells].astype(np.int64)
+
+    particle_ids = np.array(sorted(vol_sources.keys()))
+    particle_rows = np.searchsorted(particle_ids, cell_labels)
+
+    rows, cols = [], []
+    n_elec_faces = np.zeros(n_cells)
+    n_cbd_faces = np.zeros(n_cells)
+
+    for axis in range(3):
+        lower = [slice(None)] * 3
+        upper = [slice(None)] * 3
+        lower[axis] = slice(0, -1)
+        upper[axis] = slice(1, None)
+        a_index, b_index = cell_index[tuple(lower)], cell_index[tuple(upper)]
+        a_phase, b_phase = img[tuple(lower)], img[tuple(upper)]
+
+        internal = (a_index >= 0) & (b_index >= 0)
+        if not allow_flux:
+            internal &= label_map[tuple(lower)] == label_map[tuple(upper)]
+        rows.append(a_index[internal])
+        cols.append(b_index[internal])
+
+        # faces to the electrolyte and CBD, counted for the AM cell on either side
+        for index, other_phase in [(a_index, b_phase), (b_index, a_phase)]:
+            np.add.at(n_elec_faces, index[(index >= 0) & (other_phase == 0)], 1)
+            np.add.at(n_cbd_faces, index[(index >= 0) & (other_phase == 2)], 1)
+
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    adjacency = sparse.coo_matrix((np.ones(len(rows)), (rows, cols)), shape=(n_cells, n_cells)).tocsr()
+    adjacency = adjacency + adjacency.T
+    degree = np.asarray(adjacency.sum(axis=1)).ravel()
+    K = (D / h**2) * (sparse.diags(degree) - adjacency).tocsr()
+
+    # a particle which does not touch CBD has no CBD faces, so its gradient is not needed
+    g_elec = np.array([bc_sources[key][0] for key in particle_ids], dtype=float)[particle_rows]
+    g_cbd = np.array([0.0 if bc_sources[key][1] is False else bc_sources[key][1] for key in particle_ids], dtype=float)[particle_rows]
+    S_vol = np.array([vol_sources[key] for key in particle_ids], dtype=float)[particle_rows]
+
+    b = S_vol + D * (g_elec * n_elec_faces + g_cbd * n_cbd_faces) / h
+
+    # the value of a fixedGradient face is the cell value plus half a cell of the gradient
+    face_weights = (n_elec_faces + cbd_surf_por * n_cbd_faces) * h**2
+    face_constants = (n_elec_faces * g_elec + cbd_surf_por * n_cbd_faces * g_cbd) * h / 2 * h**2
+
+    membership = sparse.csr_matrix((np.ones(n_cells), (particle_rows, np.arange(n_cells))), shape=(len(particle_ids), n_cells))
+    surface = membership.multiply(face_weights).tocsr()
+    volume = membership * h**3
+    surface_constant = membership @ face_constants
+
+    return {"cells": cells, "K": K, "b": b, "surface": surface, "volume": volume,
+            "surface constant": surface_constant, "particle ids": particle_ids}
+
+
+def solve_closure_native(case_dir, img_path, label_map_path, voxel, cbd_surf_por, dimensionless=True, D_s=None, L=None, allow_flux=True, time_params=None, initial_field=None, scheme="bdf2", solver_tol=1e-10):
+    """
+    Solves the transient closure problem (rho = 1, Cp = 1, kappa = D_s, as in the OpenFOAM case) with a finite volume discretisation in SciPy,
+    and writes a closure_data dictionary with the same transient and steady state results as process_closure_results.
+    The mesh is the same as the OpenFOAM case, so the results agree with chtMultiRegionFoam without building an OpenFOAM case.
+    Time is marched implicitly on a geometric ladder of time steps: the step grows by "dt_growth" each step from "dt" until the diffusion
+    number reaches "max_Di" (as maxDi in the controlDict), and is shortened to land on each write time. The system matrix of each
+    step on the ladder, and its Jacobi preconditioner, are built once and reused for every step of that size. The diffusion number bounds the
+    condition number of the system, so the warm-started conjugate gradient method converges in a few iterations.
+
+    Args:
+        case_dir (str): The path to a directory where the results will be written (closure_data.pickle and native_case/).
+        img_path (str): The path to the image of the electrode micrstructure in tif format. Electrolyte labelled 0, AM as 1, and CBD as 2.
+        label_map_path (str): The path to the label map which identifies particle IDs. Same dimensions as the image.
+        voxel (float): The voxel side length of the image in meters.
+        cbd_surf_por (float): The surface porosity of the CBD phase.
+        dimensionless (bool): Set to False to solve a dimensional case. Default is True.
+        D_s (float): The diffusivity of the AM in m2.s-1. Required if solving a dimensional case.
+        L (float): The lengthscale used (m) to non-dimensionalise the problem. If None, but dimensionless=True, the length of axis 0 of the image will be used.
+        allow_flux (bool): Set to False for closure Option 2 (see article).
+        time_params (dict, optional): A dictionary with entries "T_end", "dt" (the initial time step) and "write_interval" (the interval
+        at which the field of s is written), as for solve_closure_multiparticle. Optional entries are "dt_growth" (default 2) and "max_Di" (default 2,
+        tighter than the maxDi of 10 used by OpenFOAM, so that the transient is resolved rather than only the steady state). 
+        Set to "auto" to choose them from the diffusion time scale of the largest particle or particle cluster (see estimate_time_params).
+        initial_field (str or nd array, optional): Starts from a previous solution instead of s = 0, as for solve_closure_multiparticle.
+        scheme (str): "bdf2" (second order, default) or "euler" (implicit Euler, as used by OpenFOAM).
+        solver_tol (float): The relative tolerance of the conjugate gradient solver at each time step.
+
+    Returns:
+        closure_data (dict): The closure data dictionary, also written to closure_data.pickle in case_dir.
+    """
+
+    # check inputs
+    if not dimensionless and D_s is None:
+        raise ValueError("\nD_s must be provided for dimensional case.")
+
+    if scheme not in ["bdf2", "euler"]:
+        raise ValueError("\nscheme must be either 'bdf2' or 'euler'.")
+
+    if dimensionless:
+        D_s = 1
+
+    if time_params is None:
+        if dimensionless:
+            time_params = {"T_end": 0.0056, "dt": 1e-8, "write_interval": 0.0014}
+        else:
+            time_params = {"T_end": 800.0, "dt": 1e-3, "write_interval": 200}
+
+    case_dir = add_slash(case_dir)
+    native_case_dir = case_dir + "native_case/"
+    os.makedirs(native_case_dir, exist_ok=True)
+
+    start_time = time.time()
+
+    print("Analysing image.")
+    img = tif.imread(img_path)
+    label_map = tif.imread(label_map_path)
+
+    if dimensionless and L is None:
+        print("\nLengthscale not provided for dimensionless case. Setting to length of the image's axis 0 by default.")
+        L = img.shape[0] * voxel
+
+    # Inactive material is ignored and treated as elec
+    img[img == 51] = 0
+
+    if isinstance(initial_field, str):
+        print(f"Loading the initial field from {initial_field}.")
+        initial_field, previous_closure_data = load_closure_field(initial_field)
+        if previous_closure_data["dimensionless"] != dimensionless:
+            raise ValueError("\nThe initial field must come from a case which is also dimensionless." if dimensionless else "\nThe initial field must come from a case which is also dimensional.")
+
+    subsections, centres, neighbour_ids = subdivide_image_using_label_map(label_map_path, img, show_subsections=False)
+    x_positions_m = return_x_positions(centres, voxel)
+
+    if isinstance(time_params, str):
+        if time_params != "auto":
+            raise ValueError("\ntime_params must be a dictionary, None or 'auto'.")
+        time_params = estimate_time_params(label_map, neighbour_ids, voxel, dimensionless=dimensionless, D_s=D_s, L=L, allow_flux=allow_flux)
+        print(f"Time parameters chosen from a diffusion time of {time_params['diffusion time']:g}: T_end = {time_params['T_end']:g}, maxDi = {time_params['max_Di']:g}.")
+    dt_growth = time_params.get("dt_growth", 2.0)
+    max_Di = time_params.get("max_Di", 2.0)
+
+    closure_data = {"particle data": {},
+                    "times for transient data": None,
+                    "global s surface average steady": None,
+                    "global s surface average transient": None,
+                    "global s volume average final": None,
+                    "total area (surface porosity included)": None,
+                    "am-elec area": None,
+                    "am-cbd area (surface porosity omitted)": None,
+                    "total particle volume": None,
+                    "T offset": 0,
+                    "dimensionless": dimensionless,
+                    "L": L,
+                    "voxel": voxel,
+                    "D_s": D_s,
+                    "decomposition": None,
+                    "region map": None,
+                    "steady": False,
+                    "method": "native",
+                    "time params": time_params,
+                    "case settings": {"img path": os.path.abspath(img_path), "label map path": os.path.abspath(label_map_path),
+                                      "cbd surface porosity": cbd_surf_por, "allow flux": allow_flux},
+                    }
+
+    print("Calculating source terms for each particle.")
+    vol_sources = {}
+    bc_sources = {}
+    for key, subsection in subsections.items():
+        if dimensionless:
+            S_vol, bc_source_elec, bc_source_cbd, total_particle_area, V_am = calculate_source_terms_dimensionless(subsection, voxel, cbd_surf_por, L)
+        else:
+            S_vol, bc_source_elec, bc_source_cbd, total_particle_area, V_am = calculate_source_terms_dimensional(subsection, voxel, cbd_surf_por, D_s)
+
+        closure_data["particle data"][key] = {"particle surface area": total_particle_area, "particle volume": V_am, "centre x position": x_positions_m[key - 1],
+                                             "neighbour ids": neighbour_ids[key]}
+        vol_sources[key] = S_vol
+        bc_sources[key] = (bc_source_elec, bc_source_cbd)
+
+    closure_data = check_and_write_area_and_volume_total(closure_data, img, voxel, cbd_surf_por)
+
+    print("Assembling the finite volume system.")
+    h = voxel / L if dimensionless else voxel
+    system = assemble_closure_system(img, label_map, h, D_s, vol_sources, bc_sources, cbd_surf_por, allow_flux=allow_flux)
+    K, b = system["K"], system["b"]
+    n_cells = len(system["cells"])
+
+    if initial_field is None:
+        s = np.zeros(n_cells)
+    else:
+        s = resample_closure_field(np.asarray(initial_field, dtype=float), img.shape).ravel()[system["cells"]]
+
+    if dimensionless:
+        total_A = closure_data["total area (surface porosity included)"] / L**2
+        total_particle_V = closure_data["total particle volume"] / L**3
+    else:
+        total_A = closure_data["total area (surface porosity included)"]
+        total_particle_V = closure_data["total particle volume"]
+
+    operators = {}
+
+    def linear_solve(c, rhs, x0, cache):
+        # solves (c I + K) x = rhs, with c = 1/dt for implicit Euler. The matrix and its Jacobi preconditioner are built once per step size
+        if c in operators:
+            A, preconditioner = operators[c]
+        else:
+            A = (sparse.identity(n_cells, format="csr") * c + K).tocsr()
+            preconditioner = sparse.diags(1 / A.diagonal())
+            if cache:
+                operators[c] = (A, preconditioner)
+        x, info = sparse_linalg.cg(A, rhs, x0=x0, M=preconditioner, atol=0, **{CG_RTOL_KEYWORD: solver_tol})
+        if info != 0:
+            raise ValueError(f"\nThe conjugate gradient solver did not converge at a time step of {1 / c} (info = {info}).")
+        return x
+
+    def write_field(t, s):
+        time_dir = native_case_dir + f"{t:g}/"
+        os.makedirs(time_dir, exist_ok=True)
+        np.save(time_dir + "s.npy", s)
+
+    T_end = time_params["T_end"]
+    write_interval = time_params["write_interval"]
+    dt_max = max_Di * h**2 / D_s
+    dt_level = min(time_params["dt"], dt_max)
+
+    times = []
+    surface_integrals = []
+    volume_integrals = []
+
+    print(f"Solving {n_cells} cells with {scheme} time stepping.")
+    t = 0.0
+    s_previous = None
+    dt_previous = None
+    next_write = write_interval
+    n_steps = 0
+    while t < T_end * (1 - 1e-12):
+        # shorten the step to land on the next write time, without leaving the ladder
+        dt = min(dt_level, next_write - t, T_end - t)
+        on_ladder = dt == dt_level
+
+        omega = dt / dt_previous if dt_previous is not None else None
+        # variable step BDF2 is only zero-stable for step ratios below 1 + sqrt(2)
+        if scheme == "bdf2" and s_previous is not None and omega <= 2.0:
+            c = (1 + 2 * omega) / ((1 + omega) * dt)
+            rhs = ((1 + omega) * s - omega**2 / (1 + omega) * s_previous) / dt + b
+        else:
+            c = 1 / dt
+            rhs = s / dt + b
+
+        s_previous, s = s, linear_solve(c, rhs, s, cache=on_ladder)
+        dt_previous = dt
+        t += dt
+        n_steps += 1
+        if abs(t - next_write) <= 1e-9 * next_write:
+            t = next_write
+
+        times.append(t)
+        surface_integrals.append(system["surface"] @ s + system["surface constant"])
+        volume_integrals.append(system["volume"] @ s)
+
+        if t >= next_write:
+            write_field(t, s)
+            next_write += write_interval
+
+        if on_ladder:
+            dt_level = min(dt_level * dt_growth, dt_max)
+
+    # the final field is always written
+    if not os.path.isfile(native_case_dir + f"{t:g}/s.npy"):
+        write_field(t, s)
+
+    surface_integrals = np.array(surface_integrals)
+    volume_integrals = np.array(volume_integrals)
+
+    for row, key in enumerate(system["particle ids"]):
+        closure_data["particle data"][key]["s surf int transient"] = surface_integrals[:, row]
+
+    global_s_surf_ave_transient = surface_integrals.sum(axis=1) / total_A
+    s_vol_ave_transient = volume_integrals.sum(axis=1) / total_particle_V
+    global_s_surf_ave_transient_corr = global_s_surf_ave_transient - s_vol_ave_transient
+
+    closure_data["times for transient data"] = np.array(times)
+    closure_data["global s surface average steady"] = global_s_surf_ave_transient_corr[-1]
+    closure_data["global s surface average transient"] = global_s_surf_ave_transient_corr
+    closure_data["global s volume average final"] = s_vol_ave_transient[-1]
+    closure_data["global s volume average transient"] = s_vol_ave_transient
+    closure_data["time to steady state"] = find_time_to_steady_state(closure_data["times for transient data"], global_s_surf_ave_transient_corr)
+    closure_data["native solver"] = {"scheme": scheme, "n cells": n_cells,
+                                     "n steps": n_steps, "n step sizes": len(operators), "run time": time.time() - start_time}
+
+    print("\nThe global steady state surface average BEFORE correction is ", global_s_surf_ave_transient[-1], "\n")
+    print("\nThe global volume average at the final time is ", s_vol_ave_transient[-1], "\n")
+    print("\nThe global steady state surface average AFTER correction is ", global_s_surf_ave_transient_corr[-1], "\n")
+    print("\nThe global surface average reached steady state (within 0.1 %) at time ", closure_data["time to steady state"], "\n")
+
+    with open(case_dir + "closure_data.pickle", 'wb') as f:
+        pickle.dump(closure_data, f)
+
+    print(f"\nThe total run time was {round(time.time() - start_time, 1)} seconds ({n_steps} time steps, {len(operators)} step sizes).")
+
+    return closure_data
+
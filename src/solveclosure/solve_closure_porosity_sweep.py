@@ -0,0 +1,74 @@
+import os
+import pickle
+
+from solveclosure.utility import add_slash, load_particle_integrals
+from solveclosure.solve_closure_multiparticle import solve_closure_multiparticle
+from solveclosure.evaluate_porosity_sweep import evaluate_porosity_sweep
+
+
+def solve_closure_porosity_sweep(case_dir, img_path, label_map_path, voxel, cbd_surf_pors, sep_surf_pors=None, dimensionless=True, D_s=None, L=None, **kwargs):
+    """
+    Solves the closure problem for a list of CBD surface porosities using only two OpenFOAM solves per microstructure. 
+    Basis cases with CBD surface porosities of 0 and 1 are solved, their per-particle surface and volume integrals are stored in 
+    porosity_basis.pickle, and the closure value for each requested porosity is found by linear superposition (see evaluate_porosity_sweep). 
+
+    Args:
+        case_dir (str): The path to an empty directory where the basis OpenFOAM cases will be built.
+        img_path (str): The path to the image of the electrode micrstructure in tif format. Electrolyte labelled 0, AM as 1, and CBD as 2.
+        label_map_path (str): The path to the label map which identifies particle IDs. Same dimensions as the image. 
+        voxel (float): The voxel side length of the image in meters. 
+        cbd_surf_pors (list): The CBD surface porosities to evaluate.
+        sep_surf_pors (list, optional): The separator surface porosities, one per CBD surface porosity. Default is 1.0 for all.
+        dimensionless (bool): Set to False to solve a dimensional case. Default is True. 
+        D_s (float): The diffusivity of the AM in m2.s-1. Required if solving a dimensional case.
+        L (float): The lengthscale used (m) to non-dimensionalise the problem. If None, but dimensionless=True, the length of axis 0 of the image will be used.
+        **kwargs: Any other arguments of solve_closure_multiparticle (e.g. load_of_cmd, allow_flux, parallelise, n_procs, time_params).
+
+    Returns:
+        closure_values (list): The global s surface average at steady state (after correction) for each porosity.
+    """
+
+    case_dir = add_slash(case_dir)
+
+    if kwargs.get("run_solver") is False:
+        raise ValueError("\nThe basis cases must be solved for a porosity sweep.")
+
+    basis = {"surface integrals": {}, "volume integrals": {}}
+
+    for basis_por in [0, 1]:
+        basis_dir = case_dir + f"basis_cbd_surf_por_{basis_por}/"
+        os.makedirs(basis_dir, exist_ok=True)
+
+        print(f"\nSolving basis case with a CBD surface porosity of {basis_por}.")
+        solve_closure_multiparticle(basis_dir, img_path, label_map_path, voxel, float(basis_por), dimensionless=dimensionless, D_s=D_s, L=L, **kwargs)
+
+        t, surface_integrals, volume_integrals = load_particle_integrals(basis_dir)
+
+        # only the steady state (final) values are kept
+        basis["surface integrals"][basis_por] = {key: {type: values[-1] for type, values in integrals.items()} for key, integrals in surface_integrals.items()}
+        basis["volume integrals"][basis_por] = {key: values[-1] for key, values in volume_integrals.items()}
+
+        with open(basis_dir + "closure_data.pickle", 'rb') as f:
+            closure_data = pickle.load(f)
+
+    # the geometry and offset are identical for both basis cases
+    if dimensionless and L is None:
+        L = closure_data["L"]
+    basis["L"] = L
+    basis["T offset"] = closure_data["T offset"]
+    basis["dimensionless"] = dimensionless
+    basis["am-elec area"] = closure_data["am-elec area"]
+    basis["am-cbd area (surface porosity omitted)"] = closure_data["am-cbd area (surface porosity omitted)"]
+    basis["total particle volume"] = closure_data["total particle volume"]
+
+    basis_path = case_dir + "porosity_basis.pickle"
+    with open(basis_path, 'wb') as f:
+        pickle.dump(basis, f)
+    print(f"\nThe porosity basis was written to {basis_path}")
+
+    closure_values = evaluate_porosity_sweep(basis, cbd_surf_pors, sep_surf_pors)
+
+    for cbd_surf_por, closure_value in zip(cbd_surf_pors, closure_values):
+        print(f"CBD surface porosity {cbd_surf_por}: global steady state surface average {closure_value}")
+
+    return closure_values
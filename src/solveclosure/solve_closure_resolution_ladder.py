@@ -0,0 +1,110 @@
+import os
+import pickle
+import numpy as np
+import tifffile as tif
+
+from solveclosure.utility import add_slash
+from solveclosure.image_analysis import coarsen_image_and_label_map
+from solveclosure.solve_closure_multiparticle import solve_closure_multiparticle
+
+
+def solve_closure_resolution_ladder(case_dir, img_path, label_map_path, voxel, cbd_surf_por, tolerance=0.01, factors=(4, 2), order=1, dimensionless=True, L=None, **kwargs):
+    """
+    Estimates the closure value from coarsened copies of the image, and only solves at full resolution if needed.
+    The image and label map are coarsened by each factor (see coarsen_image_and_label_map) and solved with the voxel size scaled by the factor.
+    The closure values of the two finest levels are Richardson-extrapolated to zero voxel size, and the difference between the
+    extrapolated value and the finest coarse value is used as the error estimate. If the relative error estimate exceeds the tolerance,
+    the full resolution case is solved as well.
+
+    Args:
+        case_dir (str): The path to an empty directory where a case is built for each level (coarse_f and full_resolution).
+        img_path (str): The path to the image of the electrode micrstructure in tif format. Electrolyte labelled 0, AM as 1, and CBD as 2.
+        label_map_path (str): The path to the label map which identifies particle IDs. Same dimensions as the image.
+        voxel (float): The voxel side length of the image in meters.
+        cbd_surf_por (float): The surface porosity of the CBD phase.
+        tolerance (float): The relative error estimate above which the full resolution case is solved. Default is 0.01 (1 %).
+        factors (tuple): The coarsening factors, from coarsest to finest. Default is (4, 2).
+        order (float): The order of convergence of the closure value with voxel size. The default of 1 suits the staircase
+        surfaces of voxelised particles. If three or more factors are given, the observed order of the three finest levels is used instead.
+        dimensionless (bool): Set to False to solve a dimensional case. Default is True.
+        L (float): The lengthscale used (m) to non-dimensionalise the problem. If None, but dimensionless=True, the length of axis 0
+        of the full resolution image is used for every level.
+        **kwargs: Any other arguments of solve_closure_multiparticle (e.g. D_s, sep_surf_por, load_of_cmd, allow_flux, time_params).
+
+    Returns:
+        ladder_data (dict): The closure value of each level, the extrapolated value, the relative error estimate, and the
+        recommended closure value (the full resolution value if it was solved). Also written to resolution_ladder.pickle in case_dir.
+    """
+
+    case_dir = add_slash(case_dir)
+
+    if kwargs.get("run_solver") is False:
+        raise ValueError("\nThe coarse cases must be solved for a resolution ladder.")
+
+    factors = sorted(factors, reverse=True)
+    if len(factors) < 2 or factors[-1] < 2:
+        raise ValueError("\nAt least two coarsening factors greater than 1 are needed for Richardson extrapolation.")
+
+    img = tif.imread(img_path)
+    label_map = tif.imread(label_map_path)
+
+    if dimensionless and L is None:
+        print("\nLengthscale not provided for dimensionless case. Setting to length of the image's axis 0 by default.")
+        L = img.shape[0] * voxel
+
+    # Inactive material is ignored and treated as elec
+    img[img == 51] = 0
+
+    def read_closure_value(level_dir):
+        with open(level_dir + "closure_data.pickle", 'rb') as f:
+            return pickle.load(f)["global s surface average steady"]
+
+    values = {}
+    for factor in factors:
+        level_dir = case_dir + f"coarse_{factor}/"
+        os.makedirs(level_dir, exist_ok=True)
+
+        img_coarse, label_map_coarse = coarsen_image_and_label_map(img, label_map, factor)
+        coarse_img_path = level_dir + "img.tif"
+        coarse_label_map_path = level_dir + "label_map.tif"
+        tif.imwrite(coarse_img_path, img_coarse)
+        tif.imwrite(coarse_label_map_path, label_map_coarse)
+
+        print(f"\nSolving the case coarsened by a factor of {factor} ({label_map_coarse.max()} particles, shape {img_coarse.shape}).")
+        solve_closure_multiparticle(level_dir, coarse_img_path, coarse_label_map_path, voxel * factor, cbd_surf_por, dimensionless=dimensionless, L=L, **kwargs)
+        values[factor] = read_closure_value(level_dir)
+
+    # the observed order from the three finest levels, if available and meaningful
+    if len(factors) >= 3:
+        f0, f1, f2 = factors[-3:]
+        r = f1 / f2
+        if np.isclose(f0 / f1, r) and (values[f0] - values[f1]) * (values[f1] - values[f2]) > 0:
+            order = np.log(abs(values[f0] - values[f1]) / abs(values[f1] - values[f2])) / np.log(r)
+            print(f"The observed order of convergence is {order:.2f}.")
+
+    coarse, fine = factors[-2], factors[-1]
+    r = coarse / fine
+    extrapolated = values[fine] + (values[fine] - values[coarse]) / (r**order - 1)
+    error_estimate = abs(extrapolated - values[fine]) / abs(extrapolated) if extrapolated != 0 else np.inf
+
+    print(f"\nThe extrapolated closure value is {extrapolated:.6g}, with a relative error estimate of {error_estimate * 100:.2f} %.")
+
+    ladder_data = {"closure values": values,
+                   "order": order,
+                   "extrapolated closure value": extrapolated,
+                   "relative error estimate": error_estimate,
+                   "full resolution closure value": None,
+                   "closure value": extrapolated}
+
+    if error_estimate > tolerance:
+        print("The error estimate exceeds the tolerance, so the full resolution case is solved.")
+        level_dir = case_dir + "full_resolution/"
+        os.makedirs(level_dir, exist_ok=True)
+        solve_closure_multiparticle(level_dir, img_path, label_map_path, voxel, cbd_surf_por, dimensionless=dimensionless, L=L, **kwargs)
+        ladder_data["full resolution closure value"] = read_closure_value(level_dir)
+        ladder_data["closure value"] = ladder_data["full resolution closure value"]
+
+    with open(case_dir + "resolution_ladder.pickle", 'wb') as f:
+        pickle.dump(ladder_data, f)
+
+    return ladder_data
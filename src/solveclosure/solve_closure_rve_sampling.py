@@ -0,0 +1,191 @@
+import os
+import pickle
+import numpy as np
+import tifffile as tif
+from concurrent.futures import ProcessPoolExecutor
+
+from solveclosure.utility import add_slash, find_latest_openfoam_installation
+from solveclosure.image_analysis import crop_and_relabel_subvolume, return_x_positions
+
+
+def solve_subvolume(subvolume_dir, img_crop, label_map_crop, voxel, cbd_surf_por, L, kwargs):
+    # solves the closure problem for one subvolume in its own directory, and returns the steady state closure value
+    from solveclosure.solve_closure_multiparticle import solve_closure_multiparticle
+
+    os.makedirs(subvolume_dir, exist_ok=True)
+    img_path = subvolume_dir + "img.tif"
+    label_map_path = subvolume_dir + "label_map.tif"
+    tif.imwrite(img_path, img_crop)
+    tif.imwrite(label_map_path, label_map_crop)
+
+    solve_closure_multiparticle(subvolume_dir, img_path, label_map_path, voxel, cbd_surf_por, L=L, **kwargs)
+
+    with open(subvolume_dir + "closure_data.pickle", 'rb') as f:
+        closure_data = pickle.load(f)
+
+    return closure_data["global s surface average steady"]
+
+
+def solve_closure_rve_sampling(case_dir, img_path, label_map_path, voxel, cbd_surf_por, subvolume_shape, tolerance, stratified=False, n_strata=4, n_min=4, n_max=64, n_workers=4, confidence=0.95, n_bootstrap=2000, seed=None, dimensionless=True, L=None, **kwargs):
+    """
+    Estimates the closure value of a large electrode from randomly placed subvolumes instead of a full-domain solve.
+    Subvolumes are cropped from the image and label map (particles cut by the crop are relabelled), solved independently
+    in a pool of worker processes, and the mean global s surface average at steady state is reported with a bootstrap
+    confidence interval. Subvolumes are drawn in batches of n_workers until the half-width of the interval is below the tolerance.
+
+    Args:
+        case_dir (str): The path to an empty directory where a case is built for each subvolume (subvolume_i).
+        img_path (str): The path to the image of the electrode micrstructure in tif format. Electrolyte labelled 0, AM as 1, and CBD as 2.
+        label_map_path (str): The path to the label map which identifies particle IDs. Same dimensions as the image.
+        voxel (float): The voxel side length of the image in meters.
+        cbd_surf_por (float): The surface porosity of the CBD phase.
+        subvolume_shape (tuple): The shape of each subvolume in voxels.
+        tolerance (float): Sampling stops once the half-width of the confidence interval is below this value.
+        stratified (bool): Set to True to draw subvolumes evenly from n_strata layers along axis 0 (the electrode depth),
+        and resample within each layer for the bootstrap. Recommended when the microstructure varies through the electrode.
+        A layer with fewer than two usable subvolumes after n_min have been drawn from it (e.g. it contains no AM, or its solves
+        fail) is dropped from the interval and reported, so that it does not hold up the sampling.
+        n_strata (int): The number of layers along axis 0 used for stratified sampling.
+        n_min (int): The minimum number of subvolumes solved before the interval is checked.
+        n_max (int): The maximum number of subvolumes solved.
+        n_workers (int): The number of subvolumes solved at once.
+        confidence (float): The confidence level of the interval.
+        n_bootstrap (int): The number of bootstrap resamples.
+        seed (int, optional): The seed of the random number generator, for reproducible sampling.
+        dimensionless (bool): Set to False to solve a dimensional case. Default is True.
+        L (float): The lengthscale used (m) to non-dimensionalise the problem. If None, but dimensionless=True, the length of axis 0
+        of the entire image is used, so that every subvolume has the same scaling.
+        **kwargs: Any other arguments of solve_closure_multiparticle (e.g. D_s, sep_surf_por, load_of_cmd, allow_flux, time_params).
+
+    Returns:
+        sampling_data (dict): The mean closure value, its confidence interval, and the position and closure value of each subvolume.
+        Also written to rve_sampling.pickle in case_dir.
+    """
+
+    case_dir = add_slash(case_dir)
+
+    if kwargs.get("run_solver") is False:
+        raise ValueError("\nThe subvolumes must be solved for RVE sampling.")
+
+    img = tif.imread(img_path)
+    label_map = tif.imread(label_map_path)
+
+    if any(n > N for n, N in zip(subvolume_shape, img.shape)):
+        raise ValueError(f"\nThe subvolume shape {tuple(subvolume_shape)} is larger than the image shape {img.shape}.")
+
+    if dimensionless and L is None:
+        print("\nLengthscale not provided for dimensionless case. Setting to length of the entire image's axis 0 by default.")
+        L = img.shape[0] * voxel
+
+    # resolve OpenFOAM once rather than in every worker
+    if kwargs.get("load_of_cmd") is None:
+        kwargs["load_of_cmd"] = find_latest_openfoam_installation()
+    kwargs["dimensionless"] = dimensionless
+
+    rng = np.random.default_rng(seed)
+    max_starts = [N - n for n, N in zip(subvolume_shape, img.shape)]
+    strata_edges = np.linspace(0, max_starts[0] + 1, n_strata + 1).astype(int)
+
+    def draw_start(i):
+        start = [int(rng.integers(0, m + 1)) for m in max_starts]
+        if stratified:
+            stratum = i % n_strata
+            start[0] = int(rng.integers(strata_edges[stratum], max(strata_edges[stratum + 1], strata_edges[stratum] + 1)))
+        return start
+
+    def bootstrap_interval(samples):
+        values = np.array([sample["value"] for sample in samples])
+        if stratified:
+            # resample within each stratum, weighting the strata equally
+            strata = np.array([sample["stratum"] for sample in samples])
+            groups = [values[strata == k] for k in np.unique(strata)]
+            means = np.mean([[rng.choice(group, len(group)).mean() for group in groups] for _ in range(n_bootstrap)], axis=1)
+            mean = np.mean([group.mean() for group in groups])
+        else:
+            means = rng.choice(values, (n_bootstrap, len(values))).mean(axis=1)
+            mean = values.mean()
+        alpha = (1 - confidence) / 2
+        return mean, (float(np.quantile(means, alpha)), float(np.quantile(means, 1 - alpha)))
+
+    samples = []
+    n_drawn = 0
+    stratum_draws = np.zeros(n_strata, dtype=int)
+    dropped_strata = []
+    mean, interval = None, (None, None)
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        while n_drawn < n_max:
+            n_batch = min(n_workers, n_max - n_drawn)
+            futures = []
+            for i in range(n_drawn, n_drawn + n_batch):
+                start = draw_start(i)
+                stratum = int(np.searchsorted(strata_edges, start[0], side="right") - 1)
+                stratum_draws[stratum] += 1
+                img_crop, label_map_crop = crop_and_relabel_subvolume(img, label_map, start, subvolume_shape)
+                if not np.any(img_crop == 1):
+                    print(f"Subvolume {i} contains no AM and is skipped.")
+                    continue
+
+                subvolume_dir = case_dir + f"subvolume_{i}/"
+                # the depth of the subvolume centre in meters
+                depth = return_x_positions([[s + n / 2 for s, n in zip(start, subvolume_shape)]], voxel)[0]
+                sample = {"subvolume": i, "start": start, "depth": depth, "stratum": stratum}
+                futures.append((sample, executor.submit(solve_subvolume, subvolume_dir, img_crop, label_map_crop, voxel, cbd_surf_por, L, kwargs)))
+            n_drawn += n_batch
+
+            for sample, future in futures:
+                try:
+                    sample["value"] = future.result()
+                except Exception as error:
+                    print(f"Subvolume {sample['subvolume']} failed and is excluded: {error}")
+                    continue
+                if sample["value"] is None or not np.isfinite(sample["value"]):
+                    print(f"Subvolume {sample['subvolume']} has no closure value and is excluded.")
+                    continue
+                samples.append(sample)
+
+            used_samples = samples
+            if stratified:
+                # a stratum without two usable samples after n_min draws (no AM, or failed solves) would otherwise hold up the check
+                stratum_counts = np.bincount([sample["stratum"] for sample in samples], minlength=n_strata)
+                for k in range(n_strata):
+                    if k not in dropped_strata and stratum_counts[k] < 2 and stratum_draws[k] >= n_min:
+                        print(f"Stratum {k} gave {stratum_counts[k]} usable subvolumes of the {stratum_draws[k]} drawn from it, and is dropped from the interval.")
+                        dropped_strata.append(k)
+
+                kept_strata = [k for k in range(n_strata) if k not in dropped_strata]
+                if not kept_strata:
+                    print("\nEvery stratum was dropped, so the closure value cannot be estimated. Check the subvolume shape and the failed subvolumes.")
+                    break
+                used_samples = [sample for sample in samples if sample["stratum"] in kept_strata]
+
+            if len(used_samples) < max(n_min, 2):
+                continue
+
+            # the spread within a stratum is only known once it has two samples
+            if stratified and stratum_counts[kept_strata].min() < 2:
+                continue
+
+            mean, interval = bootstrap_interval(used_samples)
+            half_width = (interval[1] - interval[0]) / 2
+            print(f"\n{len(used_samples)} subvolumes solved: closure value {mean:.6g}, {confidence * 100:.0f} % interval {interval[0]:.6g} to {interval[1]:.6g}.")
+
+            if half_width < tolerance:
+                print("The confidence interval is within the tolerance.")
+                break
+        else:
+            print(f"\nThe maximum number of subvolumes ({n_max}) was reached before the confidence interval was within the tolerance.")
+
+    sampling_data = {"closure value": mean,
+                     "confidence interval": interval,
+                     "confidence": confidence,
+                     "converged": mean is not None and (interval[1] - interval[0]) / 2 < tolerance,
+                     "subvolume shape": tuple(subvolume_shape),
+                     "stratified": stratified,
+                     "dropped strata": dropped_strata,
+                     "samples": samples}
+
+    with open(case_dir + "rve_sampling.pickle", 'wb') as f:
+        pickle.dump(sampling_data, f)
+
+    return sampling_data
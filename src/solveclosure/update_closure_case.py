@@ -0,0 +1,263 @@
+import subprocess
+import os
+import tifffile as tif
+import pickle
+import time
+import numpy as np
+from scipy import ndimage
+
+from solveclosure.utility import add_slash, find_latest_openfoam_installation, Trace
+from solveclosure.image_analysis import calculate_source_terms_dimensional, calculate_source_terms_dimensionless, check_and_write_area_and_volume_total, return_x_positions, subdivide_image_using_label_map, partition_particles_across_processors
+from solveclosure.openfoam_case_setup.make_topoSetDict import make_topoSetDict
+from solveclosure.openfoam_case_setup.write_decomposed_case import write_decomposed_case
+from solveclosure.openfoam_case_setup.run_closure_solver import run_closure_solver
+from solveclosure.openfoam_case_setup.multiparticle import write_bc_file_multiparticle, write_fvOptions_file_multiparticle, write_myFunctionsDict_multiparticle, write_p_file, write_regionProperties_file, write_surface_integral_func, write_volume_integral_func, write_thermophysicalProperties_file, write_cellDecomposition_file, write_fvSolution_file
+
+
+def update_closure_case(case_dir, img_path, label_map_path, load_of_cmd=None, run_solver=True, reconstruct=False):
+    """
+    Updates a case built by solve_closure_multiparticle after the image or label map has been edited locally (e.g. to fix a
+    segmentation defect). The new image and label map are compared with those the case was built from, and the subsections,
+    source terms, neighbour lists and OpenFOAM files are only recomputed for particles whose bounding boxes (padded by one voxel
+    to include their boundaries) contain a changed voxel. The mesh is rebuilt, and all other per-particle files and closure data are kept.
+
+    Args:
+        case_dir (str): The path to a case built by solve_closure_multiparticle.
+        img_path (str): The path to the edited image. Must have the same dimensions as the original image.
+        label_map_path (str): The path to the edited label map. Particles keep their IDs where they are unchanged.
+        load_of_cmd (str): The command which must be executed in your terminal to load OpenFOAM. If not provided OpenFOAM installations will be searched for.
+        run_solver (bool): Set to false to update the OpenFOAM case without running the solver.
+        reconstruct (bool): Set to True to run reconstructPar -allRegions after a parallel solve (see solve_closure_multiparticle).
+        The solver is run, watched and retried, and the case decomposed, with the settings the case was built with.
+
+    Returns:
+        affected_ids (list): The IDs of the particles which were recomputed.
+    """
+
+    case_dir = add_slash(case_dir)
+    of_case_dir = case_dir + "openfoam_case/"
+    closure_data_path = case_dir + "closure_data.pickle"
+
+    with open(closure_data_path, 'rb') as f:
+        closure_data = pickle.load(f)
+
+    if "case settings" not in closure_data:
+        raise ValueError("\nThis case was built without the settings needed for an update. Rebuild it with solve_closure_multiparticle.")
+
+    if closure_data.get("method") == "native":
+        raise ValueError("\nThis case was solved with solve_closure_native, which is fast enough to re-run in full.")
+
+    settings = closure_data["case settings"]
+    if settings["agglomerate regions"]:
+        raise ValueError("\nCases with agglomerated regions cannot be updated, since the region colouring depends on every particle. Rebuild it with solve_closure_multiparticle.")
+
+    if load_of_cmd is None:
+        load_of_cmd = find_latest_openfoam_installation()
+
+    start_time = time.time()
+
+    dimensionless = closure_data["dimensionless"]
+    voxel = closure_data["voxel"]
+    L = closure_data["L"]
+    D_s = closure_data["D_s"]
+    T_offset = closure_data["T offset"]
+    cbd_surf_por = settings["cbd surface porosity"]
+    solver_profile = (closure_data.get("solver profile") or {}).get("profile")
+
+    print("Comparing the edited image with the original.")
+    old_img = tif.imread(settings["img path"])
+    old_label_map = tif.imread(settings["label map path"])
+    img = tif.imread(img_path)
+    label_map = tif.imread(label_map_path)
+
+    if img.shape != old_img.shape or label_map.shape != old_label_map.shape:
+        raise ValueError("\nThe edited image and label map must have the same dimensions as the originals.")
+
+    # Inactive material is ignored and treated as elec
+    old_img[old_img == 51] = 0
+    img[img == 51] = 0
+
+    changed = (img != old_img) | (label_map != old_label_map)
+    if not changed.any():
+        print("The image and label map are unchanged, nothing to update.")
+        return []
+
+    def padded_slices(particle_slices):
+        return [None if obj is None else tuple(slice(max(0, s.start - 1), min(n, s.stop + 1)) for s, n in zip(obj, img.shape)) for obj in particle_slices]
+
+    old_slices = padded_slices(ndimage.find_objects(old_label_map))
+    new_slices = padded_slices(ndimage.find_objects(label_map))
+
+    old_ids = {i + 1 for i, obj in enumerate(old_slices) if obj is not None}
+    new_ids = {i + 1 for i, obj in enumerate(new_slices) if obj is not None}
+    removed_ids = sorted(old_ids - new_ids)
+
+    # a particle is affected if a changed voxel lies in its old or new bounding box
+    affected_ids = []
+    for key in sorted(new_ids):
+        boxes = [new_slices[key - 1]]
+        if key in old_ids:
+            boxes.append(old_slices[key - 1])
+        if any(changed[box].any() for box in boxes):
+            affected_ids.append(key)
+
+    print(f"{len(affected_ids)} of {len(new_ids)} particles are affected, and {len(removed_ids)} were removed.")
+
+    subsections, _, neighbour_ids = subdivide_image_using_label_map(label_map_path, img, show_subsections=False, particle_ids=affected_ids)
+
+    # the centres are found by ID, since removed particles leave gaps in the IDs
+    centres = ndimage.center_of_mass(label_map > 0, labels=label_map, index=affected_ids) if affected_ids else []
+    x_positions_m = dict(zip(affected_ids, return_x_positions(centres, voxel)))
+
+    # remove the previous solution, and the files of removed and affected particles which are rewritten below
+    cmd = f"{load_of_cmd} && foamListTimes -rm -case {of_case_dir}"
+    subprocess.run(["bash", "-c", cmd], check=True)
+    cmd = f"cd {of_case_dir} && rm -rf postProcessing/ process* constant/polyMesh/ log*"
+    subprocess.run(["bash", "-c", cmd], check=False)
+    for key in removed_ids:
+        cmd = f"cd {of_case_dir} && rm -rf 0/particle_{key} constant/particle_{key} system/particle_{key} system/particle_{key}_*"
+        subprocess.run(["bash", "-c", cmd], check=False)
+    for key in affected_ids:
+        cmd = f"cd {of_case_dir} && rm -rf system/particle_{key}_*"
+        subprocess.run(["bash", "-c", cmd], check=False)
+
+    print("Rebuilding the mesh: blockMesh, topoSet, splitMeshRegions.")
+    topoSetDict_path = of_case_dir + "system/topoSetDict"
+    make_topoSetDict(topoSetDict_path, img, multi_particle=True, label_map=label_map)
+
+    cmd = f"{load_of_cmd} && blockMesh -case {of_case_dir} > {of_case_dir}log.blockMesh 2>&1"
+    subprocess.run(["bash", "-c", cmd], check=True)
+
+    cmd = f"{load_of_cmd} && topoSet -case {of_case_dir} > {of_case_dir}log.topoSet 2>&1"
+    subprocess.run(["bash", "-c", cmd], check=True)
+
+    cmd = f"{load_of_cmd} && splitMeshRegions -case {of_case_dir} -cellZonesOnly -overwrite > {of_case_dir}log.splitMeshRegions 2>&1"
+    subprocess.run(["bash", "-c", cmd], check=True)
+
+    cmd = f"cd {of_case_dir} && rm -rf 0/Elec constant/Elec system/Elec 0/CBD constant/CBD system/CBD"
+    subprocess.run(["bash", "-c", cmd], check=False)
+
+    for key in removed_ids:
+        del closure_data["particle data"][key]
+        closure_data["region map"].pop(key, None)
+
+    print("Recalculating source terms and BCs for the affected particles.")
+    for key in affected_ids:
+        subsection = subsections[key]
+        particle_name = "particle_" + str(key)
+
+        if dimensionless:
+            S_vol, bc_source_elec, bc_source_cbd, total_particle_area, V_am = calculate_source_terms_dimensionless(subsection, voxel, cbd_surf_por, L)
+        else:
+            S_vol, bc_source_elec, bc_source_cbd, total_particle_area, V_am = calculate_source_terms_dimensional(subsection, voxel, cbd_surf_por, D_s)
+
+        closure_data["particle data"][key] = {"particle surface area": total_particle_area, "particle volume": V_am, "centre x position": x_positions_m[key],
+                                             "neighbour ids": neighbour_ids[key]}
+        closure_data["region map"][key] = particle_name
+
+        for type in ["elec", "cbd", "sep"]:
+            if type in neighbour_ids[key]:
+                surface_int_path = of_case_dir + f"/system/{particle_name}_surfaceIntegral_{type}"
+                write_surface_integral_func(surface_int_path, particle_name, type=type)
+
+        vol_int_path = of_case_dir + f"/system/{particle_name}_volumeIntegral"
+        write_volume_integral_func(vol_int_path, particle_name)
+
+        bc_path = of_case_dir + f"0/{particle_name}/T"
+        write_bc_file_multiparticle(bc_path, particle_name, bc_source_elec, bc_source_cbd, neighbour_ids[key], T_offset, allow_flux=settings["allow flux"])
+
+        p_path = of_case_dir + f"/0/{particle_name}/p"
+        write_p_file(p_path, particle_name)
+
+        fvOptions_path = of_case_dir + f"/constant/{particle_name}/fvOptions"
+        write_fvOptions_file_multiparticle(fvOptions_path, particle_name, S_vol)
+
+        thermoprops_path = of_case_dir + f"/constant/{particle_name}/thermophysicalProperties"
+        write_thermophysicalProperties_file(thermoprops_path, particle_name, D_s)
+
+        # keep any solver settings already edited by the user, and give new particles the solver profile of the case
+        system_path = of_case_dir + f"/system/{particle_name}/"
+        solver_settings_dir = case_dir + ("solver_settings_steady/" if closure_data.get("steady") else "solver_settings/")
+        for file_name in ["fvSchemes", "fvSolution"]:
+            if os.path.exists(system_path + file_name):
+                continue
+            if file_name == "fvSolution" and solver_profile is not None:
+                write_fvSolution_file(system_path + file_name, profile=solver_profile, steady=closure_data.get("steady"))
+            else:
+                cmd = f"cp {solver_settings_dir}{file_name} {system_path}"
+                subprocess.run(["bash", "-c", cmd], check=True)
+
+    # the region list and functions cover every particle
+    all_neighbour_ids = {key: data["neighbour ids"] for key, data in closure_data["particle data"].items()}
+    region_names = [f"particle_{key}" for key in sorted(all_neighbour_ids)]
+
+    regionprops_path = of_case_dir + "/constant/regionProperties"
+    write_regionProperties_file(regionprops_path, region_names)
+
+    myFunctionsDict_path = of_case_dir + "/system/myFunctionsDict"
+    write_myFunctionsDict_multiparticle(myFunctionsDict_path, all_neighbour_ids)
+
+    if settings["parallelise"]:
+        print("Decomposing for parallel run.")
+        decomposeParDict_path = of_case_dir + "/system/decomposeParDict"
+        n_procs = settings["n procs"]
+        decomposer = (closure_data["decomposition"] or {}).get("decomposer", "decomposePar")
+
+        if settings["decomposition"] == "particles":
+            # the partition is global, so it is recomputed from the AM of every particle within its bounding box, as its subsection would give
+            particle_masks = {key: subsections[key] if key in subsections else ((img[new_slices[key - 1]] == 1) & (label_map[new_slices[key - 1]] == key)).astype(int)
+                              for key in all_neighbour_ids}
+            particle_procs, imbalance, n_cut_interfaces = partition_particles_across_processors(particle_masks, all_neighbour_ids, n_procs)
+            print(f"Particle-aware decomposition: expected load imbalance of {round(imbalance * 100, 1)} % with {n_cut_interfaces} particle interfaces cut between processors.")
+            closure_data["decomposition"] = {"method": "particles", "particle processors": particle_procs,
+                                             "load imbalance": imbalance, "cut interfaces": n_cut_interfaces, "decomposer": decomposer}
+
+            region_cell_procs = {}
+            for key, mask in particle_masks.items():
+                region_cell_procs[f"particle_{key}"] = [particle_procs[key]] * int(np.sum(mask == 1))
+                if decomposer == "decomposePar":
+                    cellDecomposition_path = of_case_dir + f"/constant/particle_{key}/cellDecomposition"
+                    write_cellDecomposition_file(cellDecomposition_path, f"particle_{key}", region_cell_procs[f"particle_{key}"])
+
+        for region_name in region_names:
+            cmd = f"cp {decomposeParDict_path} {of_case_dir}/system/{region_name}/"
+            subprocess.run(["bash", "-c", cmd], check=True)
+
+        if decomposer == "python":
+            write_decomposed_case(of_case_dir, region_cell_procs, n_procs)
+        else:
+            cmd = f"{load_of_cmd} && decomposePar -case {of_case_dir} -allRegions > {of_case_dir}log.decomposePar 2>&1"
+            subprocess.run(["bash", "-c", cmd], check=True)
+
+    # the previous results are no longer valid
+    for key in ["times for transient data", "global s surface average steady", "global s surface average transient", "global s volume average final"]:
+        closure_data[key] = None
+
+    closure_data = check_and_write_area_and_volume_total(closure_data, img, voxel, cbd_surf_por)
+
+    settings["img path"] = os.path.abspath(img_path)
+    settings["label map path"] = os.path.abspath(label_map_path)
+
+    with open(closure_data_path, 'wb') as f:
+        pickle.dump(closure_data, f)
+
+    if run_solver:
+        print("Running solver.")
+        trace = Trace()
+        reason = run_closure_solver(of_case_dir, closure_data, closure_data_path, load_of_cmd, trace, parallelise=settings["parallelise"],
+                                    n_procs=settings["n procs"], watchdog=settings.get("watchdog", False), n_retries=settings.get("n retries", 0))
+
+        if reason is None:
+            if settings["parallelise"] and reconstruct:
+                print("Reconstructing results.")
+                cmd = f"{load_of_cmd} && reconstructPar -case {of_case_dir} -allRegions > {of_case_dir}log.reconstructPar 2>&1"
+                subprocess.run(["bash", "-c", cmd], check=False)
+
+            from solveclosure.process_closure_results import process_closure_results
+            print("Processing closure results.")
+            process_closure_results(case_dir, cbd_surf_por, settings["sep surface porosity"], dimensionless, L=L, write=True, multiparticle=True)
+
+    end_time = time.time()
+    print("\nThe total update time was ", round(end_time - start_time, 1), " seconds.")
+
+    return affected_ids
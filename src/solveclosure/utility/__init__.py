@@ -2,3 +2,14 @@ from .add_slash import add_slash
 from .check_for_existing_solutions import check_for_existing_solutions
 from .load_openfoam_data import load_openfoam_data
 from .find_latest_openfoam_installation import find_latest_openfoam_installation
+from .load_particle_integrals import load_particle_integrals
+from .read_openfoam_field import read_openfoam_field
+from .load_closure_field import load_closure_field
+from .resample_closure_field import resample_closure_field
+from .trace import Trace
+from .parse_solver_log import parse_solver_log, SolverLogParser
+from .solver_watchdog import SolverWatchdog
+from .core_scheduler import CoreScheduler
+from .read_openfoam_mesh import read_openfoam_mesh
+from .read_processor_field import read_processor_field
+from .find_time_to_steady_state import find_time_to_steady_state
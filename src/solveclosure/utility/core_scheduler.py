@@ -0,0 +1,46 @@
+import asyncio
+import contextlib
+
+
+class CoreScheduler:
+    """
+    Limits the solvers running at once by the number of cores they use, for cases solved concurrently with asyncio. Each solve waits
+    until enough cores are free, e.g.
+
+        scheduler = CoreScheduler(16)
+        async with scheduler.cores(8):
+            ...  # run mpirun -np 8
+
+    Args:
+        core_budget (int): The total number of cores the solvers may use at once.
+    """
+
+    def __init__(self, core_budget):
+        if core_budget < 1:
+            raise ValueError("\ncore_budget must be at least 1.")
+        self.core_budget = core_budget
+        self.in_use = 0
+        # the most cores used at once, to check the schedule
+        self.peak = 0
+        self.condition = None
+
+    @contextlib.asynccontextmanager
+    async def cores(self, n_cores):
+        if n_cores > self.core_budget:
+            raise ValueError(f"\nA solve needs {n_cores} cores, but the core budget is {self.core_budget}.")
+
+        # the condition is created in the running event loop
+        if self.condition is None:
+            self.condition = asyncio.Condition()
+
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_use + n_cores <= self.core_budget)
+            self.in_use += n_cores
+            self.peak = max(self.peak, self.in_use)
+
+        try:
+            yield
+        finally:
+            async with self.condition:
+                self.in_use -= n_cores
+                self.condition.notify_all()
@@ -0,0 +1,20 @@
+import numpy as np
+
+def find_time_to_steady_state(t, s_surf, rel_tol=1e-3):
+    """
+    Finds the earliest time after which the surface average stays within rel_tol of its final value.
+
+    Args:
+        t (array): The times of the transient data.
+        s_surf (array): The (global) surface average at each time.
+        rel_tol (float): The tolerance relative to the final value of the surface average.
+
+    Returns:
+        time_to_steady_state (float): The time from which the surface average is within the tolerance.
+    """
+
+    deviation = np.abs(np.asarray(s_surf) - s_surf[-1])
+    outside = np.nonzero(deviation > rel_tol * abs(s_surf[-1]))[0]
+    if len(outside) == 0:
+        return t[0]
+    return t[outside[-1] + 1]
@@ -0,0 +1,97 @@
+import os
+import pickle
+import numpy as np
+import tifffile as tif
+
+from solveclosure.utility.read_openfoam_field import read_openfoam_field
+from solveclosure.utility.read_processor_field import read_processor_field, list_processor_dirs, list_time_dirs
+
+def load_closure_field(case_dir, time=None, n_workers=None):
+    """
+    Loads the solution of a multiparticle case as an array with the dimensions of the image it was built from. 
+    The T offset is removed, so the values are those of the closure variable s. A parallel case which was not reconstructed 
+    is read straight from its processor directories (see read_processor_field).
+    
+    Args:
+        case_dir (str): The path to a case built by solve_closure_multiparticle or solve_closure_native.
+        time (str, optional): The time directory to load. Default is the latest time.
+        n_workers (int, optional): The number of processor files read at once for a parallel case which was not reconstructed.
+
+    Returns:
+        field (nd array): The value of s in each voxel of the active material, and NaN elsewhere.
+        closure_data (dict): The closure data of the case.
+    """
+
+    with open(os.path.join(case_dir, "closure_data.pickle"), 'rb') as f:
+        closure_data = pickle.load(f)
+
+    if "case settings" not in closure_data:
+        raise ValueError(f"\nThe case in {case_dir} does not record the image it was built from, so its field cannot be loaded.")
+
+    img = tif.imread(closure_data["case settings"]["img path"])
+    label_map = tif.imread(closure_data["case settings"]["label map path"])
+    img[img == 51] = 0
+
+    if closure_data.get("method") == "native":
+        # solve_closure_native writes s in the AM voxels (C order) for each write time
+        return load_native_field(os.path.join(case_dir, "native_case"), img, time), closure_data
+
+    of_case_dir = os.path.join(case_dir, "openfoam_case")
+
+    processor_dirs = list_processor_dirs(of_case_dir)
+
+    if time is None:
+        times = list_time_dirs(of_case_dir) + (list_time_dirs(processor_dirs[0]) if processor_dirs else [])
+        times = [t for t in times if float(t) > 0]
+        if not times:
+            raise ValueError(f"\nNo solution was found in {of_case_dir}.")
+        time = max(times, key=float)
+
+    region_members = {}
+    for key, region_name in (closure_data.get("region map") or {key: f"particle_{key}" for key in closure_data["particle data"]}).items():
+        region_members.setdefault(region_name, []).append(key)
+
+    # the fields are read from the processor directories, in parallel, unless the time was reconstructed
+    reconstructed = all(os.path.exists(os.path.join(of_case_dir, str(time), region_name, "T")) for region_name in region_members)
+    if not reconstructed and processor_dirs:
+        region_values = read_processor_field(of_case_dir, times=[time], region_names=list(region_members), n_workers=n_workers)[str(time)]
+    else:
+        region_values = {region_name: read_openfoam_field(os.path.join(of_case_dir, str(time), region_name, "T")) for region_name in region_members}
+
+    # fill the image in the blockMesh cell order (i fastest), which splitMeshRegions keeps in each region
+    field = np.full(img.shape, np.nan).transpose(2, 1, 0)
+    for region_name, members in region_members.items():
+        values = region_values[region_name]
+        region_mask = ((img == 1) & np.isin(label_map, members)).transpose(2, 1, 0)
+        if np.ndim(values) == 0:
+            values = np.full(int(region_mask.sum()), values)
+        elif len(values) != region_mask.sum():
+            raise ValueError(f"\nThe field of {region_name} does not match the image the case was built from.")
+        field[region_mask] = values
+
+    field = field.transpose(2, 1, 0) - closure_data["T offset"]
+
+    return field, closure_data
+
+
+def load_native_field(native_case_dir, img, time=None):
+    # loads the field of s written by solve_closure_native at a time (default the latest)
+    if time is None:
+        times = []
+        for name in os.listdir(native_case_dir):
+            try:
+                times.append((float(name), name))
+            except ValueError:
+                continue
+        if not times:
+            raise ValueError(f"\nNo solution was found in {native_case_dir}.")
+        time = max(times)[1]
+
+    values = np.load(os.path.join(native_case_dir, str(time), "s.npy"))
+    am_mask = img == 1
+    if len(values) != am_mask.sum():
+        raise ValueError(f"\nThe field in {native_case_dir} does not match the image the case was built from.")
+
+    field = np.full(img.shape, np.nan)
+    field[am_mask] = values
+    return field
@@ -0,0 +1,45 @@
+import numpy as np
+import pickle
+from solveclosure.utility.load_openfoam_data import load_openfoam_data
+
+def load_particle_integrals(case_dir):
+    """
+    Loads the surface and volume integrals of the closure variable for each particle of a solved multiparticle case. 
+    
+    Args:
+        case_dir (str): The path to the directory where the OpenFOAM case was solved.
+
+    Returns:
+        t (nd array): The times at which the integrals were written. 
+        surface_integrals (dict): For each particle, the surface integral for each boundary type ("elec", "cbd", "sep") present.
+        volume_integrals (dict): The volume integral for each particle.
+    """
+
+    with open(case_dir + "closure_data.pickle", 'rb') as closure_data_file:
+        closure_data = pickle.load(closure_data_file)
+
+    region_map = closure_data.get("region map") or {}
+
+    t = None
+    surface_integrals = {}
+    volume_integrals = {}
+
+    for key in closure_data["particle data"].keys():
+        region_name = region_map.get(key, f"particle_{key}")
+        surface_integrals[key] = {}
+
+        for type in ["elec", "cbd", "sep"]:
+            s_surf_int_path = case_dir + f"/openfoam_case/postProcessing/{region_name}/particle_{key}_surfaceIntegral_{type}/0/surfaceFieldValue.dat"
+            try:
+                t_surf, s_surf_int_i = load_openfoam_data(s_surf_int_path)
+            except FileNotFoundError:
+                continue
+            surface_integrals[key][type] = np.array(s_surf_int_i)
+            if t is None:
+                t = np.array(t_surf)
+
+        s_vol_int_path = case_dir + f"/openfoam_case/postProcessing/{region_name}/particle_{key}_volumeIntegral/0/volFieldValue.dat"
+        t_vol, s_vol_int_i = load_openfoam_data(s_vol_int_path)
+        volume_integrals[key] = np.array(s_vol_int_i)
+
+    return t, surface_integrals, volume_integrals
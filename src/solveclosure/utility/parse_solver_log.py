@@ -0,0 +1,212 @@
+import re
+import math
+
+# patterns of the chtMultiRegionFoam (and chtMultiRegionSimpleFoam) output
+TIME_PATTERN = re.compile(r"^Time = (\S+)")
+DELTA_T_PATTERN = re.compile(r"^deltaT = (\S+)")
+EXECUTION_TIME_PATTERN = re.compile(r"^ExecutionTime = (\S+) s\s+ClockTime = (\S+) s")
+REGION_PATTERN = re.compile(r"^Solving for (?:solid|fluid) region (\S+)")
+SOLVE_PATTERN = re.compile(r"^(\w+):\s+Solving for (\w+), Initial residual = ([^,]+), Final residual = ([^,]+), No Iterations (\d+)")
+DIFFUSION_NUMBER_PATTERN = re.compile(r"^Region: (\S+) Diffusion Number mean: (\S+) max: (\S+)")
+MIN_MAX_PATTERN = re.compile(r"^Min/max T:\s*(\S+)\s+(\S+)")
+FATAL_PATTERN = re.compile(r"FOAM FATAL (?:IO )?ERROR|Floating point exception|sigFpe|Segmentation fault|#\d+\s+Foam::error::printStack")
+
+
+class SolverLogParser:
+    """
+    Parses an OpenFOAM solver log line by line, so that a log can be read while the solver is writing it. Records the time, deltaT,
+    ExecutionTime and ClockTime of each time step, the maximum diffusion number and minimum T, and the linear solver iterations and residuals
+    of each region. Utility logs (e.g. log.blockMesh) give only the execution time and any fatal errors.
+
+    Args:
+        max_iterations (int): The maximum number of iterations of the linear solvers (maxIter in fvSolution). A solve which
+        reaches it is counted as a stalled solve.
+    """
+
+    def __init__(self, max_iterations=1000):
+        self.max_iterations = max_iterations
+        self.times = []
+        self.delta_ts = []
+        self.execution_times = []
+        self.clock_times = []
+        self.step_iterations = []
+        self.step_stalled_solves = []
+        self.min_temperatures = []
+        self.max_diffusion_numbers = []
+        self.regions = {}
+        self.fatal_errors = []
+        self.non_finite = []
+        self.finished = False
+        self.current_region = None
+        self.delta_t = None
+        self.diffusion_number = None
+        self.buffer = ""
+
+    def feed(self, text):
+        # parses a chunk of the log, keeping any incomplete last line until the next chunk
+        lines = (self.buffer + text).split("\n")
+        self.buffer = lines.pop()
+        for line in lines:
+            self.parse_line(line)
+
+    def parse_line(self, line):
+        line = line.strip()
+        if not line:
+            return
+
+        match = SOLVE_PATTERN.match(line)
+        if match:
+            solver, field, initial, final, iterations = match.groups()
+            initial, final, iterations = to_float(initial), to_float(final), int(iterations)
+            region_name = self.current_region or "default"
+            region = self.regions.setdefault(region_name, {"solver": solver, "solves": 0, "iterations": 0, "max iterations": 0,
+                                                            "stalled solves": 0, "initial residual": None, "final residual": None})
+            region["solves"] += 1
+            region["iterations"] += iterations
+            region["max iterations"] = max(region["max iterations"], iterations)
+            region["initial residual"], region["final residual"] = initial, final
+            if iterations >= self.max_iterations:
+                region["stalled solves"] += 1
+                if self.step_stalled_solves:
+                    self.step_stalled_solves[-1] += 1
+            if not (math.isfinite(initial) and math.isfinite(final)):
+                self.non_finite.append(f"residual of {field} in {region_name} at time {self.times[-1] if self.times else 0}")
+            if self.step_iterations:
+                self.step_iterations[-1] += iterations
+            return
+
+        match = REGION_PATTERN.match(line)
+        if match:
+            self.current_region = match.group(1)
+            return
+
+        match = MIN_MAX_PATTERN.match(line)
+        if match:
+            min_T, max_T = to_float(match.group(1)), to_float(match.group(2))
+            if not (math.isfinite(min_T) and math.isfinite(max_T)):
+                self.non_finite.append(f"T in {self.current_region} at time {self.times[-1] if self.times else 0}")
+            elif self.min_temperatures:
+                self.min_temperatures[-1] = min_T if self.min_temperatures[-1] is None else min(self.min_temperatures[-1], min_T)
+            return
+
+        match = DIFFUSION_NUMBER_PATTERN.match(line)
+        if match:
+            self.diffusion_number = max(self.diffusion_number or 0, to_float(match.group(3)))
+            return
+
+        match = DELTA_T_PATTERN.match(line)
+        if match:
+            self.delta_t = to_float(match.group(1))
+            return
+
+        match = TIME_PATTERN.match(line)
+        if match:
+            self.times.append(to_float(match.group(1)))
+            self.delta_ts.append(self.delta_t)
+            self.max_diffusion_numbers.append(self.diffusion_number)
+            self.step_iterations.append(0)
+            self.step_stalled_solves.append(0)
+            self.min_temperatures.append(None)
+            self.execution_times.append(None)
+            self.clock_times.append(None)
+            self.current_region = None
+            self.diffusion_number = None
+            return
+
+        match = EXECUTION_TIME_PATTERN.match(line)
+        if match:
+            if self.execution_times:
+                self.execution_times[-1], self.clock_times[-1] = to_float(match.group(1)), to_float(match.group(2))
+            else:
+                # a utility log, which has no time steps
+                self.execution_times.append(to_float(match.group(1)))
+                self.clock_times.append(to_float(match.group(2)))
+            return
+
+        if FATAL_PATTERN.search(line):
+            self.fatal_errors.append(line)
+        elif line == "End":
+            self.finished = True
+
+    def parse_file(self, file_path, chunk_size=2**20):
+        # parses a whole log, in chunks so that large logs are not read into memory
+        with open(file_path, errors="replace") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                self.feed(chunk)
+        if self.buffer:
+            self.parse_line(self.buffer)
+            self.buffer = ""
+        return self
+
+    def summary(self, top_n=10, collapse_factor=1e-3):
+        """
+        Summarises the log.
+
+        Args:
+            top_n (int): The number of regions listed in "regions by iterations".
+            collapse_factor (float): A final deltaT below this fraction of the largest deltaT is flagged as a collapsed time step.
+
+        Returns:
+            summary (dict): The time step history, the linear solver statistics of each region, the regions which needed the most
+            linear solver iterations, and "flags" describing any divergence, stall or unfinished run.
+        """
+
+        execution_times = [t for t in self.execution_times if t is not None]
+        delta_ts = [dt for dt in self.delta_ts if dt is not None]
+        ranked = sorted(self.regions.items(), key=lambda item: -item[1]["iterations"])
+
+        flags = []
+        if self.fatal_errors:
+            flags.append(f"fatal error: {self.fatal_errors[0]}")
+        if self.non_finite:
+            flags.append(f"diverged: non-finite {self.non_finite[0]}")
+        stalled_regions = [name for name, region in ranked if region["stalled solves"] > 0]
+        if stalled_regions:
+            flags.append(f"stalled: the linear solver reached {self.max_iterations} iterations in {len(stalled_regions)} regions (e.g. {stalled_regions[0]})")
+        if delta_ts and delta_ts[-1] < collapse_factor * max(delta_ts):
+            flags.append(f"stalled: deltaT collapsed from {max(delta_ts):g} to {delta_ts[-1]:g}")
+        if self.times and not self.finished:
+            flags.append("unfinished: the log does not end with End")
+
+        return {"n time steps": len(self.times),
+                "final time": self.times[-1] if self.times else None,
+                "execution time": execution_times[-1] if execution_times else None,
+                "clock time": self.clock_times[-1] if execution_times else None,
+                "times": list(self.times),
+                "deltaT": list(self.delta_ts),
+                "execution times": list(self.execution_times),
+                "max diffusion numbers": list(self.max_diffusion_numbers),
+                "iterations per time step": list(self.step_iterations),
+                "min T": list(self.min_temperatures),
+                "total iterations": sum(region["iterations"] for region in self.regions.values()),
+                "regions": {name: dict(region) for name, region in self.regions.items()},
+                "regions by iterations": [(name, region["iterations"]) for name, region in ranked[:top_n]],
+                "finished": self.finished,
+                "flags": flags}
+
+
+def parse_solver_log(log_path, max_iterations=1000, top_n=10):
+    """
+    Parses an OpenFOAM log written by solve_closure_multiparticle (e.g. log.solver or log.splitMeshRegions).
+
+    Args:
+        log_path (str): The path to the log.
+        max_iterations (int): The maximum number of iterations of the linear solvers, used to detect stalled solves.
+        top_n (int): The number of regions listed in "regions by iterations".
+
+    Returns:
+        summary (dict): The summary of the log (see SolverLogParser.summary).
+    """
+
+    return SolverLogParser(max_iterations=max_iterations).parse_file(log_path).summary(top_n=top_n)
+
+
+def to_float(value):
+    # OpenFOAM writes nan and inf in several forms (e.g. -nan, 1.#INF)
+    try:
+        return float(value)
+    except ValueError:
+        return math.nan
@@ -0,0 +1,45 @@
+import re
+import numpy as np
+
+def read_openfoam_field(file_path):
+    """
+    Reads the internalField of an OpenFOAM volScalarField file written in ascii or binary format.
+    
+    Args:
+        file_path (str): The absolute path to the field file (e.g. openfoam_case/<time>/particle_i/T).
+
+    Returns:
+        values (float or nd array): The value of a uniform field, or the value in each cell of a nonuniform field. 
+    """
+
+    with open(file_path, 'rb') as f:
+        content = f.read()
+
+    header = re.search(rb"format\s+(\w+)\s*;", content)
+    binary = header is not None and header.group(1) == b"binary"
+
+    start = content.find(b"internalField")
+    if start == -1:
+        raise ValueError(f"No internalField was found in {file_path}")
+
+    uniform = re.compile(rb"internalField\s+uniform\s+([^;\s]+)\s*;").match(content, start)
+    if uniform:
+        return float(uniform.group(1))
+
+    nonuniform = re.compile(rb"internalField\s+nonuniform\s+List<scalar>\s*(\d+)\s*\(").match(content, start)
+    if nonuniform is None:
+        raise ValueError(f"The internalField in {file_path} is not a uniform or nonuniform scalar field.")
+
+    n_cells = int(nonuniform.group(1))
+    data_start = nonuniform.end()
+
+    if binary:
+        values = np.frombuffer(content, dtype="<f8", count=n_cells, offset=data_start)
+    else:
+        data_end = content.find(b")", data_start)
+        values = np.array(content[data_start:data_end].split(), dtype=float)
+
+    if len(values) != n_cells:
+        raise ValueError(f"Expected {n_cells} values in {file_path} but found {len(values)}.")
+
+    return values.copy()
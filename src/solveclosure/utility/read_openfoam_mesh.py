@@ -0,0 +1,176 @@
+import os
+import re
+import numpy as np
+
+# the start of a list, e.g. "3(" or "3{", after any whitespace and comments
+LIST_START = re.compile(rb"(?:\s|//[^\n]*)*(\d+)\s*([({])")
+
+
+def read_openfoam_mesh(mesh_dir):
+    """
+    Reads an OpenFOAM polyMesh (e.g. the mesh of a region written by splitMeshRegions) written in ascii or binary format,
+    with its patches and zones.
+
+    Args:
+        mesh_dir (str): The path to the polyMesh directory (e.g. openfoam_case/constant/particle_i/polyMesh).
+
+    Returns:
+        mesh (dict): The mesh, with entries "points" (n_points x 3 array), "face offsets" and "face labels" (the points of face i are
+        face labels[face offsets[i]:face offsets[i + 1]]), "owner", "neighbour", "n cells", "patches" (a list of dictionaries with the
+        "name", "n faces", "start face" and the "entries" of each patch as text), "zones" (the cellZones, faceZones and pointZones,
+        each a list of dictionaries with the "name", "type", and the label lists of the zone) and "format" (the format and label size).
+    """
+
+    mesh_dir = os.path.join(mesh_dir, "")
+    mesh = {}
+
+    content, header = read_foam_file(mesh_dir + "points")
+    mesh["format"] = {"binary": header["format"] == "binary", "label bytes": header["label bytes"]}
+    mesh["points"], _ = read_list(content, header["end"], header, "scalar", n_components=3)
+
+    content, header = read_foam_file(mesh_dir + "faces")
+    if header["class"] == "faceCompactList":
+        mesh["face offsets"], pos = read_list(content, header["end"], header, "label")
+        mesh["face labels"], _ = read_list(content, pos, header, "label")
+    else:
+        mesh["face offsets"], mesh["face labels"] = read_ascii_face_list(content, header["end"])
+
+    for name in ["owner", "neighbour"]:
+        content, header = read_foam_file(mesh_dir + name)
+        mesh[name], _ = read_list(content, header["end"], header, "label")
+
+    mesh["n cells"] = int(max(np.max(mesh["owner"], initial=-1), np.max(mesh["neighbour"], initial=-1)) + 1)
+
+    content, header = read_foam_file(mesh_dir + "boundary")
+    mesh["patches"] = []
+    text = content[header["end"]:].decode(errors="replace")
+    for name, body in re.findall(r"(\S+)\s*\{(.*?)\}", text[text.find("(") + 1:], re.DOTALL):
+        n_faces = int(re.search(r"nFaces\s+(\d+)\s*;", body).group(1))
+        start_face = int(re.search(r"startFace\s+(\d+)\s*;", body).group(1))
+        entries = re.sub(r"\s*(nFaces|startFace)\s+\d+\s*;", "", body).strip()
+        mesh["patches"].append({"name": name, "n faces": n_faces, "start face": start_face, "entries": entries})
+
+    mesh["zones"] = {}
+    for zone_type in ["cellZones", "faceZones", "pointZones"]:
+        if os.path.exists(mesh_dir + zone_type):
+            mesh["zones"][zone_type] = read_zones(mesh_dir + zone_type)
+
+    return mesh
+
+
+def read_foam_file(file_path):
+    # returns the content of a file and its header entries, with "end" the position just after the FoamFile dictionary
+    with open(file_path, 'rb') as f:
+        content = f.read()
+
+    match = re.search(rb"FoamFile\s*\{(.*?)\}", content, re.DOTALL)
+    if match is None:
+        raise ValueError(f"\nNo FoamFile header was found in {file_path}.")
+    entries = dict(re.findall(rb"(\w+)\s+\"?([^;\"]*)\"?\s*;", match.group(1)))
+
+    arch = entries.get(b"arch", b"").decode()
+    label_size = re.search(r"label=(\d+)", arch)
+    header = {"format": entries.get(b"format", b"ascii").decode(), "class": entries.get(b"class", b"").decode(),
+              "label bytes": int(label_size.group(1)) // 8 if label_size else 4, "end": match.end()}
+
+    return content, header
+
+
+def read_list(content, pos, header, value_type, n_components=1):
+    # reads the list starting at pos (e.g. "3(0 1 2)", "3{0}" or binary data), returning it and the position after it
+    match = LIST_START.match(content, pos)
+    if match is None:
+        raise ValueError("\nNo list was found where one was expected in an OpenFOAM file.")
+    n, bracket = int(match.group(1)), match.group(2)
+    dtype = {"label": f"<i{header['label bytes']}", "scalar": "<f8", "bool": "u1"}[value_type]
+
+    if bracket == b"{":
+        end = content.index(b"}", match.end())
+        value = content[match.end():end].decode().strip("() ").split()
+        values = np.tile(np.array(value, dtype=float).astype(dtype), (n, 1))
+        return values if n_components > 1 else values.ravel(), end + 1
+
+    data_start = match.end()
+    if header["format"] == "binary":
+        n_bytes = n * n_components * np.dtype(dtype).itemsize
+        values = np.frombuffer(content, dtype=dtype, count=n * n_components, offset=data_start)
+        end = content.index(b")", data_start + n_bytes) + 1
+    else:
+        end = find_closing_bracket(content, data_start)
+        text = content[data_start:end].replace(b"(", b" ").replace(b")", b" ")
+        values = np.array(text.split(), dtype=float if value_type == "scalar" else np.int64).astype(dtype)
+        end += 1
+
+    if len(values) != n * n_components:
+        raise ValueError(f"\nExpected {n * n_components} values in a list but found {len(values)}.")
+
+    values = values.astype(np.int64 if value_type == "label" else dtype)
+    return (values.reshape(n, n_components) if n_components > 1 else values), end
+
+
+def read_ascii_face_list(content, pos):
+    # reads an ascii faceList, e.g. 2(4(0 1 2 3) 4(1 4 5 2)), as face offsets and face labels
+    match = LIST_START.match(content, pos)
+    n_faces = int(match.group(1))
+    end = find_closing_bracket(content, match.end())
+    tokens = np.array(content[match.end():end].replace(b"(", b" ").replace(b")", b" ").split(), dtype=np.int64)
+
+    # most meshes have faces of one size, so check for that before reading face by face
+    size = tokens[0] if len(tokens) else 0
+    if len(tokens) == n_faces * (size + 1) and np.all(tokens[::size + 1] == size):
+        sizes = np.full(n_faces, size, dtype=np.int64)
+        labels = tokens.reshape(n_faces, size + 1)[:, 1:].ravel()
+    else:
+        sizes, labels, idx = [], [], 0
+        for _ in range(n_faces):
+            sizes.append(tokens[idx])
+            labels.append(tokens[idx + 1:idx + 1 + tokens[idx]])
+            idx += tokens[idx] + 1
+        sizes = np.array(sizes, dtype=np.int64)
+        labels = np.concatenate(labels) if labels else np.zeros(0, dtype=np.int64)
+
+    offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+    return offsets, labels
+
+
+def find_closing_bracket(content, pos):
+    # returns the position of the bracket closing the list opened just before pos
+    depth = 1
+    for match in re.compile(rb"[()]").finditer(content, pos):
+        depth += 1 if match.group() == b"(" else -1
+        if depth == 0:
+            return match.start()
+    raise ValueError("\nA list in an OpenFOAM file is not closed.")
+
+
+def read_zones(file_path):
+    # reads a cellZones, faceZones or pointZones file
+    content, header = read_foam_file(file_path)
+    match = LIST_START.match(content, header["end"])
+    n_zones, pos = int(match.group(1)), match.end()
+
+    zones = []
+    for _ in range(n_zones):
+        match = re.compile(rb"\s*(\S+)\s*\{").match(content, pos)
+        zone = {"name": match.group(1).decode(), "type": None, "lists": {}, "entries": []}
+        pos = match.end()
+        while True:
+            end = re.compile(rb"\s*\}").match(content, pos)
+            if end is not None:
+                pos = end.end()
+                break
+            entry = re.compile(rb"\s*(\w+)\s+List<(\w+)>").match(content, pos)
+            if entry is not None:
+                values, pos = read_list(content, entry.end(), header, entry.group(2).decode())
+                zone["lists"][entry.group(1).decode()] = values
+                pos = re.compile(rb"\s*;").match(content, pos).end()
+                continue
+            entry = re.compile(rb"\s*(\w+)\s+([^;]*);").match(content, pos)
+            if entry.group(1) == b"type":
+                zone["type"] = entry.group(2).decode().strip()
+            else:
+                zone["entries"].append(f"{entry.group(1).decode()} {entry.group(2).decode().strip()};")
+            pos = entry.end()
+        zones.append(zone)
+
+    return zones
@@ -0,0 +1,84 @@
+import os
+import re
+import concurrent.futures
+import numpy as np
+
+from solveclosure.utility.read_openfoam_field import read_openfoam_field
+from solveclosure.utility.read_openfoam_mesh import read_foam_file, read_list
+
+
+def read_processor_field(of_case_dir, times=None, region_names=None, field_name="T", n_workers=None):
+    """
+    Assembles a field of a decomposed case straight from the processor directories (processor*/<time>/<region>/<field>), in place of
+    reconstructPar. Only the requested times and regions are read, and the processors are read in parallel in a thread pool. Each
+    value is put back in its place in the region with the cellProcAddressing of the processor.
+
+    Args:
+        of_case_dir (str): The path to the OpenFOAM case.
+        times (list, optional): The time directories to read, e.g. ["0.0056"]. Default is the latest time of the processor directories.
+        region_names (list, optional): The regions to read. Default is every region of the processor directories.
+        field_name (str): The name of the field.
+        n_workers (int, optional): The number of files read at once. Default is the number of cores of the machine.
+
+    Returns:
+        fields (dict): The field of each region at each time, as fields[time][region_name], in the cell order of the region mesh.
+    """
+
+    processor_dirs = list_processor_dirs(of_case_dir)
+    if not processor_dirs:
+        raise ValueError(f"\nNo processor directories were found in {of_case_dir}.")
+
+    if times is None:
+        times = [max(list_time_dirs(processor_dirs[0]), key=float)]
+    times = [str(time) for time in times]
+
+    if region_names is None:
+        constant_dir = os.path.join(processor_dirs[0], "constant")
+        region_names = sorted(name for name in os.listdir(constant_dir) if os.path.isfile(os.path.join(constant_dir, name, "polyMesh", "cellProcAddressing")))
+
+    def read_addressing(processor_dir, region_name):
+        content, header = read_foam_file(os.path.join(processor_dir, "constant", region_name, "polyMesh", "cellProcAddressing"))
+        return read_list(content, header["end"], header, "label")[0]
+
+    with concurrent.futures.ThreadPoolExecutor(n_workers) as executor:
+        addressing = {(region_name, processor_dir): executor.submit(read_addressing, processor_dir, region_name)
+                      for region_name in region_names for processor_dir in processor_dirs}
+        addressing = {key: task.result() for key, task in addressing.items()}
+        n_cells = {region_name: sum(len(addressing[region_name, processor_dir]) for processor_dir in processor_dirs) for region_name in region_names}
+
+        fields = {time: {region_name: np.full(n_cells[region_name], np.nan) for region_name in region_names} for time in times}
+
+        def read_values(time, region_name, processor_dir):
+            cells = addressing[region_name, processor_dir]
+            if len(cells) == 0:
+                return
+            # each processor fills its own cells, so the threads write to separate parts of the field
+            fields[time][region_name][cells] = read_openfoam_field(os.path.join(processor_dir, time, region_name, field_name))
+
+        tasks = [executor.submit(read_values, time, region_name, processor_dir)
+                 for time in times for region_name in region_names for processor_dir in processor_dirs]
+        for task in tasks:
+            task.result()
+
+    return fields
+
+
+def list_processor_dirs(of_case_dir):
+    # the processor directories of a decomposed case, in processor order
+    if not os.path.isdir(of_case_dir):
+        return []
+    procs = sorted((int(name[len("processor"):]), name) for name in os.listdir(of_case_dir) if re.fullmatch(r"processor\d+", name))
+    return [os.path.join(of_case_dir, name) for _, name in procs]
+
+
+def list_time_dirs(directory):
+    # the names of the time directories in a case or processor directory
+    times = []
+    for name in os.listdir(directory):
+        try:
+            float(name)
+        except ValueError:
+            continue
+        if os.path.isdir(os.path.join(directory, name)):
+            times.append(name)
+    return times
@@ -0,0 +1,32 @@
+import numpy as np
+from scipy import ndimage
+
+def resample_closure_field(field, shape):
+    """
+    Resamples a closure field onto an image of a different resolution (e.g. from a coarser solution) by nearest-voxel 
+    interpolation. Voxels without a value (NaN) take the value of the nearest voxel with one, so that every active material 
+    voxel of the new image is seeded.
+    
+    Args:
+        field (nd array): The closure field, with NaN outside the active material.
+        shape (tuple): The shape of the new image.
+
+    Returns:
+        resampled_field (nd array): The closure field with the new shape, without NaN.
+    """
+
+    missing = np.isnan(field)
+    if missing.all():
+        raise ValueError("The closure field has no values to resample.")
+
+    if missing.any():
+        nearest = ndimage.distance_transform_edt(missing, return_distances=False, return_indices=True)
+        field = field[tuple(nearest)]
+
+    if tuple(shape) == field.shape:
+        return field
+
+    # index of the voxel of the field which contains the centre of each new voxel
+    indices = np.ix_(*[np.minimum(((np.arange(n) + 0.5) * m / n).astype(int), m - 1) for n, m in zip(shape, field.shape)])
+
+    return field[indices]
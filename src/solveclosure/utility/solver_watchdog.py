@@ -0,0 +1,159 @@
+import os
+import time
+import select
+import signal
+
+from .parse_solver_log import SolverLogParser
+
+SIGNATURES = ["fatal error", "non-finite", "deltaT collapse", "stalled", "T drift", "timeout"]
+
+
+class SolverWatchdog:
+    """
+    Watches the output of an OpenFOAM solver as it is produced, writes it to the log, and kills the solver (with every process it started,
+    e.g. the ranks of mpirun) as soon as a failure signature appears, instead of letting a failed run continue to its end time.
+    Pass it to Trace.run, which runs the command in its own process group and hands its output to watch, e.g.
+
+        watchdog = SolverWatchdog(of_case_dir + "log.solver", min_T=1.0)
+        trace.run("chtMultiRegionFoam", f"{load_of_cmd} && chtMultiRegionFoam -case {of_case_dir}", check=False, watchdog=watchdog)
+        if watchdog.reason is not None:
+            ...
+
+    Args:
+        log_path (str): The path to the log the output of the solver is written to.
+        signatures (list, optional): The failure signatures to watch for, any of "fatal error", "non-finite" (NaN or inf residuals or T),
+        "deltaT collapse", "stalled" (linear solvers reaching max_iterations for stall_steps time steps in a row), "T drift" (T below min_T)
+        and "timeout". Default is all of them.
+        max_iterations (int): The maximum number of iterations of the linear solvers (maxIter in fvSolution).
+        stall_steps (int): The number of consecutive time steps with a stalled linear solve which count as a stalled run.
+        collapse_factor (float): A deltaT below this fraction of the largest deltaT of the run counts as a collapsed time step.
+        min_T (float, optional): The lowest acceptable T. The closure variable is offset by T_offset to keep T positive, so a T approaching
+        0 means the solution is drifting towards the T_offset boundary. Not checked if None.
+        timeout (float, optional): The wall time in seconds after which the solver is killed. Not checked if None.
+        poll_interval (float): The time in seconds to wait for output before checking the timeout again.
+        grace_period (float): The time in seconds the solver is given to exit after SIGTERM, before it is killed with SIGKILL.
+    """
+
+    def __init__(self, log_path, signatures=None, max_iterations=1000, stall_steps=20, collapse_factor=1e-3, min_T=None, timeout=None, poll_interval=1.0, grace_period=5.0):
+        if signatures is None:
+            signatures = list(SIGNATURES)
+        unknown = [name for name in signatures if name not in SIGNATURES]
+        if unknown:
+            raise ValueError(f"\nUnknown watchdog signatures {unknown}. The signatures are {SIGNATURES}.")
+
+        self.log_path = log_path
+        self.signatures = signatures
+        self.stall_steps = stall_steps
+        self.collapse_factor = collapse_factor
+        self.min_T = min_T
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.grace_period = grace_period
+        self.parser = SolverLogParser(max_iterations=max_iterations)
+        self.reason = None
+
+        # the time steps checked so far
+        self.n_checked = 0
+        self.max_delta_t = 0
+        self.n_stalled_steps = 0
+
+    def check(self):
+        # returns the first failure signature in the output read so far, or None. The checks are incremental, so long logs stay cheap.
+        parser = self.parser
+
+        if "fatal error" in self.signatures and parser.fatal_errors:
+            return f"fatal error: {parser.fatal_errors[0]}"
+        if "non-finite" in self.signatures and parser.non_finite:
+            return f"non-finite: {parser.non_finite[0]}"
+
+        # the last time step is still being written, so only its deltaT is complete
+        n_steps = len(parser.times)
+        for idx in range(self.n_checked, n_steps):
+            delta_t = parser.delta_ts[idx]
+            if delta_t is not None:
+                self.max_delta_t = max(self.max_delta_t, delta_t)
+                if "deltaT collapse" in self.signatures and delta_t < self.collapse_factor * self.max_delta_t:
+                    return f"deltaT collapse: deltaT fell from {self.max_delta_t:g} to {delta_t:g} at time {parser.times[idx]:g}"
+
+            if idx == n_steps - 1:
+                break
+            self.n_checked = idx + 1
+
+            self.n_stalled_steps = self.n_stalled_steps + 1 if parser.step_stalled_solves[idx] > 0 else 0
+            if "stalled" in self.signatures and self.n_stalled_steps >= self.stall_steps:
+                return f"stalled: the linear solver reached {parser.max_iterations} iterations for {self.n_stalled_steps} time steps in a row, until time {parser.times[idx]:g}"
+
+            min_T = parser.min_temperatures[idx]
+            if "T drift" in self.signatures and self.min_T is not None and min_T is not None and min_T < self.min_T:
+                return f"T drift: T fell to {min_T:g}, below {self.min_T:g}, at time {parser.times[idx]:g}"
+
+        return None
+
+    def feed(self, chunk, log):
+        # writes a chunk of the output to the log, parses it and checks it for failure signatures
+        log.write(chunk)
+        self.parser.feed(chunk.decode(errors="replace"))
+        self.reason = self.check()
+        return self.reason
+
+    def check_timeout(self, start_time):
+        if self.reason is None and "timeout" in self.signatures and self.timeout is not None and time.perf_counter() - start_time > self.timeout:
+            self.reason = f"timeout: the solver ran for more than {self.timeout:g} s"
+        return self.reason
+
+    def abort(self, log):
+        # notes the reason in the log before the solver is killed
+        log.write(f"\nKilled by the solveclosure watchdog: {self.reason}\n".encode())
+        print(f"\nKilling the solver: {self.reason}")
+
+    def watch(self, process):
+        """
+        Reads the output of a process until it ends, writing it to the log, and kills the process group if a failure signature appears.
+        The process must have been started with stdout=subprocess.PIPE and start_new_session=True. It is not reaped, so its exit status
+        and resource usage can still be collected with os.wait4.
+
+        Args:
+            process (subprocess.Popen): The solver process.
+
+        Returns:
+            reason (str): The failure signature which caused the solver to be killed, or None if it ran to the end.
+        """
+
+        start_time = time.perf_counter()
+        fd = process.stdout.fileno()
+
+        with open(self.log_path, 'wb') as log:
+            while True:
+                ready, _, _ = select.select([fd], [], [], self.poll_interval)
+                if ready:
+                    chunk = os.read(fd, 2**16)
+                    if not chunk:
+                        break
+                    self.feed(chunk, log)
+
+                if self.check_timeout(start_time) is not None:
+                    self.abort(log)
+                    kill_process_group(process.pid, self.grace_period)
+                    break
+
+        process.stdout.close()
+        return self.reason
+
+
+def kill_process_group(pid, grace_period):
+    # asks the process group to exit with SIGTERM, then kills whatever is left of it with SIGKILL. The leader is not reaped.
+    try:
+        os.killpg(pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+
+    deadline = time.perf_counter() + grace_period
+    while time.perf_counter() < deadline:
+        if os.waitid(os.P_PID, pid, os.WEXITED | os.WNOHANG | os.WNOWAIT) is not None:
+            break
+        time.sleep(0.05)
+
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
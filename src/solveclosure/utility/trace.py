@@ -0,0 +1,244 @@
+import os
+import sys
+import json
+import time
+import subprocess
+import contextlib
+
+
+class Trace:
+    """
+    Records the wall time, CPU time, peak RSS and bytes written of each stage of a pipeline, and the exit status of each subprocess.
+    Python stages are timed with the stage context manager and OpenFOAM commands are run with run, e.g.
+
+        trace = Trace()
+        with trace.stage("subdivide image"):
+            ...
+        trace.run("blockMesh", f"{load_of_cmd} && blockMesh -case {of_case_dir}")
+        trace.write("trace.json", format="chrome")
+
+    Peak RSS is the high-water mark of the stage (the mark is reset at the start of each stage where Linux allows it), and of
+    the command and its children for subprocesses. Linux counts the memory of the process a command was started from, so the
+    peak RSS of a command is at least that of the Python process. Bytes written are the bytes passed to write calls (wchar of /proc/self/io),
+    which include the writes of finished subprocesses, and are None where /proc is not available.
+
+    Args:
+        profile (bool): Set to True to run cProfile during the Python stages. The statistics are in profile_stats (a pstats.Stats).
+        trace_memory (bool): Set to True to record the peak of Python allocations in each Python stage with tracemalloc (slow).
+    """
+
+    def __init__(self, profile=False, trace_memory=False):
+        self.events = []
+        self.start_time = time.perf_counter()
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.profile_stats = None
+        self.profiler = None
+
+        if profile:
+            import cProfile
+            self.profiler = cProfile.Profile()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        # times a Python stage of the pipeline
+        if self.trace_memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+
+        reset_peak_rss()
+        bytes_start = read_bytes_written()
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.enable()
+
+        try:
+            yield
+        finally:
+            if self.profiler is not None:
+                self.profiler.disable()
+
+            event = {"name": name,
+                     "category": "python",
+                     "start": wall_start - self.start_time,
+                     "wall": time.perf_counter() - wall_start,
+                     "cpu": time.process_time() - cpu_start,
+                     "peak rss": read_peak_rss(),
+                     "bytes written": difference(read_bytes_written(), bytes_start)}
+
+            if self.trace_memory:
+                import tracemalloc
+                event["peak python allocations"] = tracemalloc.get_traced_memory()[1]
+
+            self.events.append(event)
+
+    def run(self, name, cmd, check=True, watchdog=None):
+        """
+        Runs a command with bash, as subprocess.run(["bash", "-c", cmd], check=check), and records it.
+
+        Args:
+            name (str): The name of the event, e.g. "blockMesh".
+            cmd (str): The command.
+            check (bool): Set to False to record a failed command instead of raising subprocess.CalledProcessError.
+            watchdog (SolverWatchdog, optional): Watches the output of the command (which should not be redirected) and kills it if it fails.
+            The reason is recorded as "abort reason".
+
+        Returns:
+            returncode (int): The exit status of the command.
+        """
+
+        bytes_start = read_bytes_written()
+        wall_start = time.perf_counter()
+
+        if watchdog is None:
+            process = subprocess.Popen(["bash", "-c", cmd])
+        else:
+            # the command gets its own process group, so that the watchdog can kill every process it starts
+            process = subprocess.Popen(["bash", "-c", cmd], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, start_new_session=True)
+            watchdog.watch(process)
+        # wait4 gives the resource usage of this command (and the children it waited for) alone
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+            returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+            cpu, peak_rss = usage.ru_utime + usage.ru_stime, usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+        except AttributeError:
+            returncode = process.wait()
+            cpu, peak_rss = None, None
+        process.returncode = returncode
+
+        event = {"name": name,
+                 "category": "subprocess",
+                 "start": wall_start - self.start_time,
+                 "wall": time.perf_counter() - wall_start,
+                 "cpu": cpu,
+                 "peak rss": peak_rss,
+                 "bytes written": difference(read_bytes_written(), bytes_start),
+                 "exit status": returncode,
+                 "command": cmd}
+        if watchdog is not None:
+            event["abort reason"] = watchdog.reason
+        self.events.append(event)
+
+        if check and returncode != 0:
+            raise subprocess.CalledProcessError(returncode, cmd)
+
+        return returncode
+
+    def record(self, name, wall_start, category="python", details=None):
+        """
+        Records a stage or command which was timed outside the trace, e.g. run in an executor or as an asyncio subprocess, from wall_start to now.
+        Its CPU time, peak RSS and bytes written are not known, and are None.
+
+        Args:
+            name (str): The name of the event.
+            wall_start (float): The time.perf_counter() at the start of the stage.
+            category (str): "python" for a Python stage, or "subprocess" for a command.
+            details (dict, optional): Other entries of the event, e.g. {"exit status": 0, "command": cmd}.
+        """
+
+        event = {"name": name,
+                 "category": category,
+                 "start": wall_start - self.start_time,
+                 "wall": time.perf_counter() - wall_start,
+                 "cpu": None,
+                 "peak rss": None,
+                 "bytes written": None,
+                 **(details or {})}
+        self.events.append(event)
+
+    def finish(self):
+        # stops profiling, and collects the profile statistics
+        if self.profiler is not None:
+            import io
+            import pstats
+            self.profile_stats = pstats.Stats(self.profiler, stream=io.StringIO())
+        if self.trace_memory:
+            import tracemalloc
+            tracemalloc.stop()
+
+    def to_dict(self):
+        return {"total wall": time.perf_counter() - self.start_time, "events": self.events}
+
+    def write(self, file_path, format="json"):
+        """
+        Writes the trace to a file.
+
+        Args:
+            file_path (str): The path to the file.
+            format (str): "json" for the list of events, or "chrome" for the Chrome trace event format (open with chrome://tracing or Perfetto).
+            If the trace was profiled, the cProfile statistics are also written next to the file (with the extension .prof).
+        """
+
+        if format == "json":
+            content = self.to_dict()
+        elif format == "chrome":
+            pid = os.getpid()
+            trace_events = []
+            for event in self.events:
+                args = {key: value for key, value in event.items() if key not in ["name", "category", "start", "wall"]}
+                trace_events.append({"name": event["name"], "cat": event["category"], "ph": "X", "pid": pid,
+                                     "tid": 0 if event["category"] == "python" else 1,
+                                     "ts": event["start"] * 1e6, "dur": event["wall"] * 1e6, "args": args})
+            content = {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+        else:
+            raise ValueError("\nformat must be either 'json' or 'chrome'.")
+
+        with open(file_path, 'w') as f:
+            json.dump(content, f, indent=1)
+
+        if self.profile_stats is not None:
+            self.profile_stats.dump_stats(os.path.splitext(file_path)[0] + ".prof")
+
+    def summary(self):
+        # prints the time spent in each stage, slowest first
+        print(f"\n{'stage':<45}{'wall (s)':>10}{'cpu (s)':>10}{'peak rss (MB)':>15}{'written (MB)':>14}")
+        for event in sorted(self.events, key=lambda event: -event["wall"]):
+            cpu = "" if event["cpu"] is None else f"{event['cpu']:.2f}"
+            rss = "" if event["peak rss"] is None else f"{event['peak rss'] / 2**20:.0f}"
+            written = "" if event["bytes written"] is None else f"{event['bytes written'] / 2**20:.1f}"
+            print(f"{event['name'][:44]:<45}{event['wall']:>10.2f}{cpu:>10}{rss:>15}{written:>14}")
+
+
+def read_bytes_written():
+    # the bytes passed to write calls by this process and its finished children (Linux only)
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss():
+    # resets the peak RSS high-water mark of this process (Linux 4.0 and later)
+    try:
+        with open("/proc/self/clear_refs", 'w') as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def read_peak_rss():
+    # the peak RSS of this process in bytes, since the last reset if supported
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    except ImportError:
+        return None
+
+
+def difference(end, start):
+    return None if end is None or start is None else end - start
@@ -0,0 +1,20 @@
+# Fixtures shared by the tests which run the stub executables, with paths built from this file so that pytest can run from any directory.
+
+import os
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+STUB_OPENFOAM_DIR = os.path.join(os.path.dirname(TESTS_DIR), "benchmarks", "stub_openfoam")
+STUB_SLURM_DIR = os.path.join(TESTS_DIR, "fixtures", "stub_slurm")
+
+
+@pytest.fixture
+def stub_load_of_cmd():
+    # the load_of_cmd which puts the stub OpenFOAM executables of the benchmarks on the PATH
+    return f"export PATH={STUB_OPENFOAM_DIR}:$PATH"
+
+
+@pytest.fixture
+def stub_slurm_dir():
+    # the directory of the stub sbatch and sacct executables
+    return STUB_SLURM_DIR
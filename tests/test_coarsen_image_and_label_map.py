@@ -0,0 +1,28 @@
+# Tests that majority-vote coarsening keeps every particle in one piece and numbers particles consecutively. 
+
+import numpy as np
+from skimage import measure
+
+from solveclosure.image_analysis import coarsen_image_and_label_map
+
+
+def test_coarsen_image_and_label_map():
+    # particle 1 only survives coarsening in two diagonal blocks, which must not leave it in two pieces
+    label_map = np.zeros((4, 4, 2), dtype=np.uint16)
+    label_map[:2, :2] = 1
+    label_map[2:, 2:] = 1
+    label_map[2:, :2] = 2
+    img = (label_map > 0).astype(np.uint8)
+    img[:2, 2:] = 2
+
+    img_coarse, label_map_coarse = coarsen_image_and_label_map(img, label_map, 2)
+
+    assert img_coarse.shape == (2, 2, 1)
+    assert list(np.unique(label_map_coarse)) == [0, 1, 2]
+    assert np.array_equal(img_coarse == 1, label_map_coarse > 0)
+    assert img_coarse[0, 1, 0] == 2
+    for i in [1, 2]:
+        assert measure.label(label_map_coarse == i, connectivity=1).max() == 1
+
+    # the smaller piece is merged into the particle it touches
+    assert label_map_coarse[0, 0, 0] == label_map_coarse[1, 0, 0]
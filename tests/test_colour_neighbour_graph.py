@@ -0,0 +1,18 @@
+# Tests that the neighbour graph colouring used for region agglomeration never puts contacting particles in the same region. 
+
+from solveclosure.image_analysis import colour_neighbour_graph
+
+
+def test_colour_neighbour_graph():
+    # a ring of five particles (needs three colours) plus an isolated particle
+    neighbour_ids = {1: [2, 5, "elec"], 2: [1, 3], 3: [2, 4, "cbd"], 4: [3, 5], 5: [4, 1], 6: ["elec"]}
+
+    particle_colours = colour_neighbour_graph(neighbour_ids)
+
+    for key, neighbours in neighbour_ids.items():
+        for id in neighbours:
+            if not isinstance(id, str):
+                assert particle_colours[key] != particle_colours[id]
+
+    assert max(particle_colours.values()) == 3
+    assert particle_colours[6] == 1
@@ -0,0 +1,24 @@
+# Tests that cropping a subvolume relabels particles cut by the crop, keeping touching particles separate. 
+
+import numpy as np
+
+from solveclosure.image_analysis import crop_and_relabel_subvolume
+
+
+def test_crop_and_relabel_subvolume():
+    # a U-shaped particle 7 touching a bar particle 9
+    label_map = np.zeros((6, 6, 2), dtype=np.uint16)
+    label_map[0:5, 0, :] = 7
+    label_map[0:5, 2, :] = 7
+    label_map[4, 0:3, :] = 7
+    label_map[0:5, 3, :] = 9
+    img = (label_map > 0).astype(np.uint8)
+
+    # cropping off the base of the U splits particle 7 into two arms
+    img_crop, label_map_crop = crop_and_relabel_subvolume(img, label_map, (0, 0, 0), (4, 6, 2))
+
+    assert np.array_equal(img_crop, img[:4])
+    assert label_map_crop.max() == 3
+    assert len(np.unique(label_map_crop[:, 0])) == 1
+    assert len({label_map_crop[0, 0, 0], label_map_crop[0, 2, 0], label_map_crop[0, 3, 0]}) == 3
+    assert np.array_equal(label_map_crop > 0, label_map[:4] > 0)
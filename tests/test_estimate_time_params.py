@@ -0,0 +1,37 @@
+# Tests that the automatic time parameters follow the diffusion time scale of the largest particle (or cluster), and reach steady state for two_squares with the native solver. 
+
+import numpy as np
+import tifffile as tif
+import solveclosure
+from solveclosure.image_analysis import estimate_time_params, subdivide_image_using_label_map
+
+
+def test_estimate_time_params(tmp_path):
+    img_path = "examples/two_squares/two_squares.tif"
+    label_map_path = "examples/two_squares/two_squares_label_map.tif"
+    voxel = 1e-7
+    img = tif.imread(img_path)
+    label_map = tif.imread(label_map_path)
+    L = img.shape[0] * voxel
+    D_s = 4e-14
+    _, _, neighbour_ids = subdivide_image_using_label_map(label_map_path, img)
+
+    # the two particles touch, so with flux they relax together
+    with_flux = estimate_time_params(label_map, neighbour_ids, voxel, dimensionless=True, L=L)
+    without_flux = estimate_time_params(label_map, neighbour_ids, voxel, dimensionless=True, L=L, allow_flux=False)
+    assert with_flux["extent"] > without_flux["extent"]
+    assert np.isclose(without_flux["diffusion time"], (without_flux["extent"] / img.shape[0])**2)
+    assert np.isclose(with_flux["T_end"], 4 * with_flux["diffusion time"])
+    assert np.isclose(with_flux["write_interval"], with_flux["T_end"] / 4)
+    assert np.isclose(with_flux["max_Di"] * (voxel / L)**2, with_flux["T_end"] / 100)
+
+    # the dimensional time parameters are the dimensionless ones scaled by L^2 / D_s
+    dimensional = estimate_time_params(label_map, neighbour_ids, voxel, dimensionless=False, D_s=D_s)
+    assert np.isclose(dimensional["T_end"], with_flux["T_end"] * L**2 / D_s)
+    assert np.isclose(dimensional["max_Di"], with_flux["max_Di"])
+
+    # the automatic run reaches the steady state of a much longer run (-0.065954) in about 100 time steps
+    closure_data = solveclosure.solve_closure_native(str(tmp_path / "auto"), img_path, label_map_path, voxel, 0.5, time_params="auto", scheme="euler")
+    assert abs(closure_data["global s surface average steady"] / -0.065954 - 1) < 1e-4
+    assert closure_data["native solver"]["n steps"] < 150
+    assert closure_data["time params"]["T_end"] == with_flux["T_end"]
@@ -0,0 +1,23 @@
+# Tests that gap filling gives unlabelled AM the nearest particle label and labels isolated AM as new particles. 
+
+import numpy as np
+
+from solveclosure.generate_label_map import gap_filling
+
+
+def test_gap_filling():
+    # a bar of AM labelled only at its ends, plus an isolated AM voxel
+    am_mask = np.zeros((3, 9, 3), dtype=bool)
+    am_mask[1, :, 1] = True
+    am_mask[0, 0, 0] = True
+
+    label_map = np.zeros(am_mask.shape, dtype=np.int32)
+    label_map[1, 0, 1] = 1
+    label_map[1, 8, 1] = 2
+
+    filled_label_map = gap_filling(am_mask, label_map)
+
+    # the voxel equidistant from both particles takes the larger label
+    assert list(filled_label_map[1, :, 1]) == [1, 1, 1, 1, 2, 2, 2, 2, 2]
+    assert filled_label_map[0, 0, 0] == 3
+    assert np.all(filled_label_map[~am_mask] == 0)
@@ -0,0 +1,45 @@
+# Benchmarks the peak memory of generate_label_map, and tests that the low memory mode gives the same particles. 
+
+import subprocess
+import sys
+
+import numpy as np
+import tifffile as tif
+
+# runs generate_label_map in a fresh interpreter and prints the peak resident set size in kB
+benchmark_script = """
+import resource, sys
+from solveclosure.generate_label_map import generate_label_map
+baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+generate_label_map(sys.argv[1], sys.argv[2], low_memory=sys.argv[3] == "True")
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline)
+"""
+
+
+def peak_rss(img_path, write_path, low_memory):
+    result = subprocess.run([sys.executable, "-c", benchmark_script, img_path, write_path, str(low_memory)], capture_output=True, text=True, check=True)
+    return int(result.stdout.split()[-1])
+
+
+def test_generate_label_map_memory(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 160
+    img = np.zeros((n, n, n), dtype=np.uint8)
+    z, y, x = np.mgrid[:n, :n, :n]
+    for centre in rng.uniform(0, n, (60, 3)):
+        img[(z - centre[0])**2 + (y - centre[1])**2 + (x - centre[2])**2 < rng.uniform(8, 14)**2] = 1
+    del z, y, x
+
+    img_path = str(tmp_path / "img.tif")
+    tif.imwrite(img_path, img)
+
+    rss = peak_rss(img_path, str(tmp_path / "label_map.tif"), False)
+    rss_low_memory = peak_rss(img_path, str(tmp_path / "label_map_low_memory.tif"), True)
+
+    print(f"Peak RSS increase: {rss / 1024:.0f} MB (default), {rss_low_memory / 1024:.0f} MB (low memory)")
+    assert rss_low_memory < 0.75 * rss
+
+    label_map = tif.imread(str(tmp_path / "label_map.tif"))
+    label_map_low_memory = tif.imread(str(tmp_path / "label_map_low_memory.tif"))
+    assert label_map.max() == label_map_low_memory.max()
+    assert np.mean(label_map == label_map_low_memory) > 0.99
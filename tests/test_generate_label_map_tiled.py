@@ -0,0 +1,66 @@
+# Tests that the tiled watershed gives the same particles as segmenting the whole image in memory, and that the stitched label map is checked for particles merged across tile seams. 
+
+import pytest
+import numpy as np
+import tifffile as tif
+
+from solveclosure import generate_label_map, generate_label_map_tiled
+from solveclosure.generate_label_map_tiled import check_tiled_label_map
+
+
+def test_generate_label_map_tiled(tmp_path):
+    # overlapping spheres spread across the seams of eight tiles
+    rng = np.random.default_rng(0)
+    n = 64
+    img = np.zeros((n, n, n), dtype=np.uint8)
+    z, y, x = np.mgrid[:n, :n, :n]
+    for centre in rng.uniform(8, 56, (12, 3)):
+        radius = rng.uniform(6, 9)
+        img[(z - centre[0])**2 + (y - centre[1])**2 + (x - centre[2])**2 < radius**2] = 1
+
+    img_path = str(tmp_path / "img.tif")
+    tif.imwrite(img_path, img)
+
+    generate_label_map(img_path, str(tmp_path / "label_map.tif"))
+    n_particles = generate_label_map_tiled(img_path, str(tmp_path / "label_map_tiled.tif"), (32, 32, 32), 9, n_workers=2)
+
+    label_map = tif.imread(str(tmp_path / "label_map.tif")).astype(np.int64)
+    label_map_tiled = tif.imread(str(tmp_path / "label_map_tiled.tif")).astype(np.int64)
+
+    assert n_particles == label_map.max()
+    assert np.array_equal(label_map > 0, label_map_tiled > 0)
+
+    # every particle maps onto a single tiled particle, whatever the numbering
+    am = label_map > 0
+    pairs = np.unique(np.stack([label_map[am], label_map_tiled[am]]), axis=1)
+    assert len(np.unique(pairs[0])) == pairs.shape[1]
+    assert len(np.unique(pairs[1])) == pairs.shape[1]
+
+
+def test_check_tiled_label_map(tmp_path, capsys):
+    # two blocks of AM which touch across the seam of the two tiles along axis 0
+    img = np.zeros((8, 4, 4), dtype=np.uint8)
+    img[1:7, 1:3, 1:3] = 1
+    img_path = str(tmp_path / "img.tif")
+    tif.imwrite(img_path, img)
+    tiles = [(slice(0, 4), slice(0, 4), slice(0, 4)), (slice(4, 8), slice(0, 4), slice(0, 4))]
+
+    # a particle which continues across the seam is a single component
+    label_map = np.zeros(img.shape, dtype=np.uint32)
+    label_map[1:4][img[1:4] == 1] = 1
+    label_map[4:7][img[4:7] == 1] = 2
+    check_tiled_label_map(img_path, label_map, tiles, 2, 6)
+    label_map[img == 1] = 1
+    check_tiled_label_map(img_path, label_map, tiles, 1, 6)
+    assert "Warning" not in capsys.readouterr().out
+
+    # particles merged where they touch are reported by their extent
+    check_tiled_label_map(img_path, label_map, tiles, 1, 4)
+    assert "may be particles merged across a tile seam: [1]" in capsys.readouterr().out
+
+    # particles merged where they do not touch are fragmented
+    img[4, :, :] = 0
+    tif.imwrite(img_path, img)
+    label_map[4, :, :] = 0
+    with pytest.raises(ValueError, match="Particle 1 is fragmented into 2 components"):
+        check_tiled_label_map(img_path, label_map, tiles, 1, 6)
@@ -0,0 +1,35 @@
+# Benchmarks the import time of solveclosure with python -X importtime, and checks that heavy dependencies are only imported when needed. 
+
+import subprocess
+import sys
+
+# import time budget for "import solveclosure" in microseconds
+IMPORT_TIME_BUDGET = 100000
+
+
+def test_import_time():
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import solveclosure"], capture_output=True, text=True, check=True)
+
+    # lines are formatted as "import time: self [us] | cumulative | imported package"
+    cumulative_us = None
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == "solveclosure":
+            cumulative_us = int(parts[1])
+
+    assert cumulative_us is not None
+    assert cumulative_us < IMPORT_TIME_BUDGET
+
+
+def test_heavy_imports_are_lazy():
+    heavy_modules = ["numpy", "scipy", "skimage", "matplotlib", "tifffile"]
+
+    # nothing heavy is imported by the package itself
+    cmd = f"import sys, solveclosure; print([m for m in {heavy_modules} if m in sys.modules])"
+    result = subprocess.run([sys.executable, "-c", cmd], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+    # plotting is only needed for debugging, so the solver does not import matplotlib
+    cmd = "import sys, solveclosure; solveclosure.solve_closure_multiparticle; print('matplotlib' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", cmd], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,53 @@
+# Tests that the solver log parser summarises a canned chtMultiRegionFoam log, and flags divergence and stalls in a log read in chunks. 
+
+import os
+import numpy as np
+
+from solveclosure.utility import parse_solver_log, SolverLogParser
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def test_parse_solver_log():
+    summary = parse_solver_log(os.path.join(FIXTURES, "log.chtMultiRegionFoam"))
+
+    assert summary["n time steps"] == 3
+    assert np.allclose(summary["times"], [1.2e-08, 2.64e-08, 4.368e-08])
+    assert np.allclose(summary["deltaT"], [1.2e-08, 1.44e-08, 1.728e-08])
+    assert summary["execution time"] == 0.29
+    assert summary["iterations per time step"] == [3, 5, 6]
+    assert summary["regions"]["particle_2"]["iterations"] == 9
+    assert summary["regions by iterations"] == [("particle_2", 9), ("particle_1", 5)]
+    assert summary["finished"]
+    assert summary["flags"] == []
+
+
+def test_solver_log_flags():
+    log = """deltaT = 1e-05
+Time = 1e-05
+
+Solving for solid region particle_1
+DICPCG:  Solving for h, Initial residual = 1, Final residual = 0.2, No Iterations 1000
+Solving for solid region particle_2
+DICPCG:  Solving for h, Initial residual = 1, Final residual = 1e-09, No Iterations 3
+ExecutionTime = 1.5 s  ClockTime = 2 s
+
+deltaT = 1e-09
+Time = 1.0001e-05
+
+Solving for solid region particle_1
+DICPCG:  Solving for h, Initial residual = nan, Final residual = nan, No Iterations 1000
+"""
+
+    # the log is fed in chunks which split lines, as when a running solver is followed
+    parser = SolverLogParser()
+    for start in range(0, len(log), 7):
+        parser.feed(log[start:start + 7])
+    summary = parser.summary()
+
+    assert summary["n time steps"] == 2
+    assert summary["regions"]["particle_1"]["stalled solves"] == 2
+    assert any(flag.startswith("diverged") for flag in summary["flags"])
+    assert any("particle_1" in flag and flag.startswith("stalled") for flag in summary["flags"])
+    assert any("deltaT collapsed" in flag for flag in summary["flags"])
+    assert any(flag.startswith("unfinished") for flag in summary["flags"])
@@ -0,0 +1,23 @@
+# Tests that the particle-aware decomposition keeps whole particles together, balances voxel counts and reports cut interfaces correctly. 
+
+import numpy as np
+from solveclosure.image_analysis import partition_particles_across_processors
+
+
+def test_partition_particles_across_processors():
+    # a chain of particles with decreasing voxel counts
+    voxel_counts = [50, 40, 30, 30, 20, 20, 10, 10]
+    subsections = {key: np.ones((count, 1, 1)) for key, count in zip(range(1, 9), voxel_counts)}
+    neighbour_ids = {1: [2, "elec"], 2: [1, 3], 3: [2, 4], 4: [3, 5], 5: [4, 6], 6: [5, 7], 7: [6, 8], 8: [7, "cbd"]}
+
+    particle_procs, imbalance, n_cut_interfaces = partition_particles_across_processors(subsections, neighbour_ids, 2)
+
+    loads = [0, 0]
+    for key, proc in particle_procs.items():
+        loads[proc] += voxel_counts[key - 1]
+
+    # every particle assigned, and the chain is only cut once
+    assert sorted(particle_procs.keys()) == list(range(1, 9))
+    assert n_cut_interfaces == 1
+    assert np.isclose(imbalance, max(loads) / (sum(loads) / 2) - 1)
+    assert imbalance < 0.2
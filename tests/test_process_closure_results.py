@@ -0,0 +1,24 @@
+# Tests that process_closure_results reports a steady case without surface integral data clearly, instead of failing on missing results (with the stub OpenFOAM executables of the benchmarks).
+
+import os
+import pytest
+
+import solveclosure
+
+STUB_OPENFOAM_DIR = os.path.abspath("benchmarks/stub_openfoam")
+
+
+def test_process_closure_results_without_data(tmp_path):
+    case_dir = str(tmp_path / "case") + "/"
+    os.makedirs(case_dir)
+    solveclosure.solve_closure_multiparticle(case_dir, "examples/two_squares/two_squares.tif", "examples/two_squares/two_squares_label_map.tif", 1e-7, 0.5,
+                                             load_of_cmd=f"export PATH={STUB_OPENFOAM_DIR}:$PATH", steady=True, run_solver=False)
+
+    # an empty surface integral file, and no files for the other particle
+    integral_dir = case_dir + "openfoam_case/postProcessing/particle_1/particle_1_surfaceIntegral_elec/0/"
+    os.makedirs(integral_dir)
+    with open(integral_dir + "surfaceFieldValue.dat", 'w') as f:
+        f.write("# Time    areaIntegrate(T)\n")
+
+    with pytest.raises(ValueError, match="No surface integral data was found"):
+        solveclosure.process_closure_results(case_dir, 0.5, 1.0, True, L=1e-5)
@@ -0,0 +1,23 @@
+# Tests that warm-start fields written in binary by write_bc_file_multiparticle, and ascii fields, are read back exactly. 
+
+import numpy as np
+
+from solveclosure.openfoam_case_setup.multiparticle import write_bc_file_multiparticle
+from solveclosure.utility import read_openfoam_field
+
+
+def test_read_openfoam_field(tmp_path):
+    initial_field = 10 + np.random.default_rng(0).random(1000)
+
+    binary_path = str(tmp_path / "T_binary")
+    write_bc_file_multiparticle(binary_path, "particle_1", -1, -0.5, [2, "elec", "cbd"], 10, initial_field=initial_field)
+    assert np.array_equal(read_openfoam_field(binary_path), initial_field)
+
+    uniform_path = str(tmp_path / "T_uniform")
+    write_bc_file_multiparticle(uniform_path, "particle_1", -1, -0.5, [2, "elec", "cbd"], 10)
+    assert read_openfoam_field(uniform_path) == 10
+
+    ascii_path = str(tmp_path / "T_ascii")
+    with open(ascii_path, 'w') as f:
+        f.write("FoamFile\n{\n    format      ascii;\n}\ninternalField   nonuniform List<scalar> \n3\n(\n10.5\n11\n1e1\n)\n;\n")
+    assert np.array_equal(read_openfoam_field(ascii_path), [10.5, 11, 10])
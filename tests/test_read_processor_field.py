@@ -0,0 +1,63 @@
+# Tests that fields of a parallel case are assembled straight from the processor directories (a small decomposed case in the fixtures, and a stub parallel solve which is not reconstructed).
+
+import os
+import shutil
+import pickle
+import numpy as np
+import tifffile as tif
+
+import solveclosure
+from solveclosure.utility import read_processor_field, load_closure_field
+from solveclosure.openfoam_case_setup.write_decomposed_case import write_decomposed_case
+from solveclosure.openfoam_case_setup.multiparticle import write_bc_file_multiparticle
+from solveclosure.image_analysis import return_region_cell_labels
+
+FIXTURE_CASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "decomposed_case")
+
+
+def test_read_processor_field():
+    # the latest time of every region by default
+    fields = read_processor_field(FIXTURE_CASE_DIR, n_workers=2)
+    assert list(fields.keys()) == ["0.5"]
+    assert np.allclose(fields["0.5"]["region_0"], [10.0, 10.1, 10.2, 10.3, 10.4, 10.5])
+    assert np.allclose(fields["0.5"]["region_1"], [11, 11.5])
+
+    # only the requested times and regions are read, and uniform fields fill the cells of their processor
+    fields = read_processor_field(FIXTURE_CASE_DIR, times=[0.25], region_names=["region_1"])
+    assert list(fields.keys()) == ["0.25"] and list(fields["0.25"].keys()) == ["region_1"]
+    assert np.array_equal(fields["0.25"]["region_1"], [10, 10])
+
+
+def test_parallel_case_without_reconstruction(tmp_path, stub_load_of_cmd):
+    case_dir = str(tmp_path / "case") + "/"
+    os.makedirs(case_dir)
+    img_path, label_map_path = "examples/two_squares/two_squares.tif", "examples/two_squares/two_squares_label_map.tif"
+    trace = solveclosure.solve_closure_multiparticle(case_dir, img_path, label_map_path, 1e-7, 0.5, load_of_cmd=stub_load_of_cmd,
+                                                     parallelise=True, n_procs=2, decomposition="particles", decomposer="python")
+
+    # the closure results come from the postProcessing integrals, without reconstructPar
+    event_names = [event["name"] for event in trace.events]
+    assert "reconstructPar" not in event_names
+    with open(case_dir + "closure_data.pickle", 'rb') as f:
+        closure_data = pickle.load(f)
+    assert closure_data["global s surface average steady"] is not None
+
+    # write a solution to the processor directories only, as a parallel solve does
+    of_case_dir = case_dir + "openfoam_case/"
+    img, label_map = tif.imread(img_path), tif.imread(label_map_path)
+    particle_procs = closure_data["decomposition"]["particle processors"]
+    expected = np.full(img.shape, np.nan)
+    region_cell_procs = {}
+    for key in closure_data["particle data"]:
+        region_name = f"particle_{key}"
+        cell_labels = return_region_cell_labels(img, label_map, [key])
+        values = np.random.default_rng(key).random(len(cell_labels))
+        expected.transpose(2, 1, 0)[((img == 1) & (label_map == key)).transpose(2, 1, 0)] = values
+        os.makedirs(of_case_dir + f"0.5/{region_name}")
+        write_bc_file_multiparticle(of_case_dir + f"0.5/{region_name}/T", region_name, -1.0, -0.5, [], 0, initial_field=values + closure_data["T offset"])
+        region_cell_procs[region_name] = [particle_procs[key]] * len(cell_labels)
+    write_decomposed_case(of_case_dir, region_cell_procs, 2, time_dir="0.5")
+    shutil.rmtree(of_case_dir + "0.5")
+
+    field, _ = load_closure_field(case_dir, n_workers=2)
+    assert np.allclose(field, expected, equal_nan=True)
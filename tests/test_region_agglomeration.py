@@ -0,0 +1,91 @@
+# Tests that the particle cellZones and faceZones of an agglomerated region (from return_region_cell_labels and write_region_topoSetDict_file) hold the same cells and faces as the region of each particle when particles are not agglomerated (with the stub OpenFOAM executables of the benchmarks, whose splitMeshRegions writes the region meshes).
+
+import os
+import re
+import pickle
+import numpy as np
+import tifffile as tif
+
+import solveclosure
+from solveclosure.image_analysis import return_region_cell_labels
+from solveclosure.utility import read_openfoam_mesh
+
+
+def cell_and_face_centres(mesh):
+    face_centres = mesh["points"][mesh["face labels"].reshape(-1, 4)].mean(axis=1)
+    cell_centres = np.zeros((mesh["n cells"], 3))
+    np.add.at(cell_centres, mesh["owner"], face_centres)
+    np.add.at(cell_centres, mesh["neighbour"], face_centres[:len(mesh["neighbour"])])
+    return cell_centres / 6, face_centres
+
+
+def patch_faces(mesh, patch_name):
+    patch = next(patch for patch in mesh["patches"] if patch["name"] == patch_name)
+    return np.arange(patch["start face"], patch["start face"] + patch["n faces"])
+
+
+def sort_rows(centres):
+    return centres[np.lexsort(centres.T)]
+
+
+def test_region_agglomeration(tmp_path, stub_load_of_cmd):
+    # a third particle far from the two squares, which shares a region with one of them
+    img = tif.imread("examples/two_squares/two_squares.tif")
+    label_map = tif.imread("examples/two_squares/two_squares_label_map.tif")
+    img[5:15, 80:90, :] = 1
+    label_map[5:15, 80:90, :] = 3
+    img_path, label_map_path = str(tmp_path / "img.tif"), str(tmp_path / "label_map.tif")
+    tif.imwrite(img_path, img)
+    tif.imwrite(label_map_path, label_map)
+
+    of_case_dirs = {}
+    for agglomerate_regions in [False, True]:
+        case_dir = str(tmp_path / f"case_{agglomerate_regions}") + "/"
+        os.makedirs(case_dir)
+        solveclosure.solve_closure_multiparticle(case_dir, img_path, label_map_path, 1e-7, 0.5, load_of_cmd=stub_load_of_cmd,
+                                                 agglomerate_regions=agglomerate_regions, run_solver=False)
+        of_case_dirs[agglomerate_regions] = case_dir + "openfoam_case/"
+
+    with open(str(tmp_path / "case_True/closure_data.pickle"), 'rb') as f:
+        region_map = pickle.load(f)["region map"]
+    region_members = {}
+    for key, region_name in region_map.items():
+        region_members.setdefault(region_name, []).append(key)
+    assert sorted(len(members) for members in region_members.values()) == [1, 2]
+
+    n_zone_faces = 0
+    for region_name, members in region_members.items():
+        region_mesh = read_openfoam_mesh(of_case_dirs[True] + f"constant/{region_name}/polyMesh")
+        region_cell_centres, region_face_centres = cell_and_face_centres(region_mesh)
+        cell_labels = return_region_cell_labels(img, label_map, members)
+        assert len(cell_labels) == region_mesh["n cells"]
+
+        with open(of_case_dirs[True] + f"system/{region_name}/topoSetDict") as f:
+            topoSetDict = f.read()
+        cell_sets = {name: np.array(values.split(), dtype=int) for name, values in re.findall(r"name\s+c_(\S+);\s*type\s+cellSet;.*?value\s*\(([^)]*)\)", topoSetDict, re.DOTALL)}
+        face_patches = dict(re.findall(r"name\s+f_(\S+);\s*type\s+faceSet;\s*action\s+new;\s*source\s+patchToFace;\s*patch\s+(\S+);", topoSetDict))
+        face_subsets = dict(re.findall(r"name\s+f_(\S+);\s*type\s+faceSet;\s*action\s+subset;\s*source\s+cellToFace;\s*set\s+c_(\S+);", topoSetDict))
+        face_zones = re.findall(r"name\s+(\S+);\s*type\s+faceZoneSet;.*?faceSet\s+f_(\S+);", topoSetDict, re.DOTALL)
+
+        for key in members:
+            particle_name = f"particle_{key}"
+            particle_mesh = read_openfoam_mesh(of_case_dirs[False] + f"constant/{particle_name}/polyMesh")
+            particle_cell_centres, particle_face_centres = cell_and_face_centres(particle_mesh)
+
+            # the cellZone of the particle holds the cells of its own region, in the same order
+            cells = cell_sets[particle_name]
+            assert np.array_equal(cells, np.flatnonzero(cell_labels == key))
+            assert np.allclose(region_cell_centres[cells], particle_cell_centres)
+
+            # each faceZone holds the faces of the region patch owned by the particle, which are the faces of the patch of its own region
+            for zone_name, face_set in face_zones:
+                if not zone_name.startswith(particle_name + "_"):
+                    continue
+                assert face_subsets[face_set] == particle_name
+                faces = patch_faces(region_mesh, face_patches[face_set])
+                faces = faces[np.isin(region_mesh["owner"][faces], cells)]
+                expected = particle_face_centres[patch_faces(particle_mesh, particle_name + zone_name[len(particle_name):])]
+                assert np.allclose(sort_rows(region_face_centres[faces]), sort_rows(expected))
+                n_zone_faces += len(faces)
+
+    assert n_zone_faces > 0
@@ -0,0 +1,30 @@
+# Tests that stratified RVE sampling drops a stratum which has no AM, rather than running to n_max (with the stub OpenFOAM executables of the benchmarks).
+
+import os
+import numpy as np
+import tifffile as tif
+
+import solveclosure
+
+
+def test_rve_sampling_strata(tmp_path, monkeypatch, stub_load_of_cmd):
+    monkeypatch.setenv("SOLVECLOSURE_STUB_STEPS", "10")
+
+    # electrolyte above the AM of the two squares, so that every subvolume drawn from the first of two strata is empty
+    img = tif.imread("examples/two_squares/two_squares.tif")[30:70]
+    label_map = tif.imread("examples/two_squares/two_squares_label_map.tif")[30:70]
+    img = np.concatenate([np.zeros((49,) + img.shape[1:], dtype=img.dtype), img])
+    label_map = np.concatenate([np.zeros((49,) + label_map.shape[1:], dtype=label_map.dtype), label_map])
+    img_path, label_map_path = str(tmp_path / "img.tif"), str(tmp_path / "label_map.tif")
+    tif.imwrite(img_path, img)
+    tif.imwrite(label_map_path, label_map)
+
+    case_dir = str(tmp_path / "rve") + "/"
+    os.makedirs(case_dir)
+    sampling_data = solveclosure.solve_closure_rve_sampling(case_dir, img_path, label_map_path, 1e-7, 0.5, (10, 100, 10), 1e6, stratified=True, n_strata=2,
+                                                            n_min=2, n_max=12, n_workers=2, seed=0, load_of_cmd=stub_load_of_cmd)
+
+    assert sampling_data["dropped strata"] == [0]
+    assert sampling_data["converged"]
+    assert all(sample["stratum"] == 1 for sample in sampling_data["samples"])
+    assert len(sampling_data["samples"]) < 6
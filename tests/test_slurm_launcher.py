@@ -0,0 +1,77 @@
+# Tests that launch_closure_array writes and submits job arrays for a sweep of cases, and gathers their results (with stub sbatch and sacct executables which run the array tasks in place, and the stub OpenFOAM executables of the benchmarks).
+
+import os
+import sys
+import json
+
+from solveclosure.hpc import launch_closure_array, gather_closure_array_results
+from solveclosure.hpc.check_closure_array import parse_sacct_output
+
+
+def test_launch_closure_array(tmp_path, monkeypatch, stub_load_of_cmd, stub_slurm_dir):
+    monkeypatch.setenv("PATH", f"{stub_slurm_dir}:{os.environ['PATH']}")
+    monkeypatch.setenv("SOLVECLOSURE_STUB_SLURM_DIR", str(tmp_path))
+    monkeypatch.setenv("SOLVECLOSURE_STUB_STEPS", "10")
+
+    launch_dir = str(tmp_path / "launch") + "/"
+    base_case = {"img_path": "examples/two_squares/two_squares.tif", "label_map_path": "examples/two_squares/two_squares_label_map.tif",
+                 "voxel": 1e-7, "load_of_cmd": stub_load_of_cmd}
+    launch = launch_closure_array(launch_dir, grid={"cbd_surf_por": [0.3, 0.5]}, base_case=base_case, partition="compute",
+                                  time_limit="01:00:00", python_cmd=sys.executable, max_concurrent=2)
+
+    # the two squares are small, so both cases are serial and share one job array
+    assert len(launch["cases"]) == 2
+    assert [case["arguments"]["cbd_surf_por"] for case in launch["cases"]] == [0.3, 0.5]
+    assert len(launch["groups"]) == 1
+    job_array = launch["groups"][0]
+    assert job_array["cases"] == [0, 1] and job_array["n tasks"] == 1 and job_array["n nodes"] == 1
+    assert job_array["job id"] == "1000"
+
+    with open(job_array["script"], 'r') as f:
+        script = f.read()
+    for line in ["#SBATCH --ntasks=1", "#SBATCH --nodes=1", "#SBATCH --partition=compute", "#SBATCH --time=01:00:00"]:
+        assert line in script
+
+    with open(launch_dir + "launch.json", 'r') as f:
+        assert json.load(f)["groups"][0]["job id"] == "1000"
+
+    results, states = gather_closure_array_results(launch_dir, wait=True, poll_interval=0.1, timeout=10)
+    assert states == ["COMPLETED", "COMPLETED"]
+    for case, closure_data in zip(launch["cases"], results):
+        assert closure_data is not None
+        assert closure_data["case settings"]["cbd surface porosity"] == case["arguments"]["cbd_surf_por"]
+        assert closure_data["global s surface average steady"] is not None
+
+    # the stub solver diverges while maxDi is above 6, so the watched case without retries fails and the case with a retry completes
+    monkeypatch.setenv("SOLVECLOSURE_STUB_DIVERGE_MAX_DI", "6")
+    launch_dir = str(tmp_path / "launch_watchdog") + "/"
+    base_case = {**base_case, "cbd_surf_por": 0.5, "watchdog": {"grace_period": 1}}
+    launch = launch_closure_array(launch_dir, grid={"n_retries": [0, 1]}, base_case=base_case, python_cmd=sys.executable)
+    assert launch["groups"][0]["job id"] == "1001"
+
+    results, states = gather_closure_array_results(launch_dir, wait=True, poll_interval=0.1, timeout=10)
+    assert states == ["FAILED", "COMPLETED"]
+    assert results[0] is None
+    assert results[1]["solver watchdog"]["reason"] is None
+    assert results[1]["global s surface average steady"] is not None
+
+
+def test_launch_closure_array_resources(tmp_path):
+    base_case = {"img_path": "examples/two_squares/two_squares.tif", "label_map_path": "examples/two_squares/two_squares_label_map.tif", "voxel": 1e-7}
+    cases = [{**base_case, "cbd_surf_por": 0.5, "parallelise": True, "n_procs": 96},
+             {**base_case, "cbd_surf_por": 0.5, "parallelise": True, "n_procs": 8},
+             {**base_case, "cbd_surf_por": 0.2, "parallelise": True, "n_procs": 8},
+             {**base_case, "cbd_surf_por": 0.5}]
+    launch = launch_closure_array(str(tmp_path), cases=cases, cores_per_node=64, submit=False)
+
+    groups = {(job_array["n tasks"], job_array["n nodes"]): job_array["cases"] for job_array in launch["groups"]}
+    assert groups == {(1, 1): [3], (8, 1): [1, 2], (96, 2): [0]}
+    for job_array in launch["groups"]:
+        assert job_array["job id"] is None
+        with open(job_array["script"], 'r') as f:
+            assert f"#SBATCH --ntasks={job_array['n tasks']}" in f.read()
+
+
+def test_parse_sacct_output():
+    output = "1234_0|COMPLETED|0:0\n1234_0.batch|COMPLETED|0:0\n1234_1|CANCELLED by 1000|0:15\n1234_[2-4,6%2]|PENDING|0:0\n"
+    assert list(parse_sacct_output(output)) == [("1234", [0], "COMPLETED"), ("1234", [1], "CANCELLED"), ("1234", [2, 3, 4, 6], "PENDING")]
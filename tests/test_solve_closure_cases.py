@@ -0,0 +1,64 @@
+# Tests that solve_closure_cases overlaps the set up of cases with the solves of others while keeping the solves within the core budget (with the stub OpenFOAM executables of the benchmarks, which sleep while solving). 
+
+import os
+import pickle
+import asyncio
+import pytest
+
+import solveclosure
+from solveclosure.utility import CoreScheduler
+
+
+def test_solve_closure_cases(tmp_path, monkeypatch, stub_load_of_cmd):
+    monkeypatch.setenv("SOLVECLOSURE_STUB_STEPS", "10")
+    monkeypatch.setenv("SOLVECLOSURE_STUB_SECONDS", "2")
+
+    cases = []
+    for idx in range(3):
+        case_dir = str(tmp_path / f"case_{idx}") + "/"
+        os.makedirs(case_dir)
+        cases.append({"case_dir": case_dir, "img_path": "examples/two_squares/two_squares.tif", "label_map_path": "examples/two_squares/two_squares_label_map.tif",
+                      "voxel": 1e-7, "cbd_surf_por": 0.5, "load_of_cmd": stub_load_of_cmd, "watchdog": True})
+
+    # each solve needs 1 core, so with a budget of 1 the solves run one after another
+    traces = solveclosure.solve_closure_cases(cases, core_budget=1, n_setup_workers=2)
+
+    intervals = {}
+    for idx, trace in enumerate(traces):
+        assert not isinstance(trace, BaseException), trace
+        events = {event["name"]: event for event in trace.events}
+        for name in ["chtMultiRegionFoam", "subdivide image", "process closure results"]:
+            event = events[name]
+            intervals[idx, name] = (trace.start_time + event["start"], trace.start_time + event["start"] + event["wall"])
+        assert events["chtMultiRegionFoam"]["exit status"] == 0
+
+        with open(cases[idx]["case_dir"] + "closure_data.pickle", 'rb') as f:
+            closure_data = pickle.load(f)
+        assert closure_data["global s surface average steady"] is not None
+        assert closure_data["solver watchdog"]["reason"] is None
+
+    def overlap(a, b):
+        return a[0] < b[1] and b[0] < a[1]
+
+    solves = [intervals[idx, "chtMultiRegionFoam"] for idx in range(3)]
+    assert not any(overlap(solves[i], solves[j]) for i in range(3) for j in range(i + 1, 3))
+    # the set up of a later case ran during the solve of another
+    assert any(overlap(intervals[i, "subdivide image"], solves[j]) for i in range(3) for j in range(3) if i != j)
+
+
+def test_core_scheduler():
+    scheduler = CoreScheduler(4)
+
+    async def solve(n_cores):
+        async with scheduler.cores(n_cores):
+            await asyncio.sleep(0.05)
+
+    async def solve_all():
+        await asyncio.gather(*[solve(n_cores) for n_cores in [2, 2, 3, 1, 4]])
+
+    asyncio.run(solve_all())
+    assert scheduler.peak <= 4
+    assert scheduler.in_use == 0
+
+    with pytest.raises(ValueError):
+        asyncio.run(solve(5))
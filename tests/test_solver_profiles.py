@@ -0,0 +1,49 @@
+# Tests that the linear solver profiles are written to fvSolution, and that the calibration picks the fastest profile (with the stub OpenFOAM executables of the benchmarks, where GAMG is fastest). 
+
+import os
+import pickle
+import pytest
+
+import solveclosure
+from solveclosure.openfoam_case_setup.multiparticle import write_fvSolution_file, SOLVER_PROFILES
+
+
+def test_write_fvSolution_file(tmp_path):
+    for profile in SOLVER_PROFILES:
+        write_fvSolution_file(str(tmp_path / f"fvSolution_{profile}"), profile=profile)
+        with open(tmp_path / f"fvSolution_{profile}") as f:
+            content = f.read()
+        assert f"solver                  {SOLVER_PROFILES[profile]['solver']};" in content
+        assert "hFinal" in content and "PIMPLE" in content
+
+    write_fvSolution_file(str(tmp_path / "fvSolution_steady"), profile="GAMG", steady=True)
+    with open(tmp_path / "fvSolution_steady") as f:
+        content = f.read()
+    assert "relTol                  0.01;" in content and "residualControl" in content
+
+    write_fvSolution_file(str(tmp_path / "fvSolution_custom"), profile={"solver": "PBiCGStab", "preconditioner": "DILU", "tolerance": 1e-9})
+    with open(tmp_path / "fvSolution_custom") as f:
+        assert "PBiCGStab" in f.read()
+
+    with pytest.raises(ValueError):
+        write_fvSolution_file(str(tmp_path / "fvSolution"), profile="ICCG")
+
+
+def test_calibrate_solver_profile(tmp_path, monkeypatch, stub_load_of_cmd):
+    monkeypatch.setenv("SOLVECLOSURE_STUB_STEPS", "10")
+    case_dir = str(tmp_path / "case") + "/"
+    os.makedirs(case_dir)
+
+    solveclosure.solve_closure_multiparticle(case_dir, "examples/two_squares/two_squares.tif", "examples/two_squares/two_squares_label_map.tif", 1e-7, 0.5,
+                                             load_of_cmd=stub_load_of_cmd, solver_profile="calibrate")
+
+    with open(case_dir + "closure_data.pickle", 'rb') as f:
+        closure_data = pickle.load(f)
+
+    calibration = closure_data["solver profile"]["calibration"]
+    assert closure_data["solver profile"]["profile"] == "GAMG"
+    assert sorted(calibration["regions"]) == ["particle_1", "particle_2"]
+    assert calibration["seconds per step"]["GAMG"] < calibration["seconds per step"]["PCG-DIC"]
+    for region_name in ["particle_1", "particle_2"]:
+        with open(case_dir + f"openfoam_case/system/{region_name}/fvSolution") as f:
+            assert "GAMG" in f.read()
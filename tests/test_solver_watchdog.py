@@ -0,0 +1,70 @@
+# Tests that the solver watchdog kills a diverging solver as soon as it diverges, and that solve_closure_multiparticle (and its async version) retries with safer time parameters (with the stub OpenFOAM executables of the benchmarks). 
+
+import os
+import time
+import pickle
+import asyncio
+import pytest
+import numpy as np
+
+import solveclosure
+from solveclosure.utility import Trace, SolverWatchdog
+
+
+def test_solver_watchdog(tmp_path):
+    trace = Trace()
+
+    # a solver which diverges and then hangs is killed straight away
+    watchdog = SolverWatchdog(str(tmp_path / "log.diverged"), grace_period=1)
+    cmd = "echo 'Time = 1e-05'; echo 'DICPCG:  Solving for h, Initial residual = -nan, Final residual = -nan, No Iterations 1000'; sleep 60"
+    wall_start = time.perf_counter()
+    returncode = trace.run("diverged", cmd, check=False, watchdog=watchdog)
+    assert time.perf_counter() - wall_start < 30
+    assert returncode != 0
+    assert watchdog.reason.startswith("non-finite")
+    assert trace.events[-1]["abort reason"] == watchdog.reason
+    with open(tmp_path / "log.diverged") as f:
+        assert "Killed by the solveclosure watchdog" in f.read()
+
+    # T drifting towards 0 (the T_offset boundary) is caught once its time step is complete
+    watchdog = SolverWatchdog(str(tmp_path / "log.drift"), min_T=1.0, grace_period=1)
+    cmd = "for t in 1 2 3; do echo \"Time = $t\"; echo \"Min/max T:0.$t 10\"; done; sleep 60"
+    trace.run("drift", cmd, check=False, watchdog=watchdog)
+    assert watchdog.reason.startswith("T drift")
+
+    # a healthy solver runs to the end
+    watchdog = SolverWatchdog(str(tmp_path / "log.healthy"), min_T=1.0)
+    cmd = "for t in 1 2 3; do echo \"deltaT = 1\"; echo \"Time = $t\"; echo \"Min/max T:10 10\"; done; echo End"
+    assert trace.run("healthy", cmd, watchdog=watchdog) == 0
+    assert watchdog.reason is None
+    assert watchdog.parser.summary()["finished"]
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_solver_watchdog_retry(tmp_path, monkeypatch, use_async, stub_load_of_cmd):
+    # the stub solver diverges while maxDi is above 6, so the first run (maxDi 10) is killed and the retry (maxDi 5) completes
+    monkeypatch.setenv("SOLVECLOSURE_STUB_DIVERGE_MAX_DI", "6")
+    monkeypatch.setenv("SOLVECLOSURE_STUB_STEPS", "10")
+    case_dir = str(tmp_path / "case") + "/"
+    os.makedirs(case_dir)
+
+    args = (case_dir, "examples/two_squares/two_squares.tif", "examples/two_squares/two_squares_label_map.tif", 1e-7, 0.5)
+    kwargs = {"load_of_cmd": stub_load_of_cmd, "watchdog": {"grace_period": 1}, "n_retries": 1}
+    if use_async:
+        asyncio.run(solveclosure.solve_closure_multiparticle_async(*args, **kwargs))
+    else:
+        solveclosure.solve_closure_multiparticle(*args, **kwargs)
+
+    with open(case_dir + "closure_data.pickle", 'rb') as f:
+        closure_data = pickle.load(f)
+
+    attempts = closure_data["solver watchdog"]["attempts"]
+    assert len(attempts) == 2
+    assert attempts[0]["reason"].startswith("non-finite")
+    assert attempts[1]["reason"] is None
+    assert attempts[1]["time params"]["max_Di"] == 5.0
+    assert np.isclose(attempts[1]["time params"]["dt"], attempts[0]["time params"]["dt"] / 10)
+    assert closure_data["solver watchdog"]["reason"] is None
+    assert os.path.isfile(case_dir + "openfoam_case/log.solver.failed_1")
+    assert closure_data["log summaries"]["log.solver"]["finished"]
+    assert closure_data["global s surface average steady"] is not None
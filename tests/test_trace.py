@@ -0,0 +1,45 @@
+# Tests that the Trace records Python stages and commands, including failed commands and stages timed outside the trace, and writes JSON and Chrome traces. 
+
+import json
+import time
+import subprocess
+import pytest
+
+from solveclosure.utility import Trace
+
+
+def test_trace(tmp_path):
+    trace = Trace(profile=True, trace_memory=True)
+
+    with trace.stage("allocate"):
+        data = bytearray(2**24)
+        with open(tmp_path / "data.bin", 'wb') as f:
+            f.write(data)
+
+    assert trace.run("succeed", "exit 0") == 0
+    assert trace.run("fail", "exit 3", check=False) == 3
+    with pytest.raises(subprocess.CalledProcessError):
+        trace.run("fail again", "exit 4")
+    wall_start = time.perf_counter()
+    trace.record("elsewhere", wall_start, category="subprocess", details={"exit status": 0})
+    trace.finish()
+
+    events = {event["name"]: event for event in trace.events}
+    assert list(events) == ["allocate", "succeed", "fail", "fail again", "elsewhere"]
+    assert events["elsewhere"]["category"] == "subprocess" and events["elsewhere"]["cpu"] is None
+    assert events["allocate"]["category"] == "python"
+    assert events["allocate"]["peak python allocations"] >= 2**24
+    assert events["allocate"]["bytes written"] is None or events["allocate"]["bytes written"] >= 2**24
+    assert [events[name]["exit status"] for name in ["succeed", "fail", "fail again"]] == [0, 3, 4]
+    assert all(event["wall"] >= 0 for event in trace.events)
+
+    trace.write(str(tmp_path / "trace.json"))
+    with open(tmp_path / "trace.json") as f:
+        assert len(json.load(f)["events"]) == 5
+    assert (tmp_path / "trace.prof").exists()
+
+    trace.write(str(tmp_path / "trace_chrome.json"), format="chrome")
+    with open(tmp_path / "trace_chrome.json") as f:
+        trace_events = json.load(f)["traceEvents"]
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in trace_events)
+    assert trace_events[2]["args"]["exit status"] == 3
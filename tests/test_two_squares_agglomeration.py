@@ -0,0 +1,55 @@
+# Tests that agglomerating particles into shared solver regions gives the same closure results as one region per particle, for the two squares with a third particle which does not touch them (so that it shares a region).
+
+import os
+import solveclosure
+import subprocess
+import pickle
+import numpy as np
+import tifffile as tif
+
+
+def test_two_squares_agglomeration(tmp_path):
+    # preparing paths
+    demo_path = os.path.join(os.getcwd(), "examples/two_squares/")
+    case_dir = os.path.join(demo_path, "results/")
+    img_path = str(tmp_path / "img.tif")
+    label_map_path = str(tmp_path / "label_map.tif")
+
+    # parameters
+    voxel = 1e-7
+    cbd_surface_porosity = 0.5
+
+    # a third particle far from the two squares
+    img = tif.imread(os.path.join(demo_path, "two_squares.tif"))
+    label_map = tif.imread(os.path.join(demo_path, "two_squares_label_map.tif"))
+    img[5:15, 80:90, :] = 1
+    label_map[5:15, 80:90, :] = 3
+    tif.imwrite(img_path, img)
+    tif.imwrite(label_map_path, label_map)
+
+    closure_data = {}
+    for agglomerate_regions in [False, True]:
+        # create a temporary directory to test
+        cmd = f"mkdir {case_dir}"
+        subprocess.run(["bash", "-c", cmd], check=False)
+
+        # solve
+        solveclosure.solve_closure_multiparticle(case_dir, img_path, label_map_path, voxel, cbd_surface_porosity, dimensionless=True, agglomerate_regions=agglomerate_regions)
+
+        with open(os.path.join(case_dir, "closure_data.pickle"), 'rb') as f:
+            closure_data[agglomerate_regions] = pickle.load(f)
+
+        # delete the directory afterwards
+        cmd = f"rm -r {case_dir}"
+        subprocess.run(["bash", "-c", cmd], check=True)
+
+    separate, agglomerated = closure_data[False], closure_data[True]
+
+    # the third particle shares a region with one of the squares
+    assert len(set(agglomerated["region map"].values())) == 2
+
+    # the global and per-particle closure values agree
+    for key in ["global s surface average steady", "global s volume average final"]:
+        assert np.isclose(agglomerated[key], separate[key], rtol=1e-4)
+    for key, particle_data in separate["particle data"].items():
+        assert np.isclose(agglomerated["particle data"][key]["s surf int transient"][-1], particle_data["s surf int transient"][-1], rtol=1e-4)
@@ -0,0 +1,68 @@
+# Tests that write_decomposed_case reproduces the processor meshes of decomposePar for the two squares, with a cellDecomposition which splits each particle across both processors.
+
+import os
+import solveclosure
+import subprocess
+import numpy as np
+
+from solveclosure.utility import find_latest_openfoam_installation, read_openfoam_mesh
+from solveclosure.utility.read_openfoam_mesh import read_foam_file, read_list
+from solveclosure.openfoam_case_setup.write_decomposed_case import write_decomposed_case
+from solveclosure.openfoam_case_setup.multiparticle import write_cellDecomposition_file
+
+
+def read_processor_region(of_case_dir, proc, region_name):
+    mesh_dir = of_case_dir + f"processor{proc}/constant/{region_name}/polyMesh/"
+    addressing = {}
+    for name in ["cellProcAddressing", "faceProcAddressing"]:
+        content, header = read_foam_file(mesh_dir + name)
+        addressing[name] = read_list(content, header["end"], header, "label")[0]
+    proc_patches = [(patch["name"], patch["n faces"], patch["start face"]) for patch in read_openfoam_mesh(mesh_dir)["patches"] if patch["name"].startswith("procBoundary")]
+    return addressing, proc_patches
+
+
+def test_two_squares_decomposition():
+    # preparing paths
+    demo_path = os.path.join(os.getcwd(), "examples/two_squares/")
+    case_dir = os.path.join(demo_path, "results/")
+    img_path = os.path.join(demo_path, "two_squares.tif")
+    label_map_path = os.path.join(demo_path, "two_squares_label_map.tif")
+    of_case_dir = case_dir + "openfoam_case/"
+    load_of_cmd = find_latest_openfoam_installation()
+
+    # create a temporary directory to test
+    cmd = f"mkdir {case_dir}"
+    subprocess.run(["bash", "-c", cmd], check=False)
+
+    # build the case, then split each particle in half (along z, the slowest index of the cell order) for both decompositions
+    solveclosure.solve_closure_multiparticle(case_dir, img_path, label_map_path, 1e-7, 0.5, load_of_cmd=load_of_cmd, parallelise=True, n_procs=2,
+                                             decomposition="particles", run_solver=False)
+    region_names = ["particle_1", "particle_2"]
+    region_cell_procs = {}
+    for region_name in region_names:
+        n_cells = read_openfoam_mesh(of_case_dir + f"constant/{region_name}/polyMesh")["n cells"]
+        region_cell_procs[region_name] = (np.arange(n_cells) >= n_cells // 2).astype(int)
+        write_cellDecomposition_file(of_case_dir + f"constant/{region_name}/cellDecomposition", region_name, region_cell_procs[region_name])
+
+    decompositions = {}
+    for decomposer in ["decomposePar", "python"]:
+        cmd = f"cd {of_case_dir} && rm -rf processor*"
+        subprocess.run(["bash", "-c", cmd], check=True)
+        if decomposer == "decomposePar":
+            cmd = f"{load_of_cmd} && decomposePar -case {of_case_dir} -allRegions > {of_case_dir}log.decomposePar 2>&1"
+            subprocess.run(["bash", "-c", cmd], check=True)
+        else:
+            write_decomposed_case(of_case_dir, region_cell_procs, 2)
+        decompositions[decomposer] = {(proc, region_name): read_processor_region(of_case_dir, proc, region_name) for proc in range(2) for region_name in region_names}
+
+    # delete the directory afterwards
+    cmd = f"rm -r {case_dir}"
+    subprocess.run(["bash", "-c", cmd], check=True)
+
+    # the same cells and faces (in the same order and orientation) and the same processor patches on each processor
+    for key, (addressing, proc_patches) in decompositions["decomposePar"].items():
+        python_addressing, python_proc_patches = decompositions["python"][key]
+        assert np.array_equal(python_addressing["cellProcAddressing"], addressing["cellProcAddressing"])
+        assert np.array_equal(python_addressing["faceProcAddressing"], addressing["faceProcAddressing"])
+        assert python_proc_patches == proc_patches
+        assert len(proc_patches) == 1
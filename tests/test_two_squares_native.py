@@ -0,0 +1,31 @@
+# Tests the solve_closure_native function by ensuring that it reproduces the validated OpenFOAM results for two_squares without OpenFOAM. 
+
+import numpy as np
+import tifffile as tif
+import solveclosure
+from solveclosure.utility import load_closure_field
+
+
+def test_two_squares_native(tmp_path):
+    img_path = "examples/two_squares/two_squares.tif"
+    label_map_path = "examples/two_squares/two_squares_label_map.tif"
+
+    # parameters 
+    voxel = 1e-7
+    cbd_surface_porosity = 0.5
+
+    # the transient at the default end time, which OpenFOAM's coarser implicit Euler steps put at -0.055516
+    closure_data = solveclosure.solve_closure_native(str(tmp_path / "dimensionless"), img_path, label_map_path, voxel, cbd_surface_porosity, dimensionless=True)
+    assert np.round(closure_data["global s surface average steady"], 4) == -0.0560
+    assert abs(closure_data["global s surface average steady"] / -0.055516 - 1) < 0.01
+    assert len(closure_data["times for transient data"]) == len(closure_data["global s surface average transient"])
+    assert np.isclose(closure_data["times for transient data"][-1], 0.0056)
+
+    # the fields are written at each write interval, and can be loaded to warm-start another solve
+    field, _ = load_closure_field(str(tmp_path / "dimensionless"), time="0.0028")
+    assert np.array_equal(np.isnan(field), tif.imread(img_path) != 1)
+
+    # the steady state of the dimensional case
+    D_s = 4e-14
+    closure_data = solveclosure.solve_closure_native(str(tmp_path / "dimensional"), img_path, label_map_path, voxel, cbd_surface_porosity, D_s=D_s, dimensionless=False)
+    assert np.round(closure_data["global s surface average steady"], 1) == -170.9
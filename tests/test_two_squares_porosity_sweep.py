@@ -0,0 +1,53 @@
+# Tests the solve_closure_porosity_sweep function by checking that the closure values found by linear superposition of the basis solutions agree with direct solves. 
+
+import os
+import solveclosure
+import subprocess
+import pickle
+import numpy as np
+import tifffile as tif
+
+
+def test_two_squares_porosity_sweep():
+    # preparing paths 
+    demo_path = os.path.join(os.getcwd(), "examples/two_squares/")
+    case_dir = os.path.join(demo_path, "results/")
+    img_path = os.path.join(demo_path, "two_squares.tif")
+    label_map_path = os.path.join(demo_path, "two_squares_label_map.tif")
+
+    # parameters 
+    voxel = 1e-7
+    cbd_surface_porosities = [0.3, 0.7]
+
+    # create a temporary directory to test
+    cmd = f"mkdir {case_dir}"
+    subprocess.run(["bash", "-c", cmd], check=False)
+
+    # add CBD next to both particles so that the porosity affects the solution
+    img = tif.imread(img_path)
+    img[30:70, 6:10, :] = 2
+    img[40:60, 70:73, :] = 2
+    cbd_img_path = os.path.join(case_dir, "two_squares_cbd.tif")
+    tif.imwrite(cbd_img_path, img)
+
+    # solve by superposition
+    sweep_values = solveclosure.solve_closure_porosity_sweep(os.path.join(case_dir, "sweep/"), cbd_img_path, label_map_path, voxel, cbd_surface_porosities)
+
+    # solve directly
+    direct_values = []
+    for cbd_surface_porosity in cbd_surface_porosities:
+        direct_dir = os.path.join(case_dir, f"direct_{cbd_surface_porosity}/")
+        os.makedirs(direct_dir)
+        solveclosure.solve_closure_multiparticle(direct_dir, cbd_img_path, label_map_path, voxel, cbd_surface_porosity, dimensionless=True)
+
+        with open(os.path.join(direct_dir, "closure_data.pickle"), 'rb') as f:
+            closure_data = pickle.load(f)
+        direct_values.append(closure_data["global s surface average steady"])
+
+    # delete the directory afterwards
+    cmd = f"rm -r {case_dir}"
+    subprocess.run(["bash", "-c", cmd], check=True)
+
+    # check that superposition agrees with the direct solves
+    assert np.allclose(sweep_values, direct_values, rtol=1e-4)
+    assert not np.isclose(direct_values[0], direct_values[1], rtol=1e-4)
@@ -0,0 +1,49 @@
+# Tests the rescale_dimensionless_closure_data function by checking that a dimensionless solve, rescaled analytically, reproduces the validated results of both the dimensionless and dimensional two_squares tests. 
+
+import os
+import solveclosure
+import subprocess
+import pickle
+import numpy as np
+
+
+def test_two_squares_rescaling():
+    # preparing paths 
+    demo_path = os.path.join(os.getcwd(), "examples/two_squares/")
+    case_dir = os.path.join(demo_path, "results/")
+    img_path = os.path.join(demo_path, "two_squares.tif")
+    label_map_path = os.path.join(demo_path, "two_squares_label_map.tif")
+
+    # parameters 
+    voxel = 1e-7
+    cbd_surface_porosity = 0.5
+    D_s = 4e-14
+    L = 100 * voxel # default lengthscale, the length of axis 0
+
+    # the default dimensional time parameters (T_end 800 s, dt 1e-3 s, write interval 200 s) in dimensionless time 
+    t_scale = L**2 / D_s
+    time_params = {"T_end": 800.0 / t_scale, "dt": 1e-3 / t_scale, "write_interval": 200 / t_scale}
+
+    # create a temporary directory to test
+    cmd = f"mkdir {case_dir}"
+    subprocess.run(["bash", "-c", cmd], check=False)
+
+    # solve the dimensionless case only
+    solveclosure.solve_closure_multiparticle(case_dir, img_path, label_map_path, voxel, cbd_surface_porosity, dimensionless=True, time_params=time_params)
+
+    with open(os.path.join(case_dir, "closure_data.pickle"), 'rb') as f:
+        closure_data = pickle.load(f)
+
+    dimensional_closure_data = solveclosure.rescale_dimensionless_closure_data(case_dir, D_s)
+
+    # delete the directory afterwards
+    cmd = f"rm -r {case_dir}"
+    subprocess.run(["bash", "-c", cmd], check=True)
+
+    # the dimensionless transient at the default dimensionless end time agrees with the dimensionless test
+    s_surf_ave_dimensionless = np.interp(0.0056, closure_data["times for transient data"], closure_data["global s surface average transient"])
+    assert abs(s_surf_ave_dimensionless - -0.055516) < 1e-4
+
+    # the rescaled steady state agrees with the dimensional test
+    assert np.round(dimensional_closure_data["global s surface average steady"], 1) == -170.9
+    assert np.isclose(dimensional_closure_data["times for transient data"][-1], 800.0)
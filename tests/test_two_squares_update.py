@@ -0,0 +1,55 @@
+# Tests the update_closure_case function by building a case with an extra particle, removing it with an incremental update, and reproducing the validated dimensionless results. 
+
+import os
+import solveclosure
+import subprocess
+import pickle
+import numpy as np
+import tifffile as tif
+
+
+def test_two_squares_update(tmp_path):
+    # preparing paths 
+    demo_path = os.path.join(os.getcwd(), "examples/two_squares/")
+    case_dir = os.path.join(demo_path, "results/")
+    img_path = os.path.join(demo_path, "two_squares.tif")
+    label_map_path = os.path.join(demo_path, "two_squares_label_map.tif")
+    edited_img_path = str(tmp_path / "edited.tif")
+    edited_label_map_path = str(tmp_path / "edited_label_map.tif")
+
+    # parameters 
+    voxel = 1e-7
+    cbd_surface_porosity = 0.5
+
+    # create a temporary directory to test
+    cmd = f"mkdir {case_dir}"
+    subprocess.run(["bash", "-c", cmd], check=False)
+
+    # a third particle far from the two squares
+    img = tif.imread(img_path)
+    label_map = tif.imread(label_map_path)
+    img[5:15, 80:90, :] = 1
+    label_map[5:15, 80:90, :] = 3
+    tif.imwrite(edited_img_path, img)
+    tif.imwrite(edited_label_map_path, label_map)
+
+    # build the edited case, then update it back to the two squares
+    solveclosure.solve_closure_multiparticle(case_dir, edited_img_path, edited_label_map_path, voxel, cbd_surface_porosity, dimensionless=True, run_solver=False)
+    affected_ids = solveclosure.update_closure_case(case_dir, img_path, label_map_path)
+
+    # read steady state closure value
+    closure_data_path = os.path.join(case_dir, "closure_data.pickle")
+
+    with open(closure_data_path, 'rb') as f:
+        closure_data = pickle.load(f)
+
+    s_surf_ave_steady_state = closure_data["global s surface average steady"]
+
+    # delete the directory afterwards
+    cmd = f"rm -r {case_dir}"
+    subprocess.run(["bash", "-c", cmd], check=True)
+
+    # only the removed particle was affected, and the result agrees with validated results
+    assert affected_ids == []
+    assert list(closure_data["particle data"].keys()) == [1, 2]
+    assert np.round(s_surf_ave_steady_state, 6) == -0.055516
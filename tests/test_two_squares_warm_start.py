@@ -0,0 +1,42 @@
+# Tests that warm-starting solve_closure_multiparticle from a previous solution reproduces the validated dimensionless results and reaches steady state sooner. 
+
+import os
+import solveclosure
+import subprocess
+import pickle
+import numpy as np
+
+
+def test_two_squares_warm_start():
+    # preparing paths 
+    demo_path = os.path.join(os.getcwd(), "examples/two_squares/")
+    case_dir = os.path.join(demo_path, "results/")
+    cold_case_dir = os.path.join(case_dir, "cold/")
+    warm_case_dir = os.path.join(case_dir, "warm/")
+    img_path = os.path.join(demo_path, "two_squares.tif")
+    label_map_path = os.path.join(demo_path, "two_squares_label_map.tif")
+
+    # parameters 
+    voxel = 1e-7
+    cbd_surface_porosity = 0.5
+
+    # create temporary directories to test
+    cmd = f"mkdir -p {cold_case_dir} {warm_case_dir}"
+    subprocess.run(["bash", "-c", cmd], check=False)
+
+    # solve from a uniform field, then again starting from that solution
+    solveclosure.solve_closure_multiparticle(cold_case_dir, img_path, label_map_path, voxel, cbd_surface_porosity, dimensionless=True)
+    solveclosure.solve_closure_multiparticle(warm_case_dir, img_path, label_map_path, voxel, cbd_surface_porosity, dimensionless=True, initial_field=cold_case_dir)
+
+    closure_data = {}
+    for name, path in [("cold", cold_case_dir), ("warm", warm_case_dir)]:
+        with open(os.path.join(path, "closure_data.pickle"), 'rb') as f:
+            closure_data[name] = pickle.load(f)
+
+    # delete the directory afterwards
+    cmd = f"rm -r {case_dir}"
+    subprocess.run(["bash", "-c", cmd], check=True)
+
+    # check that value calculated agrees with validated results, and that the warm start converged sooner
+    assert np.round(closure_data["warm"]["global s surface average steady"], 6) == -0.055516
+    assert closure_data["warm"]["time to steady state"] < closure_data["cold"]["time to steady state"]
@@ -0,0 +1,55 @@
+# Tests that update_closure_case keeps the particle data of every remaining particle right when a particle which is not the last is removed, and decomposes a parallel case as it was built (with the stub OpenFOAM executables of the benchmarks).
+
+import os
+import pickle
+import numpy as np
+import tifffile as tif
+from scipy import ndimage
+
+import solveclosure
+from solveclosure.utility.read_openfoam_mesh import read_foam_file, read_list
+
+STUB_OPENFOAM_DIR = os.path.abspath("benchmarks/stub_openfoam")
+
+
+def test_update_closure_case_removed_particle(tmp_path):
+    case_dir = str(tmp_path / "case") + "/"
+    os.makedirs(case_dir)
+    voxel = 1e-7
+    load_of_cmd = f"export PATH={STUB_OPENFOAM_DIR}:$PATH"
+
+    # two particles far from the two squares
+    img = tif.imread("examples/two_squares/two_squares.tif")
+    label_map = tif.imread("examples/two_squares/two_squares_label_map.tif")
+    img[5:15, 80:90, :] = 1
+    label_map[5:15, 80:90, :] = 3
+    img[80:90, 80:90, :] = 1
+    label_map[80:90, 80:90, :] = 4
+    tif.imwrite(str(tmp_path / "img.tif"), img)
+    tif.imwrite(str(tmp_path / "label_map.tif"), label_map)
+    solveclosure.solve_closure_multiparticle(case_dir, str(tmp_path / "img.tif"), str(tmp_path / "label_map.tif"), voxel, 0.5, load_of_cmd=load_of_cmd,
+                                             parallelise=True, n_procs=2, decomposition="particles", decomposer="python", run_solver=False)
+
+    # remove particle 3, leaving a gap in the IDs, and grow particle 4
+    img[5:15, 80:90, :] = 0
+    label_map[5:15, 80:90, :] = 0
+    img[90:92, 80:90, :] = 1
+    label_map[90:92, 80:90, :] = 4
+    tif.imwrite(str(tmp_path / "edited_img.tif"), img)
+    tif.imwrite(str(tmp_path / "edited_label_map.tif"), label_map)
+    affected_ids = solveclosure.update_closure_case(case_dir, str(tmp_path / "edited_img.tif"), str(tmp_path / "edited_label_map.tif"), load_of_cmd=load_of_cmd, run_solver=False)
+    assert affected_ids == [4]
+
+    with open(case_dir + "closure_data.pickle", 'rb') as f:
+        closure_data = pickle.load(f)
+    assert sorted(closure_data["particle data"].keys()) == [1, 2, 4]
+    for key, particle_data in closure_data["particle data"].items():
+        assert np.isclose(particle_data["centre x position"], ndimage.center_of_mass(label_map == key)[0] * voxel)
+
+    # the processor directories are rewritten by the Python decomposer, with the AM cells of each particle on its processor
+    of_case_dir = case_dir + "openfoam_case/"
+    assert closure_data["decomposition"]["decomposer"] == "python"
+    assert not os.path.exists(of_case_dir + "processor0/constant/particle_3")
+    for key, proc in closure_data["decomposition"]["particle processors"].items():
+        content, header = read_foam_file(of_case_dir + f"processor{proc}/constant/particle_{key}/polyMesh/cellProcAddressing")
+        assert len(read_list(content, header["end"], header, "label")[0]) == np.sum((img == 1) & (label_map == key))
@@ -0,0 +1,158 @@
+# Tests that write_decomposed_case splits the region meshes (written by the stub splitMeshRegions of the benchmarks) and their fields into processor directories which reconstruct the region exactly, with matching processor patches, as decomposePar does.
+
+import os
+import shutil
+import numpy as np
+
+import solveclosure
+from solveclosure.openfoam_case_setup.write_decomposed_case import write_decomposed_case, format_list, write_foam_file
+from solveclosure.openfoam_case_setup.multiparticle import write_bc_file_multiparticle
+from solveclosure.utility import read_openfoam_mesh, read_openfoam_field
+from solveclosure.utility.read_openfoam_mesh import read_foam_file, read_list
+
+STUB_OPENFOAM_DIR = os.path.abspath("benchmarks/stub_openfoam")
+
+
+def read_addressing(file_path):
+    content, header = read_foam_file(file_path)
+    return read_list(content, header["end"], header, "label")[0]
+
+
+def check_decomposition(of_case_dir, region_name, cell_procs, n_procs, initial_field):
+    mesh = read_openfoam_mesh(of_case_dir + f"constant/{region_name}/polyMesh")
+    n_internal = len(mesh["neighbour"])
+    face_count = np.zeros(len(mesh["owner"]), dtype=int)
+    cell_count = np.zeros(mesh["n cells"], dtype=int)
+    proc_patches = {}
+
+    for proc in range(n_procs):
+        mesh_dir = of_case_dir + f"processor{proc}/constant/{region_name}/polyMesh/"
+        proc_mesh = read_openfoam_mesh(mesh_dir)
+        cell_addressing = read_addressing(mesh_dir + "cellProcAddressing")
+        face_addressing = read_addressing(mesh_dir + "faceProcAddressing")
+        point_addressing = read_addressing(mesh_dir + "pointProcAddressing")
+        boundary_addressing = read_addressing(mesh_dir + "boundaryProcAddressing")
+
+        # the cells of the processor keep the order of the region
+        assert np.array_equal(cell_addressing, np.flatnonzero(cell_procs == proc))
+        assert np.all(np.diff(cell_addressing) > 0)
+        cell_count[cell_addressing] += 1
+        assert np.array_equal(proc_mesh["points"], mesh["points"][point_addressing])
+
+        faces, turned = np.abs(face_addressing) - 1, face_addressing < 0
+        face_count[faces] += 1
+        for local_face, (face, is_turned) in enumerate(zip(faces, turned)):
+            points = point_addressing[proc_mesh["face labels"][proc_mesh["face offsets"][local_face]:proc_mesh["face offsets"][local_face + 1]]]
+            original = mesh["face labels"][mesh["face offsets"][face]:mesh["face offsets"][face + 1]]
+            assert np.array_equal(points, np.concatenate([original[:1], original[:0:-1]]) if is_turned else original)
+            assert cell_addressing[proc_mesh["owner"][local_face]] == (mesh["neighbour"][face] if is_turned else mesh["owner"][face])
+        n_proc_internal = len(proc_mesh["neighbour"])
+        assert np.array_equal(cell_addressing[proc_mesh["neighbour"]], mesh["neighbour"][faces[:n_proc_internal]])
+
+        patches = proc_mesh["patches"]
+        assert [patch["name"] for patch in patches[:len(mesh["patches"])]] == [patch["name"] for patch in mesh["patches"]]
+        assert np.array_equal(boundary_addressing, list(range(len(mesh["patches"]))) + [-1] * (len(patches) - len(mesh["patches"])))
+        for patch in patches[len(mesh["patches"]):]:
+            assert "type            processor;" in patch["entries"]
+            proc_patches[patch["name"]] = face_addressing[patch["start face"]:patch["start face"] + patch["n faces"]]
+
+        # the initial field is split with the cells, and each processor patch has a value per face
+        T = read_openfoam_field(of_case_dir + f"processor{proc}/0/{region_name}/T")
+        assert np.array_equal(T, initial_field[cell_addressing])
+        with open(of_case_dir + f"processor{proc}/0/{region_name}/T", 'rb') as f:
+            content = f.read()
+        for patch in patches[len(mesh["patches"]):]:
+            assert f"{patch['name']}\n    {{\n        type            processor;\n        value           nonuniform List<scalar> {patch['n faces']}\n(".encode() in content
+
+    assert np.all(cell_count == 1)
+    # faces cut by the decomposition are on two processors, turned on one of them
+    cut = np.zeros(len(mesh["owner"]), dtype=bool)
+    cut[:n_internal] = cell_procs[mesh["owner"][:n_internal]] != cell_procs[mesh["neighbour"]]
+    assert np.all(face_count == np.where(cut, 2, 1))
+    assert np.sum(cut) > 0
+
+    for name, addressing in proc_patches.items():
+        proc, neighbour_proc = name[len("procBoundary"):].split("to")
+        assert np.array_equal(np.abs(addressing), np.abs(proc_patches[f"procBoundary{neighbour_proc}to{proc}"]))
+        assert np.all((addressing < 0) == (int(proc) > int(neighbour_proc)))
+
+    return mesh
+
+
+def test_write_decomposed_case(tmp_path):
+    case_dir = str(tmp_path / "case") + "/"
+    os.makedirs(case_dir)
+    solveclosure.solve_closure_multiparticle(case_dir, "examples/two_squares/two_squares.tif", "examples/two_squares/two_squares_label_map.tif", 1e-7, 0.5,
+                                             load_of_cmd=f"export PATH={STUB_OPENFOAM_DIR}:$PATH", parallelise=True, n_procs=2, decomposition="particles",
+                                             decomposer="python", run_solver=False)
+    of_case_dir = case_dir + "openfoam_case/"
+
+    # each particle is a region, which the particle partition puts on a single processor
+    for region_name in ["particle_1", "particle_2"]:
+        n_cells = [len(read_addressing(of_case_dir + f"processor{proc}/constant/{region_name}/polyMesh/cellProcAddressing")) for proc in range(2)]
+        assert sorted(n_cells)[0] == 0 and sum(n_cells) == read_openfoam_mesh(of_case_dir + f"constant/{region_name}/polyMesh")["n cells"]
+        assert os.path.exists(of_case_dir + f"processor{n_cells.index(0)}/0/{region_name}/p")
+
+    # split a region into three slabs along x, with a warm-start field and zones
+    region_name = "particle_1"
+    mesh_dir = of_case_dir + f"constant/{region_name}/polyMesh/"
+    mesh = read_openfoam_mesh(mesh_dir)
+    n_cells, n_faces = mesh["n cells"], len(mesh["owner"])
+    centres = np.zeros((n_cells, 3))
+    np.add.at(centres, mesh["owner"], mesh["points"][mesh["face labels"].reshape(-1, 4)].mean(axis=1))
+    np.add.at(centres, mesh["neighbour"], mesh["points"][mesh["face labels"].reshape(-1, 4)[:len(mesh["neighbour"])]].mean(axis=1))
+    centres /= 6
+    cell_procs = np.digitize(centres[:, 0], np.quantile(centres[:, 0], [1 / 3, 2 / 3]))
+
+    initial_field = 10 + np.random.default_rng(0).random(n_cells)
+    write_bc_file_multiparticle(of_case_dir + f"0/{region_name}/T", region_name, -1.0, -0.5, [2], 10, initial_field=initial_field)
+
+    zone_cells = np.arange(0, n_cells, 3)
+    zone_faces = np.arange(0, len(mesh["neighbour"]), 2)
+    flips = np.arange(len(zone_faces)) % 3 == 0
+    for zone_type, content in [("cellZones", b"zone_a\n{\n    type cellZone;\ncellLabels List<label> " + format_list(zone_cells, mesh["format"], "label") + b";\n}\n)"),
+                               ("faceZones", b"zone_b\n{\n    type faceZone;\nfaceLabels List<label> " + format_list(zone_faces, mesh["format"], "label") + b";\n"
+                                b"flipMap List<bool> " + format_list(flips, mesh["format"], "bool") + b";\n}\n)")]:
+        write_foam_file(mesh_dir + zone_type, mesh["format"], "regIOobject", f"constant/{region_name}/polyMesh", zone_type, b"1\n(\n" + content)
+
+    shutil.rmtree(of_case_dir + "processor0")
+    shutil.rmtree(of_case_dir + "processor1")
+    n_cells_per_proc = write_decomposed_case(of_case_dir, {region_name: cell_procs}, 3, n_workers=3)
+    assert n_cells_per_proc[region_name] == np.bincount(cell_procs, minlength=3).tolist()
+    check_decomposition(of_case_dir, region_name, cell_procs, 3, initial_field)
+
+    for proc in range(3):
+        proc_mesh_dir = of_case_dir + f"processor{proc}/constant/{region_name}/polyMesh/"
+        cell_addressing = read_addressing(proc_mesh_dir + "cellProcAddressing")
+        face_addressing = read_addressing(proc_mesh_dir + "faceProcAddressing")
+        proc_mesh = read_openfoam_mesh(proc_mesh_dir)
+
+        cell_zone = proc_mesh["zones"]["cellZones"][0]
+        assert np.array_equal(cell_addressing[cell_zone["lists"]["cellLabels"]], zone_cells[cell_procs[zone_cells] == proc])
+
+        face_zone = proc_mesh["zones"]["faceZones"][0]
+        local_faces = face_zone["lists"]["faceLabels"]
+        assert np.all(np.diff(local_faces) > 0)
+        original = np.abs(face_addressing[local_faces]) - 1
+        assert np.array_equal(np.sort(original), np.sort(zone_faces[np.isin(zone_faces, np.abs(face_addressing) - 1)]))
+        expected_flips = flips[np.searchsorted(zone_faces, original)] ^ (face_addressing[local_faces] < 0)
+        assert np.array_equal(face_zone["lists"]["flipMap"].astype(bool), expected_flips)
+
+    # the same mesh and field in ascii decompose in the same way
+    ascii_format = {"binary": False, "label bytes": 4}
+    write_foam_file(mesh_dir + "points", ascii_format, "vectorField", "", "points", format_list(mesh["points"], ascii_format, "scalar"))
+    faces = mesh["face labels"].reshape(-1, 4)
+    write_foam_file(mesh_dir + "faces", ascii_format, "faceList", "", "faces", f"{n_faces}\n(\n".encode() + "\n".join(f"4({' '.join(map(str, face))})" for face in faces).encode() + b"\n)")
+    for name in ["owner", "neighbour"]:
+        write_foam_file(mesh_dir + name, ascii_format, "labelList", "", name, format_list(mesh[name], ascii_format, "label"))
+    for zone_type in ["cellZones", "faceZones"]:
+        os.remove(mesh_dir + zone_type)
+    with open(of_case_dir + f"0/{region_name}/T", 'w') as f:
+        f.write(f"FoamFile\n{{\n    format      ascii;\n}}\ninternalField   nonuniform List<scalar> \n{n_cells}\n(\n" + "\n".join(format(x, ".17g") for x in initial_field) +
+                "\n)\n;\n\nboundaryField\n{\n    outerWalls\n    {\n        type            zeroGradient;\n    }\n}\n")
+
+    write_decomposed_case(of_case_dir, {region_name: cell_procs}, 3)
+    ascii_mesh = check_decomposition(of_case_dir, region_name, cell_procs, 3, initial_field)
+    assert not ascii_mesh["format"]["binary"]
+    with open(of_case_dir + f"processor0/constant/{region_name}/polyMesh/owner", 'r') as f:
+        assert "format      ascii;" in f.read()